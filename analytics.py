@@ -0,0 +1,165 @@
+"""
+Module des requêtes de tableau de bord
+Lit les tables de résumé tenues à jour à chaque lot écrit (voir
+db_schema) : chaque requête touche quelques lignes par exécution, quelle que
+soit la taille du journal
+
+UTILISATION:
+    python analytics.py --db simulation_trafic.db            # dernière exécution
+    python analytics.py --db simulation_trafic.db --run-id 3
+    python analytics.py --db simulation_trafic.db --cumuls heure
+"""
+
+import argparse
+import sqlite3
+
+from db_schema import init_schema, ROLLUPS
+
+
+def derniere_execution(conn):
+    """run_id de la dernière exécution résumée (None si la base est vide)"""
+    return conn.execute("SELECT MAX(run_id) FROM stats_runs").fetchone()[0]
+
+
+def _ligne(curseur):
+    """Première ligne d'un curseur sous forme de dict (None si vide)"""
+    ligne = curseur.fetchone()
+    if ligne is None:
+        return None
+    return dict(zip([colonne[0] for colonne in curseur.description], ligne))
+
+
+def _lignes(curseur):
+    """Lignes d'un curseur sous forme de dicts"""
+    noms = [colonne[0] for colonne in curseur.description]
+    return [dict(zip(noms, ligne)) for ligne in curseur]
+
+
+# Compteurs et attente moyenne (secondes) d'une ligne de résumé
+_SQL_MESURES = '''evenements, collisions, violations, arrets, attentes,
+                  CASE WHEN attentes > 0 THEN attente_ns / 1e9 / attentes END
+                      AS attente_moyenne'''
+
+
+def resume_run(conn, run_id):
+    """Compteurs d'une exécution et son scénario courant"""
+    return _ligne(conn.execute(f'''
+        SELECT st.run_id, r.description, s.libelle AS scenario, {_SQL_MESURES}
+        FROM stats_runs st
+        LEFT JOIN runs r ON r.run_id = st.run_id
+        LEFT JOIN scenarios s ON s.code = st.scenario
+        WHERE st.run_id = ?
+    ''', (run_id,)))
+
+
+def par_scenario(conn, run_id):
+    """Compteurs d'une exécution ventilés par scénario"""
+    return _lignes(conn.execute(f'''
+        SELECT s.libelle AS scenario, {_SQL_MESURES}
+        FROM stats_scenarios st
+        JOIN scenarios s ON s.code = st.scenario
+        WHERE st.run_id = ?
+        ORDER BY s.libelle
+    ''', (run_id,)))
+
+
+def par_direction(conn, run_id):
+    """Compteurs d'une exécution ventilés par direction des véhicules"""
+    return _lignes(conn.execute(f'''
+        SELECT d.libelle AS direction, {_SQL_MESURES}
+        FROM stats_directions st
+        JOIN directions d ON d.code = st.direction
+        WHERE st.run_id = ?
+        ORDER BY d.libelle
+    ''', (run_id,)))
+
+
+def durees_phases(conn, run_id):
+    """Temps passé dans chaque état de feu, par axe (secondes)
+
+    Les phases closes viennent de stats_phases ; la phase en cours de
+    chaque axe compte jusqu'au dernier événement résumé de l'exécution.
+    """
+    return _lignes(conn.execute('''
+        WITH fin AS (SELECT dernier_ns AS ts_ns FROM stats_runs WHERE run_id = :run),
+        phases AS (
+            SELECT axe, etat, nombre, duree_ns FROM stats_phases WHERE run_id = :run
+            UNION ALL
+            SELECT axe, etat, 1, fin.ts_ns - depuis_ns
+            FROM feux_en_cours, fin WHERE run_id = :run
+        )
+        SELECT axe, etat, SUM(nombre) AS nombre, SUM(duree_ns) / 1e9 AS duree,
+               SUM(duree_ns) / 1e9 / SUM(nombre) AS duree_moyenne
+        FROM phases
+        GROUP BY axe, etat
+        ORDER BY axe, etat
+    ''', {'run': run_id}))
+
+
+def cumuls(conn, run_id, tranche='minute'):
+    """Cumuls d'une exécution par tranche de temps ('minute' ou 'heure')
+
+    `debut` est l'heure locale de début de la tranche.
+    """
+    table = f"rollups_{tranche}"
+    if table not in ROLLUPS:
+        raise ValueError(f"Tranche inconnue : {tranche}")
+    return _lignes(conn.execute(f'''
+        SELECT datetime(r.debut_epoch + (g.debut_ns - r.debut_ns) / 1e9,
+                        'unixepoch', 'localtime') AS debut,
+               g.apparitions, g.arrets, g.collisions, g.violations, g.changements_feu
+        FROM {table} g
+        JOIN runs r ON r.run_id = g.run_id
+        WHERE g.run_id = ?
+        ORDER BY g.debut_ns
+    ''', (run_id,)))
+
+
+def _afficher(titre, lignes, cle):
+    print(f"\n{titre}")
+    for ligne in lignes:
+        attente = ligne['attente_moyenne']
+        attente = f"{attente:6.2f} s" if attente is not None else "     -"
+        print(f"  {ligne[cle]:<20} {ligne['evenements']:>8} évén. "
+              f"{ligne['collisions']:>6} coll. {ligne['violations']:>6} viol. "
+              f"{ligne['arrets']:>6} arrêts, attente moy. {attente}")
+
+
+def main():
+    """Point d'entrée en ligne de commande"""
+    parser = argparse.ArgumentParser(description="Tableau de bord d'une exécution")
+    parser.add_argument('--db', default="simulation_trafic.db")
+    parser.add_argument('--run-id', type=int, help="exécution à résumer (la dernière par défaut)")
+    parser.add_argument('--cumuls', choices=('minute', 'heure'),
+                        help="affiche aussi les cumuls par tranche de temps")
+    args = parser.parse_args()
+
+    # Met le schéma à jour : une base plus ancienne reçoit ses résumés
+    conn = sqlite3.connect(args.db)
+    init_schema(conn.cursor())
+    conn.commit()
+    run_id = args.run_id if args.run_id is not None else derniere_execution(conn)
+    resume = resume_run(conn, run_id) if run_id is not None else None
+    if resume is None:
+        print("Aucune exécution résumée")
+        conn.close()
+        return
+
+    print(f"Exécution {run_id} : {resume['description']} (scénario {resume['scenario']})")
+    _afficher("Total", [resume], 'scenario')
+    _afficher("Par scénario", par_scenario(conn, run_id), 'scenario')
+    _afficher("Par direction", par_direction(conn, run_id), 'direction')
+    print("\nPhases des feux")
+    for phase in durees_phases(conn, run_id):
+        print(f"  {phase['axe']:<3} {phase['etat']:<7} {phase['nombre']:>5} fois, "
+              f"{phase['duree']:8.1f} s (moy. {phase['duree_moyenne']:.1f} s)")
+    if args.cumuls:
+        print(f"\nCumuls par {args.cumuls}    apparitions  arrêts  collisions  violations  feux")
+        for ligne in cumuls(conn, run_id, args.cumuls):
+            print(f"  {ligne['debut']}  {ligne['apparitions']:>11} {ligne['arrets']:>7} "
+                  f"{ligne['collisions']:>11} {ligne['violations']:>11} {ligne['changements_feu']:>5}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+"""
+Module de bancs d'essai
+Mesure les performances du moteur et écrit les résultats en JSON pour
+comparer deux versions et repérer les régressions
+
+UTILISATION:
+    python benchmarks.py --sortie bench.json
+    python benchmarks.py --sortie nouveau.json --comparer bench.json
+
+Mesures :
+    - ticks/s de Simulation.update de 10 véhicules aux quatre voies remplies
+    - coût par pas de Logger.check_collisions et Vehicle.check_vehicle_ahead
+    - collisions journalisées par seconde sur une voie bouchée
+    - insertions/s soutenues du DatabaseManager, latence de mise en file et
+      délai de la mise en file au commit
+    - débit et octets par événement de chaque destination (log_sinks)
+    - temps de rendu d'une image turtle (si un affichage est disponible)
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from clock import SimulatedClock
+from database import DatabaseManager
+from headless import build_simulation
+from log_sinks import JsonlSink, ColumnarSink, MemorySink
+from scenarios import CirculationNormale
+from spatial_hash import DEMI_CARREFOUR
+from sweep import SweepStats
+from vehicle_store import DEPARTS, VECTEURS, LIMITE_SCENE, DIRECTIONS
+
+
+# Écart entre deux véhicules d'une voie : la distance de sécurité du
+# scénario, comme dans un trafic fluide
+ESPACEMENT = CirculationNormale().distance_securite
+
+# Rangs occupables de chaque voie à cet écart, du point de départ à la sortie
+# de scène, hors du carrefour où les voies se croisent
+RANGS_VOIES = [[rang for rang in range(int((LIMITE_SCENE - DEPARTS[code] @ VECTEURS[code])
+                                           // ESPACEMENT) + 1)
+                if abs(DEPARTS[code] @ VECTEURS[code] + rang * ESPACEMENT) >= DEMI_CARREFOUR]
+               for code in range(len(VECTEURS))]
+
+# La dernière taille remplit les quatre voies
+TAILLES = (10, 25, 50, sum(map(len, RANGS_VOIES)))
+
+# Budget de temps par mesure (secondes) : les grandes tailles font moins de pas
+BUDGET = 2.0
+
+# Seuil de régression signalé par --comparer (fraction de perte)
+SEUIL_REGRESSION = 0.20
+
+
+def _simulation(nb_vehicules, db_manager=None):
+    """Simulation de test, véhicules espacés de ESPACEMENT sur leurs voies
+
+    Sans cette répartition, tous les véhicules s'empilent sur les quatre
+    points de départ et la mesure ne porte que sur ce carambolage. Les
+    voies sont remplies à tour de rôle ; au-delà de leurs places
+    (RANGS_VOIES), les véhicules en trop ne sont pas créés.
+    """
+    random.seed(0)
+    # Places (voie, rang) remplies à tour de rôle entre les voies
+    places = [(code, rangs[position]) for position in range(max(map(len, RANGS_VOIES)))
+              for code, rangs in enumerate(RANGS_VOIES) if position < len(rangs)]
+    places = places[:nb_vehicules]
+
+    scenario = CirculationNormale()
+    scenario.nb_vehicules = 0
+    clock = SimulatedClock(0.03, depart=0)
+    simulation = build_simulation(scenario, db_manager or SweepStats(clock), clock)
+    for code, rang in places:
+        vehicule = simulation.add_vehicle(DIRECTIONS[code])
+        vehicule.x, vehicule.y = DEPARTS[code] + VECTEURS[code] * rang * ESPACEMENT
+    scenario.nb_vehicules = len(places)
+    simulation.store.lanes.reparer(simulation.store.progression())
+
+    simulation.start()
+    return simulation
+
+
+def _chronometrer(fonction, budget=BUDGET, minimum=1):
+    """Répète `fonction` pendant `budget` secondes ; retourne (répétitions, s/appel)"""
+    repetitions = 0
+    debut = time.perf_counter()
+    while True:
+        fonction()
+        repetitions += 1
+        ecoule = time.perf_counter() - debut
+        if repetitions >= minimum and ecoule >= budget:
+            return repetitions, ecoule / repetitions
+
+
+def bench_update(tailles=TAILLES):
+    """Pas par seconde de Simulation.update"""
+    resultats = {}
+    for taille in tailles:
+        simulation = _simulation(taille)
+        pas, duree = _chronometrer(simulation.update)
+        resultats[str(taille)] = {'pas': pas, 'ms_par_pas': duree * 1e3,
+                                  'pas_par_seconde': 1 / duree}
+    return resultats
+
+
+def bench_collisions(tailles=TAILLES):
+    """Coût par pas de Logger.check_collisions"""
+    resultats = {}
+    for taille in tailles:
+        simulation = _simulation(taille)
+        pas, duree = _chronometrer(lambda: simulation.logger.check_collisions(simulation.store))
+        resultats[str(taille)] = {'pas': pas, 'ms_par_pas': duree * 1e3}
+    return resultats
+
+
+def bench_embouteillage(nb_vehicules=160, espacement=5.0):
+    """Coût par pas de check_collisions sur une voie bouchée, journal compris
+
+    Tous les véhicules sont sur la voie EST, un tous les `espacement`
+    pixels : chacun touche ses voisins et chaque pas journalise des
+    centaines de collisions (destination en mémoire).
+    """
+    clock = SimulatedClock(0.03, depart=0)
+    db_manager = DatabaseManager(None, clock, sinks=[MemorySink()])
+    scenario = CirculationNormale()
+    scenario.nb_vehicules = 0
+    simulation = build_simulation(scenario, db_manager, clock)
+    for k in range(nb_vehicules):
+        vehicule = simulation.add_vehicle("EST")
+        vehicule.x = DEPARTS[0, 0] + k * espacement
+    logger = simulation.logger
+    pas, duree = _chronometrer(lambda: logger.check_collisions(simulation.store))
+    collisions = logger.collision_count / pas
+    db_manager.close()
+    return {'vehicules': nb_vehicules, 'pas': pas, 'ms_par_pas': duree * 1e3,
+            'collisions_par_pas': collisions, 'evenements_par_seconde': collisions / duree}
+
+
+def bench_vehicule_devant(tailles=TAILLES):
+    """Coût par pas de check_vehicle_ahead appelé pour chaque véhicule"""
+    resultats = {}
+    for taille in tailles:
+        simulation = _simulation(taille)
+        vehicules = simulation.vehicles
+
+        def pas():
+            for vehicule in vehicules:
+                vehicule.check_vehicle_ahead()
+
+        nb, duree = _chronometrer(pas)
+        resultats[str(taille)] = {'pas': nb, 'ms_par_pas': duree * 1e3,
+                                  'us_par_vehicule': duree * 1e6 / taille}
+    return resultats
+
+
+def bench_database(nb_evenements=200000):
+    """Insertions/s soutenues (jusqu'à l'écriture complète), latences de la file et du commit"""
+    with tempfile.TemporaryDirectory() as dossier:
+        db_manager = DatabaseManager(os.path.join(dossier, "bench.db"),
+                                     SimulatedClock(0.03, depart=0))
+        debut = time.perf_counter()
+        for i in range(nb_evenements):
+            db_manager.log_event('VOITURE', 'Arrêt au feu rouge', id_voiture=i % 100,
+                                 etat_feu='ROUGE', position_x=1.0, position_y=2.0,
+                                 vitesse=0.0)
+        production = time.perf_counter() - debut
+        db_manager.close()
+        total = time.perf_counter() - debut
+        stats = db_manager.queue_stats()
+    return {
+        'evenements': nb_evenements,
+        'insertions_par_seconde': nb_evenements / total,
+        'log_event_us': production * 1e6 / nb_evenements,
+        'latence_file_moyenne_us': stats['latence_moyenne'] * 1e6,
+        'latence_file_max_ms': stats['latence_max'] * 1e3,
+        'pic_file': stats['pic'],
+        'latence_commit_moyenne_ms': stats['latence_ecriture_moyenne'] * 1e3,
+        'latence_commit_max_ms': stats['latence_ecriture_max'] * 1e3,
+    }
+
+
+def bench_sinks(nb_evenements=100000):
+    """Débit et coût de stockage de chaque destination de journalisation seule"""
+    resultats = {}
+    with tempfile.TemporaryDirectory() as dossier:
+        fabriques = {
+            'sqlite': lambda: (None, os.path.join(dossier, "bench_sink.db")),
+            'jsonl': lambda: (JsonlSink(os.path.join(dossier, "bench.jsonl")), None),
+            'colonnes': lambda: (ColumnarSink(os.path.join(dossier, "bench.col")), None),
+            'memoire': lambda: (MemorySink(nb_evenements), None),
+        }
+        for nom, fabrique in fabriques.items():
+            sink, db_name = fabrique()
+            db_manager = DatabaseManager(db_name, SimulatedClock(0.03, depart=0),
+                                         sinks=[sink] if sink is not None else None)
+            debut = time.perf_counter()
+            for i in range(nb_evenements):
+                db_manager.log_event('VOITURE', 'Arrêt au feu rouge', id_voiture=i % 100,
+                                     etat_feu='ROUGE', position_x=1.0, position_y=2.0,
+                                     vitesse=0.0)
+            db_manager.close()
+            total = time.perf_counter() - debut
+            octets = sum(os.path.getsize(os.path.join(dossier, fichier))
+                         for fichier in os.listdir(dossier)
+                         if fichier.startswith("bench" if sink is not None else "bench_sink"))
+            resultats[nom] = {'insertions_par_seconde': nb_evenements / total,
+                              'octets_par_evenement': octets / nb_evenements}
+            for fichier in os.listdir(dossier):
+                os.remove(os.path.join(dossier, fichier))
+    return resultats
+
+
+def bench_rendu(taille=100, images=50):
+    """Temps d'une image turtle (véhicules, feux, statut, rafraîchissement)"""
+    try:
+        import turtle
+        from turtle_scene import TurtleScene, TrafficLightView, VehiclesView
+        from gui import GUI
+        scene = TurtleScene()
+    except Exception as e:  # pas d'affichage (serveur, CI)
+        return {'disponible': False, 'raison': str(e)}
+
+    simulation = _simulation(taille)
+    vehicles_view = VehiclesView()
+    simulation.add_observer(vehicles_view)
+    gui = GUI(simulation, scene.screen)
+    feux = [TrafficLightView(-70, -100, "NS"), TrafficLightView(70, 100, "NS"),
+            TrafficLightView(100, -70, "EO"), TrafficLightView(-100, 70, "EO")]
+    durees = []
+    for _ in range(images):
+        simulation.update()
+        debut = time.perf_counter()
+        vehicles_view.draw()
+        for feu in feux:
+            feu.draw(simulation.traffic_light.etat_ns, simulation.traffic_light.clignotement)
+        gui.update_status()
+        scene.refresh()
+        durees.append(time.perf_counter() - debut)
+    turtle.bye()
+    return {'disponible': True, 'vehicules': taille,
+            'ms_par_image_mediane': float(np.median(durees)) * 1e3,
+            'ms_par_image_max': max(durees) * 1e3}
+
+
+def _contexte():
+    """Machine et version du code mesurés"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                                capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        'date': time.strftime("%Y-%m-%d %H:%M:%S"),
+        'commit': commit or None,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.platform(),
+        'processeurs': os.cpu_count(),
+    }
+
+
+def run_benchmarks(tailles=TAILLES, rendu=True):
+    """Lance toute la suite ; retourne le document JSON"""
+    resultats = {
+        'update': bench_update(tailles),
+        'check_collisions': bench_collisions(tailles),
+        'embouteillage': bench_embouteillage(),
+        'check_vehicle_ahead': bench_vehicule_devant(tailles),
+        'database': bench_database(),
+        'sinks': bench_sinks(),
+    }
+    if rendu:
+        resultats['rendu'] = bench_rendu()
+    return {'contexte': _contexte(), 'resultats': resultats}
+
+
+def _mesures(document):
+    """Aplatit les résultats en {chemin: (valeur, plus_grand_mieux)}"""
+    mesures = {}
+    resultats = document['resultats']
+    for bloc in ('update', 'check_collisions', 'check_vehicle_ahead'):
+        for taille, valeurs in resultats.get(bloc, {}).items():
+            mesures[f"{bloc}.{taille}.ms_par_pas"] = (valeurs['ms_par_pas'], False)
+    embouteillage = resultats.get('embouteillage')
+    if embouteillage:
+        mesures['embouteillage.evenements_par_seconde'] = (
+            embouteillage['evenements_par_seconde'], True)
+    database = resultats.get('database')
+    if database:
+        mesures['database.insertions_par_seconde'] = (database['insertions_par_seconde'], True)
+        mesures['database.log_event_us'] = (database['log_event_us'], False)
+    for nom, valeurs in resultats.get('sinks', {}).items():
+        mesures[f"sinks.{nom}.insertions_par_seconde"] = (valeurs['insertions_par_seconde'], True)
+    rendu = resultats.get('rendu')
+    if rendu and rendu.get('disponible'):
+        mesures['rendu.ms_par_image_mediane'] = (rendu['ms_par_image_mediane'], False)
+    return mesures
+
+
+def comparer(reference, courant, seuil=SEUIL_REGRESSION):
+    """Liste des régressions (chemin, ancienne valeur, nouvelle valeur, perte)"""
+    anciennes = _mesures(reference)
+    regressions = []
+    for chemin, (valeur, plus_grand_mieux) in _mesures(courant).items():
+        if chemin not in anciennes:
+            continue
+        ancienne = anciennes[chemin][0]
+        if plus_grand_mieux:
+            perte = (ancienne - valeur) / ancienne
+        else:
+            perte = (valeur - ancienne) / ancienne
+        if perte > seuil:
+            regressions.append((chemin, ancienne, valeur, perte))
+    return regressions
+
+
+def main():
+    """Point d'entrée en ligne de commande"""
+    parser = argparse.ArgumentParser(description="Bancs d'essai de la simulation")
+    parser.add_argument('--sortie', default="bench.json")
+    parser.add_argument('--tailles', type=int, nargs='+', default=list(TAILLES))
+    parser.add_argument('--sans-rendu', action='store_true',
+                        help="ne pas mesurer le rendu turtle")
+    parser.add_argument('--comparer', metavar='REFERENCE',
+                        help="JSON d'une exécution précédente ; code de sortie 1 si régression")
+    parser.add_argument('--seuil', type=float, default=SEUIL_REGRESSION)
+    args = parser.parse_args()
+
+    document = run_benchmarks(args.tailles, not args.sans_rendu)
+    with open(args.sortie, "w", encoding="utf-8") as fichier:
+        json.dump(document, fichier, indent=2, ensure_ascii=False)
+
+    resultats = document['resultats']
+    for taille in map(str, args.tailles):
+        print(f"{taille:>6} véhicules : {resultats['update'][taille]['pas_par_seconde']:9.1f} pas/s, "
+              f"collisions {resultats['check_collisions'][taille]['ms_par_pas']:.3f} ms, "
+              f"véhicule devant {resultats['check_vehicle_ahead'][taille]['ms_par_pas']:.3f} ms")
+    embouteillage = resultats['embouteillage']
+    print(f"Voie bouchée : {embouteillage['collisions_par_pas']:.0f} collisions/pas, "
+          f"{embouteillage['ms_par_pas']:.2f} ms/pas, "
+          f"{embouteillage['evenements_par_seconde']:.0f} événements/s")
+    database = resultats['database']
+    print(f"Base : {database['insertions_par_seconde']:.0f} insertions/s, "
+          f"log_event {database['log_event_us']:.1f} µs, "
+          f"mise en file -> commit {database['latence_commit_moyenne_ms']:.1f} ms "
+          f"(max {database['latence_commit_max_ms']:.1f} ms)")
+    for nom, valeurs in resultats['sinks'].items():
+        print(f"  {nom:<9}: {valeurs['insertions_par_seconde']:9.0f} insertions/s, "
+              f"{valeurs['octets_par_evenement']:5.1f} octets/événement")
+    rendu = resultats.get('rendu')
+    if rendu:
+        if rendu['disponible']:
+            print(f"Rendu : {rendu['ms_par_image_mediane']:.2f} ms/image")
+        else:
+            print(f"Rendu : non mesuré ({rendu['raison']})")
+    print(f"-> {args.sortie}")
+
+    if args.comparer:
+        with open(args.comparer, encoding="utf-8") as fichier:
+            reference = json.load(fichier)
+        regressions = comparer(reference, document, args.seuil)
+        for chemin, ancienne, valeur, perte in regressions:
+            print(f"RÉGRESSION {chemin} : {ancienne:.3f} -> {valeur:.3f} ({perte:+.0%})")
+        if regressions:
+            sys.exit(1)
+        print("Aucune régression")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Module de gestion du temps de simulation
+Fournit les horloges utilisées par tout le moteur (feux, apparitions, alertes)
+"""
+
+import time
+
+
+class RealTimeClock:
+    """Horloge temps réel : le temps de simulation suit l'horloge murale
+
+    Utilisée par l'interface graphique, où le trafic doit défiler à la
+    vitesse réelle.
+    """
+
+    def now(self):
+        """Retourne le temps courant en secondes"""
+        return time.time()
+
+    def now_ns(self):
+        """Retourne un temps monotone en nanosecondes (horodatage du journal)"""
+        return time.monotonic_ns()
+
+    def tick(self):
+        """Rien à faire : le temps réel avance tout seul"""
+        pass
+
+
+class SimulatedClock:
+    """Horloge simulée à pas fixe
+
+    Le temps n'avance que lorsque le moteur appelle tick(), d'un pas
+    constant : la simulation tourne alors aussi vite que le processeur
+    le permet, indépendamment de l'horloge murale.
+    """
+
+    def __init__(self, pas=0.03, depart=None):
+        self.pas = pas
+        self.pas_ns = round(pas * 1e9)
+        # Partir de l'heure actuelle garde des horodatages lisibles en base.
+        # Le temps est compté en nanosecondes entières : pas de dérive des
+        # flottants sur les longues exécutions.
+        self._ns = time.time_ns() if depart is None else round(depart * 1e9)
+
+    def now(self):
+        """Retourne le temps simulé courant en secondes"""
+        return self._ns / 1e9
+
+    def now_ns(self):
+        """Retourne le temps simulé courant en nanosecondes"""
+        return self._ns
+
+    def tick(self):
+        """Avance le temps simulé d'un pas"""
+        self._ns += self.pas_ns
+
+
+class SharedClockView:
+    """Vue en lecture d'une horloge avancée par un autre
+
+    tick() ne fait rien : les carrefours d'une partition du réseau lisent
+    la même horloge, que le moteur de la partition avance une seule fois
+    par pas (voir network).
+    """
+
+    def __init__(self, horloge):
+        self.horloge = horloge
+
+    def now(self):
+        """Retourne le temps courant de l'horloge partagée"""
+        return self.horloge.now()
+
+    def now_ns(self):
+        """Retourne le temps courant de l'horloge partagée, en nanosecondes"""
+        return self.horloge.now_ns()
+
+    def tick(self):
+        """Rien à faire : le propriétaire de l'horloge la fait avancer"""
+        pass
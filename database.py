@@ -3,92 +3,197 @@ Module de gestion de la base de données SQLite
 Gère la journalisation de tous les événements de la simulation
 """
 
-import sqlite3
-import threading
-import queue
+import itertools
 from datetime import datetime
 
+from clock import RealTimeClock
+from event_queue import BLOCK
+from log_sinks import SQLiteSink, ProcessSink
+
 
 class DatabaseManager:
-    """Gestionnaire de base de données SQLite pour la journalisation"""
+    """Point d'entrée de la journalisation : exécutions et événements
+    
+    log_event diffuse chaque événement à toutes les destinations actives
+    (voir log_sinks), chacune avec sa file bornée et son thread d'écriture
+    par lots. Par défaut, la seule destination est la base SQLite
+    `db_name` : lots de batch_size événements au plus, écrits toutes les
+    flush_interval secondes au moins dans une seule transaction, en mode
+    WAL avec un niveau `synchronous` configurable.
+    
+    Chaque événement porte le run_id de l'exécution en cours (table runs) ;
+    les collisions, violations et changements de feu sont en plus recopiés
+    dans leurs tables typées par des déclencheurs.
+    
+    Le journal est encodé : les textes répétitifs deviennent des codes
+    entiers (attribués par le thread d'écriture) et l'horodatage est le
+    temps de l'horloge en nanosecondes, sans formatage sur le chemin
+    critique. La vue `evenements` garde la forme lisible.
+    
+    La file d'attente est bornée à `max_queue` événements ; au-delà,
+    `overflow_policy` décide (voir event_queue) et queue_stats() indique
+    ce qui a été sacrifié.
+    
+    `sinks` ajoute d'autres destinations (JSON Lines, anneau en mémoire,
+    fichier en colonnes) ; avec db_name=None, elles sont les seules et
+    les run_id sont simplement numérotés en mémoire.
     
-    def __init__(self, db_name="simulation_trafic.db"):
+    `log_policy` (voir log_policy), si elle est fournie, fixe un niveau
+    par type_action en amont des files : détail, échantillonnage ou
+    simples agrégats par fenêtre (table agregats_evenements).
+    
+    `partition` et `retention` (secondes) répartissent le journal brut en
+    un fichier par période et suppriment les plus anciens (voir
+    partitions) ; les cumuls par minute et par heure restent en base.
+    
+    Avec `processus`, la base est écrite par un processus séparé (voir
+    ProcessSink) : la charge de journalisation ne prend plus le GIL de la
+    simulation et de l'interface. Les appels à log_event ne changent pas.
+    
+    log_many ajoute d'un seul appel plusieurs événements de même type,
+    datés du même instant (les collisions d'un pas, par exemple).
+    """
+    
+    def __init__(self, db_name="simulation_trafic.db", clock=None,
+                 batch_size=500, flush_interval=0.5, synchronous="NORMAL",
+                 max_queue=100000, overflow_policy=BLOCK, sample_rates=None,
+                 run_description=None, log_policy=None, sinks=None,
+                 partition=None, retention=None, processus=False):
         self.db_name = db_name
-        self.queue = queue.Queue()
-        self.init_database()
+        self.clock = clock or RealTimeClock()
+        self.sqlite = None
+        self.ecrivain_bd = None
+        if db_name is not None:
+            options = dict(batch_size=batch_size, flush_interval=flush_interval,
+                           max_queue=max_queue, overflow_policy=overflow_policy,
+                           sample_rates=sample_rates)
+            # Dans ce processus, le SQLiteSink prépare le schéma et sert aux
+            # exécutions (table runs) ; l'écrivain peut être ailleurs
+            self.sqlite = SQLiteSink(db_name, synchronous, partition=partition,
+                                     retention=retention, **options)
+            self.ecrivain_bd = self.sqlite
+            if processus:
+                self.ecrivain_bd = ProcessSink(SQLiteSink, {
+                    'db_name': db_name,
+                    'synchronous': synchronous,
+                    'partition': partition,
+                    'retention': retention,
+                }, **options)
+        self.sinks = ([self.ecrivain_bd] if self.ecrivain_bd is not None else []) + list(sinks or [])
+        if not self.sinks:
+            raise ValueError("Aucune destination de journalisation")
+        self.log_policy = log_policy
+        self._numeros_run = itertools.count(1)
+        self.run_id = None
+        self.start_run(run_description)
         self.start_worker()
     
-    def init_database(self):
-        """Initialise la base de données et crée les tables"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
+    def _timestamp(self):
+        """Horodatage texte de l'instant courant de l'horloge"""
+        return datetime.fromtimestamp(self.clock.now()).strftime("%Y-%m-%d %H:%M:%S")
+    
+    def start_run(self, description=None):
+        """Clôt l'exécution courante et en ouvre une nouvelle
         
-        # Table principale des événements
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS evenements (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                type_action TEXT NOT NULL,
-                action TEXT NOT NULL,
-                etat_feu TEXT,
-                scenario TEXT,
-                id_voiture INTEGER,
-                position_x REAL,
-                position_y REAL,
-                vitesse REAL
-            )
-        ''')
+        Les événements journalisés ensuite portent le nouveau run_id ;
+        debut_epoch et debut_ns relient leurs horodatages en nanosecondes
+        à l'heure murale.
+        """
+        self._vider_agregats()
+        self.end_run()
+        self.run_id = self.open_run(description)
+        return self.run_id
+    
+    def open_run(self, description=None):
+        """Crée une exécution sans en faire l'exécution courante
         
-        conn.commit()
+        Sert aux journaux qui partagent ce gestionnaire avec leur propre
+        run_id (par exemple une intersection d'un réseau, voir network).
+        """
+        if self.sqlite is None:
+            return next(self._numeros_run)
+        conn = self.sqlite.connect()
+        with conn:
+            cursor = conn.execute('''
+                INSERT INTO runs (debut, description, debut_epoch, debut_ns)
+                VALUES (?, ?, ?, ?)
+            ''', (self._timestamp(), description, self.clock.now(), self.clock.now_ns()))
+        conn.close()
+        return cursor.lastrowid
+    
+    def end_run(self, run_id=None):
+        """Note l'heure de fin d'une exécution (la courante par défaut)"""
+        run_id = self.run_id if run_id is None else run_id
+        if run_id is None or self.sqlite is None:
+            return
+        conn = self.sqlite.connect()
+        with conn:
+            conn.execute("UPDATE runs SET fin = ? WHERE run_id = ?",
+                         (self._timestamp(), run_id))
         conn.close()
     
     def log_event(self, type_action, action, **kwargs):
-        """Ajoute un événement à la file d'attente"""
+        """Ajoute un événement aux files des destinations"""
         event = {
-            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'ts_ns': self.clock.now_ns(),
+            'run_id': self.run_id,
             'type_action': type_action,
             'action': action,
             **kwargs
         }
-        self.queue.put(event)
+        self._diffuser(event)
     
-    def _worker(self):
-        """Thread worker pour l'écriture asynchrone dans la BD"""
-        conn = sqlite3.connect(self.db_name)
+    def log_many(self, type_action, action, run_id=None, **colonnes):
+        """Ajoute un événement par ligne de `colonnes`, tous au même instant
         
-        while True:
-            try:
-                event = self.queue.get(timeout=1)
-                if event is None:
-                    break
-                
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO evenements 
-                    (timestamp, type_action, action, etat_feu, scenario, id_voiture, position_x, position_y, vitesse)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    event.get('timestamp'),
-                    event.get('type_action'),
-                    event.get('action'),
-                    event.get('etat_feu'),
-                    event.get('scenario'),
-                    event.get('id_voiture'),
-                    event.get('position_x'),
-                    event.get('position_y'),
-                    event.get('vitesse')
-                ))
-                
-                conn.commit()
-                
-            except queue.Empty:
-                continue
-            except Exception as e:
-                print(f"Erreur BD: {e}")
-        
-        conn.close()
+        Chaque colonne est une séquence de valeurs Python de même longueur
+        (tableau.tolist()) ; `run_id` remplace celui de l'exécution en cours.
+        """
+        ts_ns = self.clock.now_ns()
+        run_id = self.run_id if run_id is None else run_id
+        noms = list(colonnes)
+        for valeurs in zip(*colonnes.values()):
+            event = dict(zip(noms, valeurs))
+            event.update(ts_ns=ts_ns, run_id=run_id, type_action=type_action, action=action)
+            self._diffuser(event)
+    
+    def _diffuser(self, event):
+        """Met un événement dans la file de chaque destination"""
+        if self.log_policy is None:
+            for sink in self.sinks:
+                sink.put(event)
+        else:
+            for element in self.log_policy.filtrer(event):
+                for sink in self.sinks:
+                    sink.put(element)
+    
+    def _vider_agregats(self):
+        """Met en file les agrégats de la fenêtre en cours"""
+        if self.log_policy is not None:
+            for ligne in self.log_policy.vider():
+                for sink in self.sinks:
+                    sink.put(ligne)
     
     def start_worker(self):
-        """Démarre le thread de journalisation"""
-        worker_thread = threading.Thread(target=self._worker, daemon=True)
-        worker_thread.start()
+        """Démarre les threads d'écriture des destinations"""
+        for sink in self.sinks:
+            sink.start()
+    
+    def queue_stats(self):
+        """Profondeur, pic, événements rejetés et latence d'ajout de la file
+        
+        File de la première destination (la base si elle est active) ;
+        sink_stats() donne toutes les destinations.
+        """
+        return self.sinks[0].stats()
+    
+    def sink_stats(self):
+        """Compteurs de charge de chaque destination, par nom"""
+        return {sink.nom: sink.stats() for sink in self.sinks}
+    
+    def close(self):
+        """Vide les files d'attente puis arrête les threads d'écriture"""
+        self._vider_agregats()
+        for sink in self.sinks:
+            sink.close()
+        self.end_run()
@@ -0,0 +1,949 @@
+"""
+Module du schéma de la base de données
+Crée les tables, vues et déclencheurs du journal et migre les anciennes bases
+
+Le journal brut (journal_evenements) ne contient que des entiers : les textes
+répétitifs (type d'action, action, état du feu, scénario, direction) sont
+remplacés par des codes définis dans des tables de correspondance, et
+l'horodatage est un nombre de nanosecondes de l'horloge de simulation. La vue
+`evenements` restitue la forme lisible historique. Des tables de résumé
+(stats_*) et de cumul (rollups_*) sont tenues à jour à chaque lot écrit
+(ResumesJournal).
+"""
+
+import collections
+
+
+# Colonnes texte encodées par dictionnaire : colonne -> table de correspondance
+DICTIONNAIRES = {
+    'type_action': 'types_action',
+    'action': 'actions',
+    'etat_feu': 'etats_feu',
+    'scenario': 'scenarios',
+    'direction': 'directions',
+}
+
+# Codes fixes des types d'action, utilisés directement par les déclencheurs
+TYPES_ACTION = {
+    'SYSTEME': 1,
+    'FEU': 2,
+    'VOITURE': 3,
+    'COLLISION': 4,
+    'VIOLATION': 5,
+}
+
+TABLES_TYPEES = ('collisions', 'violations', 'changements_feu_tricolore')
+
+# Colonnes du journal brut, dans l'ordre de la table
+COLONNES_JOURNAL = ('id', 'run_id', 'ts_ns', 'type_action', 'action', 'etat_feu', 'scenario',
+                    'id_voiture', 'position_x', 'position_y', 'vitesse', 'direction')
+
+
+def _colonnes(cursor, table):
+    """Noms des colonnes d'une table (liste vide si elle n'existe pas)"""
+    return [ligne[1] for ligne in cursor.execute(f"PRAGMA table_info({table})")]
+
+
+def _type_objet(cursor, nom):
+    """'table', 'view'... ou None si l'objet n'existe pas"""
+    ligne = cursor.execute("SELECT type FROM sqlite_master WHERE name = ?",
+                           (nom,)).fetchone()
+    return ligne[0] if ligne else None
+
+
+def init_schema(cursor):
+    """Crée (ou migre) tout le schéma ; retourne True si une migration a eu lieu
+
+    Le tout forme une seule transaction, à ouvrir hors transaction : une
+    erreur en cours de route ne laisse ni schéma à moitié migré ni
+    résumés incomplets. Elle prend d'emblée le verrou d'écriture
+    (IMMEDIATE) : plusieurs processus qui ouvrent la même base en WAL
+    attendent leur tour au lieu d'échouer sur un instantané périmé.
+    """
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        migration = _creer_schema(cursor)
+    except BaseException:
+        cursor.execute("ROLLBACK")
+        raise
+    cursor.execute("COMMIT")
+    return migration
+
+
+def _creer_schema(cursor):
+    """Corps de init_schema"""
+    _create_runs(cursor)
+    _create_dictionnaires(cursor)
+
+    # Journal brut, entièrement numérique
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS journal_evenements (
+            id INTEGER PRIMARY KEY,
+            run_id INTEGER REFERENCES runs(run_id),
+            ts_ns INTEGER NOT NULL,
+            type_action INTEGER NOT NULL REFERENCES types_action(code),
+            action INTEGER NOT NULL REFERENCES actions(code),
+            etat_feu INTEGER REFERENCES etats_feu(code),
+            scenario INTEGER REFERENCES scenarios(code),
+            id_voiture INTEGER,
+            position_x REAL,
+            position_y REAL,
+            vitesse REAL,
+            direction INTEGER REFERENCES directions(code)
+        )
+    ''')
+    if 'direction' not in _colonnes(cursor, 'journal_evenements'):
+        cursor.execute('''
+            ALTER TABLE journal_evenements
+            ADD COLUMN direction INTEGER REFERENCES directions(code)
+        ''')
+
+    migration = False
+    if _type_objet(cursor, 'evenements') == 'table':
+        _migrate_evenements(cursor)
+        migration = True
+
+    # Index des requêtes par exécution
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_journal_run_type_temps
+        ON journal_evenements (run_id, type_action, ts_ns)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_journal_run_voiture
+        ON journal_evenements (run_id, id_voiture)
+    ''')
+
+    _create_tables_typees(cursor)
+    if migration:
+        _backfill_tables_typees(cursor)
+    _create_vue_evenements(cursor)
+    _create_agregats(cursor)
+    derives_nouveaux = _type_objet(cursor, 'rollups_minute') is None
+    # Base qui tenait résumés et cumuls par déclencheurs : ils sont recalculés
+    # (trg_rollups_agregats découpait alors les tranches sur l'horloge du journal)
+    if any(_type_objet(cursor, nom) is not None for nom in ANCIENS_DECLENCHEURS):
+        for nom in ANCIENS_DECLENCHEURS + ('trg_rollups_agregats',):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {nom}")
+        derives_nouveaux = True
+    _create_stats(cursor)
+    _create_rollups(cursor)
+    if derives_nouveaux:
+        _rejouer_journal(cursor)
+    return migration
+
+
+def create_journal_partition(cursor, schema):
+    """Journal brut d'une partition (base attachée sous le nom `schema`)
+
+    Mêmes colonnes que journal_evenements ; les codes renvoient aux
+    dictionnaires de la base principale.
+    """
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {schema}.journal_evenements (
+            id INTEGER PRIMARY KEY,
+            run_id INTEGER,
+            ts_ns INTEGER NOT NULL,
+            type_action INTEGER NOT NULL,
+            action INTEGER NOT NULL,
+            etat_feu INTEGER,
+            scenario INTEGER,
+            id_voiture INTEGER,
+            position_x REAL,
+            position_y REAL,
+            vitesse REAL,
+            direction INTEGER
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE INDEX IF NOT EXISTS {schema}.idx_journal_run_type_temps
+        ON journal_evenements (run_id, type_action, ts_ns)
+    ''')
+
+
+def _create_runs(cursor):
+    """Table des exécutions ; debut_epoch/debut_ns relient l'horloge du journal à l'heure murale"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS runs (
+            run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            debut DATETIME,
+            fin DATETIME,
+            description TEXT,
+            debut_epoch REAL,
+            debut_ns INTEGER
+        )
+    ''')
+    colonnes = _colonnes(cursor, 'runs')
+    if 'debut_epoch' not in colonnes:
+        cursor.execute("ALTER TABLE runs ADD COLUMN debut_epoch REAL")
+        cursor.execute("ALTER TABLE runs ADD COLUMN debut_ns INTEGER")
+        cursor.execute('''
+            UPDATE runs SET debut_epoch = CAST(strftime('%s', debut, 'utc') AS REAL),
+                            debut_ns = 0
+        ''')
+
+
+def _create_dictionnaires(cursor):
+    """Tables de correspondance code <-> libellé"""
+    for table in DICTIONNAIRES.values():
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                code INTEGER PRIMARY KEY,
+                libelle TEXT NOT NULL UNIQUE
+            )
+        ''')
+    cursor.executemany("INSERT OR IGNORE INTO types_action (code, libelle) VALUES (?, ?)",
+                       [(code, libelle) for libelle, code in TYPES_ACTION.items()])
+
+
+def _migrate_evenements(cursor):
+    """Convertit l'ancienne table texte evenements vers le journal encodé
+
+    Les événements sans run_id (bases d'avant la table runs) sont
+    rattachés à une exécution unique « Historique importé ». Les anciens
+    horodatages texte deviennent des nanosecondes depuis le début de leur
+    exécution.
+    """
+    if 'run_id' not in _colonnes(cursor, 'evenements'):
+        cursor.execute("ALTER TABLE evenements ADD COLUMN run_id INTEGER")
+    debut, fin = cursor.execute('''
+        SELECT MIN(timestamp), MAX(timestamp) FROM evenements WHERE run_id IS NULL
+    ''').fetchone()
+    if debut is not None:
+        cursor.execute('''
+            INSERT INTO runs (debut, fin, description, debut_epoch, debut_ns)
+            VALUES (?, ?, 'Historique importé', CAST(strftime('%s', ?, 'utc') AS REAL), 0)
+        ''', (debut, fin, debut))
+        cursor.execute("UPDATE evenements SET run_id = ? WHERE run_id IS NULL",
+                       (cursor.lastrowid,))
+
+    colonnes = _colonnes(cursor, 'evenements')
+    for colonne, table in DICTIONNAIRES.items():
+        if colonne not in colonnes:
+            continue
+        cursor.execute(f'''
+            INSERT OR IGNORE INTO {table} (libelle)
+            SELECT DISTINCT {colonne} FROM evenements WHERE {colonne} IS NOT NULL
+        ''')
+
+    cursor.execute('''
+        INSERT INTO journal_evenements
+        (id, run_id, ts_ns, type_action, action, etat_feu, scenario,
+         id_voiture, position_x, position_y, vitesse)
+        SELECT e.id, e.run_id,
+               CAST((CAST(strftime('%s', e.timestamp, 'utc') AS INTEGER)
+                     - COALESCE(r.debut_epoch, 0)) * 1000000000 AS INTEGER)
+               + COALESCE(r.debut_ns, 0),
+               t.code, a.code, f.code, s.code,
+               e.id_voiture, e.position_x, e.position_y, e.vitesse
+        FROM evenements e
+        LEFT JOIN runs r ON r.run_id = e.run_id
+        LEFT JOIN types_action t ON t.libelle = e.type_action
+        LEFT JOIN actions a ON a.libelle = e.action
+        LEFT JOIN etats_feu f ON f.libelle = e.etat_feu
+        LEFT JOIN scenarios s ON s.libelle = e.scenario
+        ORDER BY e.id
+    ''')
+
+    # Les tables typées sont des données dérivées : reconstruites ensuite
+    for table in TABLES_TYPEES:
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+    cursor.execute("DROP TABLE evenements")
+
+
+def _create_tables_typees(cursor):
+    """Tables typées, alimentées par déclencheurs depuis le journal"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS collisions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            evenement_id INTEGER REFERENCES journal_evenements(id),
+            run_id INTEGER REFERENCES runs(run_id),
+            ts_ns INTEGER,
+            id_voiture INTEGER,
+            position_x REAL,
+            position_y REAL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS violations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            evenement_id INTEGER REFERENCES journal_evenements(id),
+            run_id INTEGER REFERENCES runs(run_id),
+            ts_ns INTEGER,
+            id_voiture INTEGER,
+            position_x REAL,
+            position_y REAL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS changements_feu_tricolore (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            evenement_id INTEGER REFERENCES journal_evenements(id),
+            run_id INTEGER REFERENCES runs(run_id),
+            ts_ns INTEGER,
+            action TEXT,
+            axe TEXT,
+            etat TEXT,
+            etat_feu TEXT
+        )
+    ''')
+    for table in TABLES_TYPEES:
+        cursor.execute(f'''
+            CREATE INDEX IF NOT EXISTS idx_{table}_run_temps
+            ON {table} (run_id, ts_ns)
+        ''')
+
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_journal_collision
+        AFTER INSERT ON journal_evenements WHEN NEW.type_action = {TYPES_ACTION['COLLISION']}
+        BEGIN
+            INSERT INTO collisions
+            (evenement_id, run_id, ts_ns, id_voiture, position_x, position_y)
+            VALUES (NEW.id, NEW.run_id, NEW.ts_ns, NEW.id_voiture,
+                    NEW.position_x, NEW.position_y);
+        END;
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_journal_violation
+        AFTER INSERT ON journal_evenements WHEN NEW.type_action = {TYPES_ACTION['VIOLATION']}
+        BEGIN
+            INSERT INTO violations
+            (evenement_id, run_id, ts_ns, id_voiture, position_x, position_y)
+            VALUES (NEW.id, NEW.run_id, NEW.ts_ns, NEW.id_voiture,
+                    NEW.position_x, NEW.position_y);
+        END;
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_journal_feu
+        AFTER INSERT ON journal_evenements WHEN NEW.type_action = {TYPES_ACTION['FEU']}
+        BEGIN
+            INSERT INTO changements_feu_tricolore
+            (evenement_id, run_id, ts_ns, action, axe, etat, etat_feu)
+            SELECT NEW.id, NEW.run_id, NEW.ts_ns,
+                   (SELECT libelle FROM actions WHERE code = NEW.action),
+                   {_SQL_AXE.format(e='f.libelle')},
+                   {_SQL_ETAT.format(e='f.libelle')},
+                   f.libelle
+            FROM (SELECT (SELECT libelle FROM etats_feu WHERE code = NEW.etat_feu) AS libelle) f;
+        END;
+    ''')
+
+
+# 'NS:VERT' -> axe NS, état VERT ; un changement manuel ('NS:ROUGE, EO:VERT')
+# ne garde que etat_feu
+_SQL_AXE = ("CASE WHEN instr({e}, ',') = 0 "
+            "THEN substr({e}, 1, instr({e}, ':') - 1) END")
+_SQL_ETAT = ("CASE WHEN instr({e}, ',') = 0 "
+             "THEN substr({e}, instr({e}, ':') + 1) END")
+
+
+def _backfill_tables_typees(cursor):
+    """Recopie l'historique migré dans les tables typées"""
+    for table, type_action in (('collisions', 'COLLISION'), ('violations', 'VIOLATION')):
+        cursor.execute(f'''
+            INSERT INTO {table}
+            (evenement_id, run_id, ts_ns, id_voiture, position_x, position_y)
+            SELECT id, run_id, ts_ns, id_voiture, position_x, position_y
+            FROM journal_evenements WHERE type_action = ?
+        ''', (TYPES_ACTION[type_action],))
+    cursor.execute(f'''
+        INSERT INTO changements_feu_tricolore
+        (evenement_id, run_id, ts_ns, action, axe, etat, etat_feu)
+        SELECT j.id, j.run_id, j.ts_ns, a.libelle,
+               {_SQL_AXE.format(e='f.libelle')},
+               {_SQL_ETAT.format(e='f.libelle')},
+               f.libelle
+        FROM journal_evenements j
+        LEFT JOIN actions a ON a.code = j.action
+        LEFT JOIN etats_feu f ON f.code = j.etat_feu
+        WHERE j.type_action = ?
+    ''', (TYPES_ACTION['FEU'],))
+
+
+# Forme lisible d'une table de journal ({journal}) : vue `evenements`, et
+# vue temporaire qui y ajoute les partitions (voir partitions)
+SQL_VUE_EVENEMENTS = '''
+        SELECT j.id AS id,
+               datetime(r.debut_epoch + (j.ts_ns - r.debut_ns) / 1e9,
+                        'unixepoch', 'localtime') AS timestamp,
+               t.libelle AS type_action,
+               a.libelle AS action,
+               f.libelle AS etat_feu,
+               s.libelle AS scenario,
+               j.id_voiture AS id_voiture,
+               j.position_x AS position_x,
+               j.position_y AS position_y,
+               j.vitesse AS vitesse,
+               j.run_id AS run_id,
+               j.ts_ns AS ts_ns,
+               d.libelle AS direction
+        FROM {journal} j
+        LEFT JOIN runs r ON r.run_id = j.run_id
+        LEFT JOIN types_action t ON t.code = j.type_action
+        LEFT JOIN actions a ON a.code = j.action
+        LEFT JOIN etats_feu f ON f.code = j.etat_feu
+        LEFT JOIN scenarios s ON s.code = j.scenario
+        LEFT JOIN directions d ON d.code = j.direction
+'''
+
+
+def _create_vue_evenements(cursor):
+    """Vue `evenements` : forme lisible historique du journal encodé
+
+    Recréée à chaque ouverture pour suivre les colonnes ajoutées au journal.
+    """
+    cursor.execute("DROP VIEW IF EXISTS evenements")
+    cursor.execute("CREATE VIEW evenements AS "
+                   + SQL_VUE_EVENEMENTS.format(journal='journal_evenements'))
+
+
+def _create_agregats(cursor):
+    """Agrégats par fenêtre des événements non détaillés (voir log_policy)
+
+    `nombre` compte tous les événements de la fenêtre, `detailles` ceux
+    qui figurent aussi dans le journal. La direction est codée comme dans
+    le journal ; une ancienne table, où elle était en clair, est
+    reconstruite (ses déclencheurs sont recréés ensuite).
+    """
+    cursor.execute("DROP VIEW IF EXISTS agregats")
+    types = {ligne[1]: ligne[2] for ligne
+             in cursor.execute("PRAGMA table_info(agregats_evenements)")}
+    direction_texte = types.get('direction') == 'TEXT'
+    if direction_texte:
+        cursor.execute("ALTER TABLE agregats_evenements RENAME TO agregats_evenements_texte")
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS agregats_evenements (
+            id INTEGER PRIMARY KEY,
+            run_id INTEGER REFERENCES runs(run_id),
+            debut_ns INTEGER NOT NULL,
+            fin_ns INTEGER NOT NULL,
+            type_action INTEGER NOT NULL REFERENCES types_action(code),
+            action INTEGER NOT NULL REFERENCES actions(code),
+            direction INTEGER REFERENCES directions(code),
+            nombre INTEGER NOT NULL,
+            detailles INTEGER NOT NULL
+        )
+    ''')
+    if direction_texte:
+        cursor.execute('''
+            INSERT OR IGNORE INTO directions (libelle)
+            SELECT DISTINCT direction FROM agregats_evenements_texte WHERE direction IS NOT NULL
+        ''')
+        cursor.execute('''
+            INSERT INTO agregats_evenements
+            (id, run_id, debut_ns, fin_ns, type_action, action, direction, nombre, detailles)
+            SELECT g.id, g.run_id, g.debut_ns, g.fin_ns, g.type_action, g.action, d.code,
+                   g.nombre, g.detailles
+            FROM agregats_evenements_texte g
+            LEFT JOIN directions d ON d.libelle = g.direction
+        ''')
+        cursor.execute("DROP TABLE agregats_evenements_texte")
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_agregats_run_temps
+        ON agregats_evenements (run_id, debut_ns)
+    ''')
+    cursor.execute('''
+        CREATE VIEW agregats AS
+        SELECT g.run_id AS run_id,
+               datetime(r.debut_epoch + (g.debut_ns - r.debut_ns) / 1e9,
+                        'unixepoch', 'localtime') AS debut,
+               (g.fin_ns - g.debut_ns) / 1e9 AS duree_s,
+               t.libelle AS type_action,
+               a.libelle AS action,
+               d.libelle AS direction,
+               g.nombre AS nombre,
+               g.detailles AS detailles
+        FROM agregats_evenements g
+        LEFT JOIN runs r ON r.run_id = g.run_id
+        LEFT JOIN types_action t ON t.code = g.type_action
+        LEFT JOIN actions a ON a.code = g.action
+        LEFT JOIN directions d ON d.code = g.direction
+    ''')
+
+
+# Actions appariées pour le calcul des attentes au feu rouge
+ACTION_ARRET = 'Arrêt au feu rouge'
+ACTION_REDEMARRAGE = 'Redémarrage au feu vert'
+
+# Compteurs communs aux résumés par exécution, par scénario et par direction
+_SQL_COMPTEURS = '''
+            evenements INTEGER NOT NULL DEFAULT 0,
+            collisions INTEGER NOT NULL DEFAULT 0,
+            violations INTEGER NOT NULL DEFAULT 0,
+            arrets INTEGER NOT NULL DEFAULT 0,
+            attentes INTEGER NOT NULL DEFAULT 0,
+            attente_ns INTEGER NOT NULL DEFAULT 0'''
+TABLES_STATS = ('stats_runs', 'stats_scenarios', 'stats_directions', 'stats_phases',
+                'attentes_en_cours', 'feux_en_cours')
+_SQL_CUMUL = '''evenements = evenements + excluded.evenements,
+                collisions = collisions + excluded.collisions,
+                violations = violations + excluded.violations,
+                arrets = arrets + excluded.arrets'''
+_SQL_CUMUL_ATTENTES = _SQL_CUMUL + ''',
+                attentes = attentes + excluded.attentes,
+                attente_ns = attente_ns + excluded.attente_ns'''
+
+# Lignes du journal lues à la fois quand il est rejoué
+TAILLE_LOT_REJEU = 5000
+
+# Déclencheurs qui tenaient résumés et cumuls à chaque insertion dans le
+# journal, remplacés par ResumesJournal
+ANCIENS_DECLENCHEURS = ('trg_stats_journal', 'trg_stats_feux', 'trg_rollups_journal')
+
+# Écart (ns) à ajouter au ts_ns d'une exécution pour obtenir son heure
+# murale (epoch) : ts_ns suit l'horloge monotone avec RealTimeClock. Arrondi
+# à la milliseconde, debut_epoch (REAL) n'étant pas plus précis : nul avec
+# SimulatedClock, dont ts_ns est déjà l'heure epoch
+_SQL_DECALAGE = "CAST(round((debut_epoch * 1e9 - debut_ns) / 1e6) AS INTEGER) * 1000000"
+
+
+def _create_stats(cursor):
+    """Tables de résumé
+
+    stats_runs, stats_scenarios et stats_directions comptent événements,
+    collisions, violations, arrêts au rouge et attentes (d'un arrêt au
+    redémarrage suivant du même véhicule) ; stats_phases cumule la durée
+    de chaque état de feu par axe. Les tableaux de bord les lisent en temps
+    constant (voir analytics) au lieu de parcourir le journal.
+
+    ResumesJournal les tient à jour à chaque lot du journal ; les lignes
+    d'agrégat y sont ajoutées par déclencheur.
+
+    attentes_en_cours et feux_en_cours sont des tables de travail : arrêt
+    non encore apparié de chaque véhicule, état courant de chaque axe.
+    """
+
+    arret, = _codes_actions(cursor, ACTION_ARRET)
+    est_arret = f"(NEW.type_action = {TYPES_ACTION['VOITURE']} AND NEW.action = {arret})"
+
+    def valeurs(n):
+        """evenements, collisions, violations, arrets pour n événements comme NEW"""
+        return (f"{n}, {n} * (NEW.type_action = {TYPES_ACTION['COLLISION']}), "
+                f"{n} * (NEW.type_action = {TYPES_ACTION['VIOLATION']}), {n} * {est_arret}")
+
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS stats_runs (
+            run_id INTEGER PRIMARY KEY REFERENCES runs(run_id),
+            scenario INTEGER REFERENCES scenarios(code),
+            dernier_ns INTEGER,{_SQL_COMPTEURS}
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS stats_scenarios (
+            run_id INTEGER NOT NULL REFERENCES runs(run_id),
+            scenario INTEGER NOT NULL REFERENCES scenarios(code),{_SQL_COMPTEURS},
+            PRIMARY KEY (run_id, scenario)
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS stats_directions (
+            run_id INTEGER NOT NULL REFERENCES runs(run_id),
+            direction INTEGER NOT NULL REFERENCES directions(code),{_SQL_COMPTEURS},
+            PRIMARY KEY (run_id, direction)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stats_phases (
+            run_id INTEGER NOT NULL REFERENCES runs(run_id),
+            axe TEXT NOT NULL,
+            etat TEXT NOT NULL,
+            nombre INTEGER NOT NULL,
+            duree_ns INTEGER NOT NULL,
+            PRIMARY KEY (run_id, axe, etat)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS attentes_en_cours (
+            run_id INTEGER NOT NULL,
+            id_voiture INTEGER NOT NULL,
+            debut_ns INTEGER NOT NULL,
+            PRIMARY KEY (run_id, id_voiture)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS feux_en_cours (
+            run_id INTEGER NOT NULL,
+            axe TEXT NOT NULL,
+            etat TEXT NOT NULL,
+            depuis_ns INTEGER NOT NULL,
+            PRIMARY KEY (run_id, axe)
+        ) WITHOUT ROWID
+    ''')
+
+    # Axes d'un état de feu : 'NS:ROUGE, EO:VERT' -> (NS, ROUGE), (EO, VERT)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS etats_feu_axes (
+            code INTEGER NOT NULL REFERENCES etats_feu(code),
+            axe TEXT NOT NULL,
+            etat TEXT NOT NULL,
+            PRIMARY KEY (code, axe)
+        ) WITHOUT ROWID
+    ''')
+    etats = cursor.execute("SELECT code, libelle FROM etats_feu").fetchall()
+    cursor.executemany("INSERT OR IGNORE INTO etats_feu_axes (code, axe, etat) VALUES (?, ?, ?)",
+                       [(code, axe, etat) for code, libelle in etats
+                        for axe, etat in _axes(libelle)])
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_etats_feu_axes
+        AFTER INSERT ON etats_feu WHEN instr(NEW.libelle, ':') > 0
+        BEGIN
+            INSERT OR IGNORE INTO etats_feu_axes (code, axe, etat)
+            SELECT NEW.code, substr(p, 1, instr(p, ':') - 1), substr(p, instr(p, ':') + 1)
+            FROM (SELECT CASE WHEN instr(NEW.libelle, ',') > 0
+                              THEN substr(NEW.libelle, 1, instr(NEW.libelle, ',') - 1)
+                              ELSE NEW.libelle END AS p
+                  UNION ALL
+                  SELECT substr(NEW.libelle, instr(NEW.libelle, ',') + 2)
+                  WHERE instr(NEW.libelle, ',') > 0);
+        END;
+    ''')
+
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_stats_agregats
+        AFTER INSERT ON agregats_evenements
+        WHEN NEW.run_id IS NOT NULL AND NEW.nombre > NEW.detailles
+        BEGIN
+            -- Événements comptés sans figurer dans le journal
+            INSERT INTO stats_runs (run_id, evenements, collisions, violations, arrets)
+            SELECT NEW.run_id, {valeurs('(NEW.nombre - NEW.detailles)')}
+            WHERE true
+            ON CONFLICT (run_id) DO UPDATE SET
+                {_SQL_CUMUL};
+
+            INSERT INTO stats_scenarios (run_id, scenario, evenements, collisions, violations, arrets)
+            SELECT NEW.run_id, scenario, {valeurs('(NEW.nombre - NEW.detailles)')}
+            FROM stats_runs WHERE run_id = NEW.run_id AND scenario IS NOT NULL
+            ON CONFLICT (run_id, scenario) DO UPDATE SET
+                {_SQL_CUMUL};
+
+            INSERT INTO stats_directions (run_id, direction, evenements, collisions, violations, arrets)
+            SELECT NEW.run_id, NEW.direction, {valeurs('(NEW.nombre - NEW.detailles)')}
+            WHERE NEW.direction IS NOT NULL
+            ON CONFLICT (run_id, direction) DO UPDATE SET
+                {_SQL_CUMUL};
+        END;
+    ''')
+
+
+def _codes_actions(cursor, *libelles):
+    """Codes des actions, ajoutées au dictionnaire au besoin
+
+    Déclencheurs et résumés y figent ces codes : une comparaison d'entiers
+    par événement plutôt qu'une recherche de libellé.
+    """
+    cursor.executemany("INSERT OR IGNORE INTO actions (libelle) VALUES (?)",
+                       [(libelle,) for libelle in libelles])
+    return [cursor.execute("SELECT code FROM actions WHERE libelle = ?", (libelle,)).fetchone()[0]
+            for libelle in libelles]
+
+
+def _axes(libelle):
+    """Couples (axe, état) d'un libellé d'état de feu"""
+    if ':' not in libelle:
+        return []
+    return [tuple(partie.split(':', 1)) for partie in libelle.split(', ')]
+
+
+class ResumesJournal:
+    """Tient à jour résumés (stats_*) et cumuls (rollups_*) à chaque lot du journal
+
+    cumuler() reçoit les lignes qu'un lot vient d'insérer dans
+    journal_evenements (tuples dans l'ordre de COLONNES_JOURNAL, par id
+    croissant), calcule en mémoire ce qu'elles ajoutent à chaque résumé
+    puis l'écrit d'une requête par table : quelques instructions par lot
+    au lieu d'un déclencheur par ligne. À appeler dans la transaction du
+    lot, qui le rend atomique avec le journal.
+
+    Le scénario d'une exécution est le dernier journalisé, à défaut celui
+    qui la décrit (runs.description) ; chaque événement compte pour le
+    scénario en cours à son instant. Une attente va d'un arrêt au rouge
+    au redémarrage suivant du même véhicule, même d'un lot à l'autre
+    (attentes_en_cours) ; une phase de feu se clôt quand l'état de son axe
+    change (feux_en_cours).
+
+    Les tranches des cumuls sont alignées sur l'heure murale (UTC) de
+    l'événement, déduite de son exécution (runs.debut_epoch et debut_ns),
+    quelle que soit l'horloge du journal ; debut_ns reste sur cette
+    horloge, comme ts_ns.
+    """
+
+    def __init__(self, cursor):
+        self.arret, self.redemarrage, *apparitions = _codes_actions(
+            cursor, ACTION_ARRET, ACTION_REDEMARRAGE, *ACTIONS_APPARITION)
+        self.apparitions = set(apparitions)
+        self.decalages = {}       # run_id -> écart à l'heure murale (ns)
+
+    def cumuler(self, cursor, lignes):
+        """Ajoute aux résumés les lignes d'un lot"""
+        lignes = [ligne for ligne in lignes if ligne[1] is not None]
+        if not lignes:
+            return
+        voiture = TYPES_ACTION['VOITURE']
+        collision = TYPES_ACTION['COLLISION']
+        violation = TYPES_ACTION['VIOLATION']
+        feu = TYPES_ACTION['FEU']
+        tranches = [(table, duree * 1_000_000_000) for table, duree in ROLLUPS.items()]
+
+        # État au début du lot
+        runs = {ligne[1] for ligne in lignes}
+        scenarios = {run_id: self._scenario(cursor, run_id) for run_id in runs}
+        attentes = self._attentes(cursor, [
+            (ligne[1], ligne[7]) for ligne in lignes
+            if ligne[3] == voiture and ligne[4] == self.redemarrage and ligne[7] is not None])
+        feux = {}
+        axes = {}
+        for run_id in {ligne[1] for ligne in lignes if ligne[5] is not None}:
+            for axe, etat, depuis_ns in cursor.execute(
+                    "SELECT axe, etat, depuis_ns FROM feux_en_cours WHERE run_id = ?", (run_id,)):
+                feux[(run_id, axe)] = (etat, depuis_ns)
+
+        # compteurs : evenements, collisions, violations, arrets, attentes, attente_ns
+        par_run = collections.defaultdict(lambda: [0] * 6)
+        par_scenario = collections.defaultdict(lambda: [0] * 6)
+        par_direction = collections.defaultdict(lambda: [0] * 6)
+        derniers = {}
+        phases = collections.defaultdict(lambda: [0, 0])
+        # (table, run_id, debut_ns) -> apparitions, arrets, collisions, violations,
+        # changements_feu
+        cumuls = collections.defaultdict(lambda: [0] * 5)
+        terminees = set()
+        feux_modifies = set()
+        for _, run_id, ts_ns, type_action, action, etat_feu, scenario, id_voiture, \
+                _, _, _, direction in lignes:
+            if scenario is not None:
+                scenarios[run_id] = scenario
+            scenario = scenarios[run_id]
+            derniers[run_id] = max(derniers.get(run_id, ts_ns), ts_ns)
+            arret = type_action == voiture and action == self.arret
+            compteurs = [par_run[run_id]]
+            if scenario is not None:
+                compteurs.append(par_scenario[(run_id, scenario)])
+            if direction is not None:
+                compteurs.append(par_direction[(run_id, direction)])
+            for compteur in compteurs:
+                compteur[0] += 1
+                compteur[1] += type_action == collision
+                compteur[2] += type_action == violation
+                compteur[3] += arret
+
+            if type_action == voiture and action == self.redemarrage:
+                debut_ns = attentes.pop((run_id, id_voiture), None)
+                terminees.add((run_id, id_voiture))
+                if debut_ns is not None:
+                    for compteur in compteurs:
+                        compteur[4] += 1
+                        compteur[5] += ts_ns - debut_ns
+            elif arret and id_voiture is not None:
+                attentes[(run_id, id_voiture)] = ts_ns
+
+            if etat_feu is not None:
+                if etat_feu not in axes:
+                    axes[etat_feu] = cursor.execute(
+                        "SELECT axe, etat FROM etats_feu_axes WHERE code = ?",
+                        (etat_feu,)).fetchall()
+                for axe, etat in axes[etat_feu]:
+                    courant = feux.get((run_id, axe))
+                    if courant is not None and courant[0] == etat:
+                        continue
+                    if courant is not None:
+                        phase = phases[(run_id, axe, courant[0])]
+                        phase[0] += 1
+                        phase[1] += ts_ns - courant[1]
+                    feux[(run_id, axe)] = (etat, ts_ns)
+                    feux_modifies.add((run_id, axe))
+
+            apparition = type_action == voiture and action in self.apparitions
+            if apparition or arret or type_action in (collision, violation, feu):
+                mural_ns = ts_ns + self._decalage(cursor, run_id)
+                for table, tranche_ns in tranches:
+                    cumul = cumuls[(table, run_id, ts_ns - mural_ns % tranche_ns)]
+                    cumul[0] += apparition
+                    cumul[1] += arret
+                    cumul[2] += type_action == collision
+                    cumul[3] += type_action == violation
+                    cumul[4] += type_action == feu
+
+        cursor.executemany(f'''
+            INSERT INTO stats_runs
+            (run_id, scenario, dernier_ns, evenements, collisions, violations, arrets,
+             attentes, attente_ns)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (run_id) DO UPDATE SET
+                scenario = excluded.scenario,
+                dernier_ns = max(coalesce(dernier_ns, excluded.dernier_ns), excluded.dernier_ns),
+                {_SQL_CUMUL_ATTENTES}
+        ''', [(run_id, scenarios[run_id], derniers[run_id], *compteur)
+              for run_id, compteur in par_run.items()])
+        for table, colonne, compteurs in (('stats_scenarios', 'scenario', par_scenario),
+                                          ('stats_directions', 'direction', par_direction)):
+            cursor.executemany(f'''
+                INSERT INTO {table}
+                (run_id, {colonne}, evenements, collisions, violations, arrets,
+                 attentes, attente_ns)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (run_id, {colonne}) DO UPDATE SET
+                    {_SQL_CUMUL_ATTENTES}
+            ''', [(*cle, *compteur) for cle, compteur in compteurs.items()])
+        cursor.executemany('''
+            INSERT INTO stats_phases (run_id, axe, etat, nombre, duree_ns)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (run_id, axe, etat) DO UPDATE SET
+                nombre = nombre + excluded.nombre,
+                duree_ns = duree_ns + excluded.duree_ns
+        ''', [(*cle, *phase) for cle, phase in phases.items()])
+        for table, _ in tranches:
+            cursor.executemany(f'''
+                INSERT INTO {table}
+                (run_id, debut_ns, apparitions, arrets, collisions, violations, changements_feu)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                {_SQL_CUMUL_ROLLUP}
+            ''', [(run_id, debut_ns, *cumul) for (nom, run_id, debut_ns), cumul in cumuls.items()
+                  if nom == table])
+
+        cursor.executemany("DELETE FROM attentes_en_cours WHERE run_id = ? AND id_voiture = ?",
+                           terminees)
+        cursor.executemany('''
+            INSERT OR REPLACE INTO attentes_en_cours (run_id, id_voiture, debut_ns)
+            VALUES (?, ?, ?)
+        ''', [(*cle, debut_ns) for cle, debut_ns in attentes.items()])
+        cursor.executemany('''
+            INSERT OR REPLACE INTO feux_en_cours (run_id, axe, etat, depuis_ns)
+            VALUES (?, ?, ?, ?)
+        ''', [(*cle, *feux[cle]) for cle in feux_modifies])
+
+    def _decalage(self, cursor, run_id):
+        """Écart à l'heure murale d'une exécution (0 si son début est inconnu)"""
+        decalage = self.decalages.get(run_id)
+        if decalage is None:
+            ligne = cursor.execute(f"SELECT {_SQL_DECALAGE} FROM runs WHERE run_id = ?",
+                                   (run_id,)).fetchone()
+            if ligne is None or ligne[0] is None:
+                return 0
+            decalage = self.decalages[run_id] = ligne[0]
+        return decalage
+
+    @staticmethod
+    def _scenario(cursor, run_id):
+        """Scénario en cours d'une exécution (runs.description si elle n'a pas de résumé)"""
+        ligne = cursor.execute("SELECT scenario FROM stats_runs WHERE run_id = ?",
+                               (run_id,)).fetchone()
+        if ligne is None:
+            ligne = cursor.execute('''
+                SELECT s.code FROM runs r JOIN scenarios s ON s.libelle = r.description
+                WHERE r.run_id = ?
+            ''', (run_id,)).fetchone()
+        return ligne[0] if ligne else None
+
+    @staticmethod
+    def _attentes(cursor, cles):
+        """{(run_id, id_voiture): debut_ns} des arrêts en cours parmi `cles`"""
+        attentes = {}
+        for cle in set(cles):
+            ligne = cursor.execute('''
+                SELECT debut_ns FROM attentes_en_cours WHERE run_id = ? AND id_voiture = ?
+            ''', cle).fetchone()
+            if ligne is not None:
+                attentes[cle] = ligne[0]
+        return attentes
+
+
+def _rejouer_journal(cursor):
+    """Calcule les données dérivées d'une base existante en rejouant son journal
+
+    Tables typées, résumés et cumuls sont vidés, puis le journal et les
+    agrégats sont réinsérés dans l'ordre des id : les déclencheurs
+    recalculent les tables typées, ResumesJournal résumés et cumuls, lot
+    par lot.
+    """
+    if cursor.execute("SELECT 1 FROM journal_evenements LIMIT 1").fetchone() is None:
+        return
+    for table in TABLES_TYPEES + TABLES_STATS + tuple(ROLLUPS):
+        cursor.execute(f"DELETE FROM {table}")
+    resumes = ResumesJournal(cursor)
+    for table in ('journal_evenements', 'agregats_evenements'):
+        cursor.execute(f"CREATE TEMP TABLE copie_{table} AS SELECT * FROM {table}")
+        cursor.execute(f"DELETE FROM {table}")
+        cursor.execute(f"INSERT INTO {table} SELECT * FROM copie_{table} ORDER BY id")
+        cursor.execute(f"DROP TABLE copie_{table}")
+        if table == 'journal_evenements':
+            lecture = cursor.connection.execute("SELECT * FROM journal_evenements ORDER BY id")
+            while True:
+                lignes = lecture.fetchmany(TAILLE_LOT_REJEU)
+                if not lignes:
+                    break
+                resumes.cumuler(cursor, lignes)
+
+
+# Actions comptées comme apparitions de véhicules
+ACTIONS_APPARITION = ('Création véhicule', 'Réapparition véhicule')
+
+# Tables de cumul par tranche de temps : table -> durée de la tranche (s)
+ROLLUPS = {
+    'rollups_minute': 60,
+    'rollups_heure': 3600,
+}
+
+_SQL_CUMUL_ROLLUP = '''ON CONFLICT (run_id, debut_ns) DO UPDATE SET
+                apparitions = apparitions + excluded.apparitions,
+                arrets = arrets + excluded.arrets,
+                collisions = collisions + excluded.collisions,
+                violations = violations + excluded.violations,
+                changements_feu = changements_feu + excluded.changements_feu;'''
+
+
+def _create_rollups(cursor):
+    """Cumuls par minute et par heure
+
+    Pour chaque exécution et chaque tranche (alignée sur l'heure murale,
+    debut_ns sur l'horloge du journal) : véhicules apparus, arrêts au
+    rouge, collisions, violations et changements de feu. ResumesJournal
+    les tient à jour à chaque lot du journal, un déclencheur à chaque
+    ligne d'agrégat. Ces tables restent quand la rétention supprime le
+    journal brut (voir partitions).
+    """
+    creation, reapparition, arret = _codes_actions(cursor, *ACTIONS_APPARITION, ACTION_ARRET)
+    voiture = TYPES_ACTION['VOITURE']
+    comptes = (f"(NEW.type_action IN ({TYPES_ACTION['FEU']}, {TYPES_ACTION['COLLISION']}, "
+               f"{TYPES_ACTION['VIOLATION']}) OR (NEW.type_action = {voiture} "
+               f"AND NEW.action IN ({creation}, {reapparition}, {arret})))")
+
+    def valeurs(n):
+        """apparitions, arrets, collisions, violations, changements_feu pour n événements"""
+        return (f"{n} * (NEW.type_action = {voiture} AND NEW.action IN ({creation}, {reapparition})), "
+                f"{n} * (NEW.type_action = {voiture} AND NEW.action = {arret}), "
+                f"{n} * (NEW.type_action = {TYPES_ACTION['COLLISION']}), "
+                f"{n} * (NEW.type_action = {TYPES_ACTION['VIOLATION']}), "
+                f"{n} * (NEW.type_action = {TYPES_ACTION['FEU']})")
+
+    decalage = f"coalesce((SELECT {_SQL_DECALAGE} FROM runs WHERE run_id = NEW.run_id), 0)"
+    cumuls_agregats = []
+    for table, duree in ROLLUPS.items():
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                run_id INTEGER NOT NULL REFERENCES runs(run_id),
+                debut_ns INTEGER NOT NULL,
+                apparitions INTEGER NOT NULL,
+                arrets INTEGER NOT NULL,
+                collisions INTEGER NOT NULL,
+                violations INTEGER NOT NULL,
+                changements_feu INTEGER NOT NULL,
+                PRIMARY KEY (run_id, debut_ns)
+            ) WITHOUT ROWID
+        ''')
+        tranche_ns = duree * 1_000_000_000
+        cumuls_agregats.append(f'''
+            INSERT INTO {table}
+            (run_id, debut_ns, apparitions, arrets, collisions, violations, changements_feu)
+            VALUES (NEW.run_id, NEW.debut_ns - (NEW.debut_ns + {decalage}) % {tranche_ns},
+                    {valeurs('(NEW.nombre - NEW.detailles)')})
+            {_SQL_CUMUL_ROLLUP}''')
+
+    # Une ligne d'agrégat compte dans la tranche où commence sa fenêtre
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_rollups_agregats
+        AFTER INSERT ON agregats_evenements
+        WHEN NEW.run_id IS NOT NULL AND NEW.nombre > NEW.detailles AND {comptes}
+        BEGIN{''.join(cumuls_agregats)}
+        END;
+    ''')
@@ -0,0 +1,163 @@
+"""
+Module de file d'événements bornée
+File d'attente à capacité fixe entre la simulation et l'écrivain de la base,
+avec politiques de débordement et compteurs de charge
+"""
+
+import collections
+import queue
+import random
+import threading
+import time
+
+
+# Politiques de débordement
+BLOCK = "block"              # l'appelant attend qu'une place se libère
+DROP_OLDEST = "drop_oldest"  # l'événement le plus ancien est sacrifié
+DROP_NEWEST = "drop_newest"  # le nouvel événement est rejeté
+SAMPLE = "sample"            # échantillonnage par type_action, puis rejet
+
+POLITIQUES = (BLOCK, DROP_OLDEST, DROP_NEWEST, SAMPLE)
+
+# Taux par défaut de la politique SAMPLE : les événements de véhicules,
+# très fréquents, sont sacrifiés en premier ; FEU et SYSTEME sont gardés
+TAUX_ECHANTILLONNAGE_DEFAUT = {
+    'VOITURE': 0.1,
+    'COLLISION': 0.5,
+    'VIOLATION': 0.5,
+}
+
+
+class BoundedEventQueue:
+    """File d'événements bornée, compatible avec l'usage de queue.Queue
+
+    Avec la politique SAMPLE, dès que la file est remplie au-delà de
+    `seuil_echantillonnage` (fraction de la capacité), un événement dont le
+    type figure dans `taux_echantillonnage` n'est accepté qu'avec la
+    probabilité indiquée (les autres types passent toujours) ; une fois la
+    file pleine, les nouveaux événements sont rejetés.
+
+    La sentinelle None d'arrêt est toujours acceptée et jamais sacrifiée.
+
+    Chaque élément garde l'instant (time.perf_counter) de sa mise en file :
+    après get(), `dernier_depot` est celui de l'élément retiré.
+    """
+
+    def __init__(self, capacite=100000, politique=BLOCK, taux_echantillonnage=None,
+                 seuil_echantillonnage=0.5, graine=None):
+        if politique not in POLITIQUES:
+            raise ValueError(f"Politique de débordement inconnue : {politique}")
+        self.capacite = capacite
+        self.politique = politique
+        if taux_echantillonnage is None:
+            taux_echantillonnage = TAUX_ECHANTILLONNAGE_DEFAUT
+        self.taux_echantillonnage = taux_echantillonnage
+        self.seuil_echantillonnage = int(capacite * seuil_echantillonnage)
+        self._aleatoire = random.Random(graine)
+
+        # (instant de mise en file, événement)
+        self._elements = collections.deque()
+        self.dernier_depot = None
+        self._verrou = threading.Lock()
+        self._non_vide = threading.Condition(self._verrou)
+        self._non_plein = threading.Condition(self._verrou)
+
+        # Compteurs
+        self.ajoutes = 0
+        self.pic = 0
+        self.rejetes = 0
+        self.rejetes_par_type = collections.Counter()
+        self.latence_totale = 0.0
+        self.latence_max = 0.0
+
+    def _rejeter(self, event):
+        """Comptabilise un événement sacrifié (verrou tenu)"""
+        self.rejetes += 1
+        self.rejetes_par_type[event.get('type_action')] += 1
+
+    def put(self, event):
+        """Ajoute un événement selon la politique de débordement"""
+        debut = time.perf_counter()
+        with self._verrou:
+            if event is not None:
+                if not self._admettre(event):
+                    self._mesurer(debut)
+                    return False
+            self._elements.append((debut, event))
+            if event is not None:
+                self.ajoutes += 1
+            self.pic = max(self.pic, len(self._elements))
+            self._non_vide.notify()
+            self._mesurer(debut)
+            return True
+
+    def _admettre(self, event):
+        """Applique la politique ; retourne False si l'événement est rejeté"""
+        if self.politique == SAMPLE and len(self._elements) >= self.seuil_echantillonnage:
+            taux = self.taux_echantillonnage.get(event.get('type_action'), 1.0)
+            if self._aleatoire.random() >= taux:
+                self._rejeter(event)
+                return False
+
+        if len(self._elements) < self.capacite:
+            return True
+
+        if self.politique == BLOCK:
+            while len(self._elements) >= self.capacite:
+                self._non_plein.wait()
+            return True
+        if self.politique == DROP_OLDEST:
+            # La sentinelle d'arrêt n'est jamais sacrifiée
+            for position, (_, ancien) in enumerate(self._elements):
+                if ancien is not None:
+                    del self._elements[position]
+                    self._rejeter(ancien)
+                    break
+            return True
+
+        # DROP_NEWEST, ou SAMPLE avec une file pleine
+        self._rejeter(event)
+        return False
+
+    def _mesurer(self, debut):
+        """Enregistre la latence d'ajout (verrou tenu)"""
+        latence = time.perf_counter() - debut
+        self.latence_totale += latence
+        self.latence_max = max(self.latence_max, latence)
+
+    def get(self, timeout=None):
+        """Retire le plus ancien événement ; lève queue.Empty après `timeout`"""
+        with self._verrou:
+            if not self._non_vide.wait_for(lambda: self._elements, timeout):
+                raise queue.Empty
+            self.dernier_depot, event = self._elements.popleft()
+            self._non_plein.notify()
+            return event
+
+    def get_nowait(self):
+        """Retire le plus ancien événement sans attendre"""
+        with self._verrou:
+            if not self._elements:
+                raise queue.Empty
+            self.dernier_depot, event = self._elements.popleft()
+            self._non_plein.notify()
+            return event
+
+    def qsize(self):
+        """Profondeur courante de la file"""
+        return len(self._elements)
+
+    def stats(self):
+        """Instantané des compteurs de charge"""
+        with self._verrou:
+            tentatives = self.ajoutes + self.rejetes
+            return {
+                'profondeur': len(self._elements),
+                'capacite': self.capacite,
+                'pic': self.pic,
+                'ajoutes': self.ajoutes,
+                'rejetes': self.rejetes,
+                'rejetes_par_type': dict(self.rejetes_par_type),
+                'latence_moyenne': self.latence_totale / tentatives if tentatives else 0.0,
+                'latence_max': self.latence_max,
+            }
@@ -0,0 +1,311 @@
+"""
+Module d'export du journal d'événements
+Écrit les événements d'une base en CSV (gzip si la sortie finit par .gz)
+ou dans le format par colonnes de log_sinks, compressé bloc par bloc. Les
+lignes sont lues par paquets (fetchmany) et écrites au fil de l'eau : la
+mémoire reste bornée quelle que soit la taille du journal, partitions
+comprises (voir partitions)
+
+UTILISATION:
+    python export.py --db simulation_trafic.db --run-id 3 --sortie run3.csv.gz
+    python export.py --run-id 3 --type COLLISION --type VIOLATION --sortie incidents.csv
+    python export.py --debut "2026-10-18 08:00:00" --fin "2026-10-18 09:00:00" \\
+        --format colonnes --sortie pointe.col
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import sqlite3
+import time
+from datetime import datetime
+
+import numpy as np
+
+from db_schema import COLONNES_JOURNAL, DICTIONNAIRES, TYPES_ACTION
+from log_sinks import COLONNES, LIBELLES, SIGNATURE_COMPRESSEE, bloc_colonnes
+from partitions import fichiers_partitions
+
+
+# Lignes lues à chaque fetchmany (et par bloc du format par colonnes)
+TAILLE_PAQUET = 50000
+
+# Niveau zlib des blocs par colonnes : rapide, l'essentiel du gain est là
+NIVEAU_COMPRESSION = 1
+
+# Niveau gzip du CSV (9, le défaut de gzip, allonge la durée de moitié)
+NIVEAU_GZIP = 6
+
+# Colonnes du CSV, dans l'ordre de la vue evenements
+COLONNES_CSV = ('id', 'timestamp', 'type_action', 'action', 'etat_feu', 'scenario',
+                'id_voiture', 'position_x', 'position_y', 'vitesse', 'run_id', 'ts_ns',
+                'direction')
+
+FORMAT_DATE = "%Y-%m-%d %H:%M:%S"
+
+
+def _epoch(texte):
+    """Secondes epoch d'une date locale 'AAAA-MM-JJ HH:MM:SS'"""
+    return datetime.strptime(texte, FORMAT_DATE).timestamp()
+
+
+class Filtres:
+    """Sélection des événements à exporter
+
+    `run_ids` et `types` (libellés de TYPES_ACTION) restreignent aux
+    exécutions et types donnés ; `debut` et `fin` (secondes epoch, fin
+    exclue) à une plage d'heure murale, convertie pour chaque exécution en
+    plage de ts_ns. Sans filtre, tout le journal est exporté.
+    """
+
+    def __init__(self, run_ids=None, debut=None, fin=None, types=None):
+        self.run_ids = list(run_ids) if run_ids else None
+        self.debut = debut
+        self.fin = fin
+        self.types = None
+        if types:
+            inconnus = [libelle for libelle in types if libelle not in TYPES_ACTION]
+            if inconnus:
+                raise ValueError(f"Type d'action inconnu : {', '.join(inconnus)}")
+            self.types = [TYPES_ACTION[libelle] for libelle in types]
+
+    def clauses(self, debuts_runs):
+        """[(WHERE, paramètres)] : une requête par exécution si besoin
+
+        `debuts_runs` associe à chaque run_id (debut_epoch, debut_ns).
+        """
+        base, parametres = [], []
+        if self.types:
+            base.append(f"type_action IN ({', '.join('?' * len(self.types))})")
+            parametres.extend(self.types)
+        if self.run_ids is None and self.debut is None and self.fin is None:
+            return [(" AND ".join(base) or "1", parametres)]
+
+        run_ids = self.run_ids if self.run_ids is not None else sorted(debuts_runs)
+        requetes = []
+        for run_id in run_ids:
+            conditions, valeurs = ["run_id = ?"] + base, [run_id] + parametres
+            if self.debut is not None or self.fin is not None:
+                debut_epoch, debut_ns = debuts_runs.get(run_id, (None, None))
+                if debut_epoch is None:
+                    continue
+                for borne, operateur in ((self.debut, ">="), (self.fin, "<")):
+                    if borne is not None:
+                        conditions.append(f"ts_ns {operateur} ?")
+                        valeurs.append(debut_ns + int(round((borne - debut_epoch) * 1e9)))
+            requetes.append((" AND ".join(conditions), valeurs))
+        return requetes
+
+
+def _debuts_runs(conn):
+    """run_id -> (debut_epoch, debut_ns)"""
+    return {run_id: (debut_epoch, debut_ns) for run_id, debut_epoch, debut_ns
+            in conn.execute("SELECT run_id, debut_epoch, debut_ns FROM runs")}
+
+
+def _libelles(conn):
+    """colonne -> {code: libellé}, pour chaque dictionnaire"""
+    return {colonne: dict(conn.execute(f"SELECT code, libelle FROM {table}"))
+            for colonne, table in DICTIONNAIRES.items()}
+
+
+def lire_paquets(db_name, filtres=None, taille=TAILLE_PAQUET):
+    """Paquets de lignes brutes du journal (colonnes COLONNES_JOURNAL)
+
+    Parcourt la base principale puis chaque partition, une connexion à la
+    fois. Chaque paquet compte au plus `taille` lignes ; les dictionnaires
+    restent sous forme de codes.
+    """
+    filtres = filtres or Filtres()
+    conn = sqlite3.connect(db_name)
+    try:
+        requetes = filtres.clauses(_debuts_runs(conn))
+    finally:
+        conn.close()
+    colonnes = ", ".join(COLONNES_JOURNAL)
+    sources = [db_name] + [chemin for _, chemin in fichiers_partitions(db_name)]
+    for source in sources:
+        conn = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+        try:
+            for where, parametres in requetes:
+                curseur = conn.execute(f"SELECT {colonnes} FROM journal_evenements "
+                                       f"WHERE {where} ORDER BY id", parametres)
+                while True:
+                    paquet = curseur.fetchmany(taille)
+                    if not paquet:
+                        break
+                    yield paquet
+        finally:
+            conn.close()
+
+
+def _agregats(conn, filtres, libelles, taille=TAILLE_PAQUET):
+    """Lignes d'agrégat retenues par les filtres, au format de log_policy
+
+    Générateur : les lignes sont lues par paquets de `taille`.
+    """
+    debuts_runs = _debuts_runs(conn)
+    for where, parametres in filtres.clauses(debuts_runs):
+        # Les bornes de ts_ns s'appliquent au début de la fenêtre
+        where = where.replace("ts_ns", "debut_ns")
+        curseur = conn.execute(f'''
+            SELECT run_id, debut_ns, fin_ns, type_action, action, direction, nombre, detailles
+            FROM agregats_evenements WHERE {where} ORDER BY id
+        ''', parametres)
+        while True:
+            paquet = curseur.fetchmany(taille)
+            if not paquet:
+                break
+            for run_id, debut_ns, fin_ns, type_action, action, direction, nombre, detailles \
+                    in paquet:
+                yield {
+                    'agregat': True,
+                    'run_id': run_id,
+                    'debut_ns': debut_ns,
+                    'fin_ns': fin_ns,
+                    'type_action': libelles['type_action'].get(type_action),
+                    'action': libelles['action'].get(action),
+                    'direction': libelles['direction'].get(direction),
+                    'nombre': nombre,
+                    'detailles': detailles,
+                }
+
+
+def exporter_csv(db_name, sortie, filtres=None, taille=TAILLE_PAQUET):
+    """Écrit les événements retenus en CSV, libellés décodés
+
+    Retourne le nombre de lignes écrites.
+    """
+    conn = sqlite3.connect(db_name)
+    try:
+        libelles = _libelles(conn)
+        debuts_runs = _debuts_runs(conn)
+    finally:
+        conn.close()
+    rang = COLONNES_JOURNAL.index
+    dictionnaires = [(rang(colonne), libelles[colonne]) for colonne in DICTIONNAIRES]
+    i_run, i_ts = rang('run_id'), rang('ts_ns')
+    # Position de chaque colonne du CSV dans la ligne brute (None : horodatage)
+    ordre = [None if colonne == 'timestamp' else rang(colonne) for colonne in COLONNES_CSV]
+
+    # L'horodatage change au plus une fois par seconde : formaté une fois
+    seconde, horodatage = None, None
+
+    if sortie.endswith(".gz"):
+        fichier = gzip.open(sortie, "wt", NIVEAU_GZIP, newline="", encoding="utf-8")
+    else:
+        fichier = open(sortie, "w", newline="", encoding="utf-8")
+    nombre = 0
+    with fichier:
+        ecrivain = csv.writer(fichier)
+        ecrivain.writerow(COLONNES_CSV)
+        for paquet in lire_paquets(db_name, filtres, taille):
+            lignes = []
+            for brute in paquet:
+                ligne = list(brute)
+                for indice, codes in dictionnaires:
+                    ligne[indice] = codes.get(ligne[indice])
+                debut_epoch, debut_ns = debuts_runs.get(ligne[i_run], (None, None))
+                if debut_epoch is not None:
+                    courante = int(debut_epoch + (ligne[i_ts] - debut_ns) / 1e9)
+                    if courante != seconde:
+                        seconde = courante
+                        horodatage = time.strftime(FORMAT_DATE, time.localtime(courante))
+                    ligne.append(horodatage)
+                else:
+                    ligne.append(None)
+                lignes.append([ligne[-1] if position is None else ligne[position]
+                               for position in ordre])
+            ecrivain.writerows(lignes)
+            nombre += len(lignes)
+    return nombre
+
+
+def exporter_colonnes(db_name, sortie, filtres=None, taille=TAILLE_PAQUET,
+                      compression=NIVEAU_COMPRESSION):
+    """Écrit les événements retenus au format par colonnes compressé
+
+    Même disposition que ColumnarSink, chaque colonne d'un bloc compressée
+    par zlib ; les codes des dictionnaires sont ceux de la base, leurs
+    libellés et les agrégats retenus vont dans `sortie`.json, écrits eux
+    aussi au fil de l'eau. Relire avec log_sinks.lire_blocs() et
+    lire_annexe(). Retourne le nombre de lignes écrites.
+    """
+    filtres = filtres or Filtres()
+    conn = sqlite3.connect(db_name)
+    try:
+        libelles = _libelles(conn)
+    finally:
+        conn.close()
+    for colonne, dtype in COLONNES:
+        if colonne in LIBELLES and max(libelles[colonne], default=0) > np.iinfo(dtype).max:
+            raise ValueError(f"Trop de libellés de {colonne} pour une colonne {dtype}")
+
+    indices = [COLONNES_JOURNAL.index(colonne) for colonne, _ in COLONNES]
+    nombre = 0
+    with open(sortie, "wb") as fichier:
+        fichier.write(SIGNATURE_COMPRESSEE)
+        for paquet in lire_paquets(db_name, filtres, taille):
+            colonnes = {}
+            valeurs_colonnes = list(zip(*paquet))
+            for (colonne, dtype), indice in zip(COLONNES, indices):
+                valeurs = valeurs_colonnes[indice]
+                if colonne in LIBELLES:
+                    colonnes[colonne] = [0 if v is None else v for v in valeurs]
+                elif dtype.startswith('<f'):
+                    colonnes[colonne] = [np.nan if v is None else v for v in valeurs]
+                else:
+                    colonnes[colonne] = [-1 if v is None else v for v in valeurs]
+            fichier.write(bloc_colonnes(colonnes, len(paquet), compression))
+            nombre += len(paquet)
+
+    # Le libellé du code k est en position k - 1 (None pour les codes absents)
+    listes = {}
+    for colonne in LIBELLES:
+        codes = libelles[colonne]
+        listes[colonne] = [codes.get(code) for code in range(1, max(codes, default=0) + 1)]
+    conn = sqlite3.connect(db_name)
+    try:
+        with open(sortie + ".json", "w", encoding="utf-8") as fichier:
+            fichier.write('{"libelles": ' + json.dumps(listes, ensure_ascii=False)
+                          + ', "agregats": [')
+            for numero, agregat in enumerate(_agregats(conn, filtres, libelles, taille)):
+                fichier.write((", " if numero else "") + json.dumps(agregat, ensure_ascii=False))
+            fichier.write("]}")
+    finally:
+        conn.close()
+    return nombre
+
+
+def main():
+    """Point d'entrée en ligne de commande"""
+    parser = argparse.ArgumentParser(description="Export du journal d'événements")
+    parser.add_argument('--db', default="simulation_trafic.db")
+    parser.add_argument('--sortie', required=True,
+                        help="fichier de sortie (CSV compressé en gzip si .gz)")
+    parser.add_argument('--format', choices=('csv', 'colonnes'), default='csv')
+    parser.add_argument('--run-id', type=int, action='append',
+                        help="exécution à exporter (répétable, toutes par défaut)")
+    parser.add_argument('--debut', type=_epoch, metavar='"AAAA-MM-JJ HH:MM:SS"',
+                        help="heure locale du premier événement exporté")
+    parser.add_argument('--fin', type=_epoch, metavar='"AAAA-MM-JJ HH:MM:SS"',
+                        help="heure locale de fin (exclue)")
+    parser.add_argument('--type', action='append', choices=sorted(TYPES_ACTION),
+                        help="type d'action à exporter (répétable, tous par défaut)")
+    parser.add_argument('--taille-paquet', type=int, default=TAILLE_PAQUET,
+                        help="lignes lues à chaque fetchmany")
+    args = parser.parse_args()
+
+    filtres = Filtres(run_ids=args.run_id, debut=args.debut, fin=args.fin, types=args.type)
+    debut = time.perf_counter()
+    if args.format == 'csv':
+        nombre = exporter_csv(args.db, args.sortie, filtres, args.taille_paquet)
+    else:
+        nombre = exporter_colonnes(args.db, args.sortie, filtres, args.taille_paquet)
+    print(f"{nombre} événements exportés vers {args.sortie} "
+          f"en {time.perf_counter() - debut:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,8 @@ Gère les boutons de contrôle et l'affichage des informations
 
 import turtle
 
+from retained import RetainedLayer
+
 
 class Button:
     """Bouton cliquable dans l'interface"""
@@ -64,10 +66,10 @@ class GUI:
         self.simulation = simulation
         self.screen = screen
         self.buttons = []
-        self.status_turtle = turtle.Turtle()
-        self.status_turtle.hideturtle()
+        self.layer = RetainedLayer(screen)
         self._draw_sidebar()
         self._create_buttons()
+        self._create_status()
         self.screen.onclick(self._handle_click)
     
     def _draw_sidebar(self):
@@ -180,34 +182,55 @@ class GUI:
                 button.click()
                 break
     
-    def update_status(self):
-        """Met à jour l'affichage des informations"""
-        self.status_turtle.clear()
-        self.status_turtle.penup()
-        self.status_turtle.color("#2c3e50")
-        
+    def _create_status(self):
+        """Crée une fois les textes du panneau d'état (libellés fixes, valeurs vides)"""
         start_x = -480
         start_y = -250
         line_height = 25
         
-        def write_line(y, label, value):
-            self.status_turtle.goto(start_x, y)
-            self.status_turtle.write(label, align="left", font=("Arial", 11, "bold"))
-            self.status_turtle.goto(start_x + 120, y)
-            self.status_turtle.write(value, align="left", font=("Arial", 11))
-        
-        # Afficher les informations
-        write_line(start_y, "Scénario:", self.simulation.scenario.name)
-        
+        self.status_values = {}
+        for k, (cle, label) in enumerate([('scenario', "Scénario:"), ('etat', "État:"),
+                                          ('vehicules', "Véhicules:"), ('feux', "Feux:"),
+                                          ('collisions', "Collisions:")]):
+            y = start_y - k * line_height
+            self.layer.text(start_x, y, label, font=("Arial", 11, "bold"), fill="#2c3e50")
+            self.status_values[cle] = self.layer.text(start_x + 120, y, "", font=("Arial", 11),
+                                                      fill="#2c3e50")
+        
+        self.layer.text(-480, 330, "Phases (ms)   moy   p95   max",
+                        font=("Courier", 9, "bold"), fill="#2c3e50")
+        self.phase_lines = []
+    
+    def update_status(self):
+        """Met à jour l'affichage des informations (seuls les textes modifiés)"""
         status = '▶ EN COURS' if self.simulation.running else '⏹ ARRÊTÉ'
         if self.simulation.paused:
             status = '⏸ EN PAUSE'
-        write_line(start_y - line_height, "État:", status)
-        
-        write_line(start_y - 2*line_height, "Véhicules:", str(len(self.simulation.vehicles)))
         
         feux_info = f"NS: {self.simulation.traffic_light.etat_ns.value}"
         feux_info += f" / EO: {self.simulation.traffic_light.etat_eo.value}"
-        write_line(start_y - 3*line_height, "Feux:", feux_info)
         
-        write_line(start_y - 4*line_height, "Collisions:", str(self.simulation.collisions))
+        values = self.status_values
+        values['scenario'].set(text=self.simulation.scenario.name)
+        values['etat'].set(text=status)
+        values['vehicules'].set(text=str(len(self.simulation.vehicles)))
+        values['feux'].set(text=feux_info)
+        values['collisions'].set(text=str(self.simulation.collisions))
+        
+        self._write_phases()
+    
+    def _write_phases(self):
+        """Durées par phase de la dernière fenêtre (moyenne / p95 / max, en ms)"""
+        start_x = -480
+        start_y = 330
+        line_height = 18
+        
+        summary = self.simulation.profiler.summary()
+        while len(self.phase_lines) < len(summary):
+            y = start_y - (len(self.phase_lines) + 1) * line_height
+            self.phase_lines.append(self.layer.text(start_x, y, "", font=("Courier", 9),
+                                                    fill="#2c3e50"))
+        for line, (nom, moyenne, p95, maximum) in zip(self.phase_lines, summary):
+            # Au-delà du budget d'une image (30 ms), la phase est en rouge
+            line.set(text=f"{nom[:20]:<20} {moyenne:6.2f} {p95:6.2f} {maximum:6.1f}",
+                     fill="#c0392b" if p95 > 30 else "#2c3e50")
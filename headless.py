@@ -0,0 +1,175 @@
+"""
+Module d'exécution sans interface graphique
+Lance la simulation en lot, sans fenêtre Tk (serveurs sans affichage)
+
+Le temps est simulé à pas fixe : une heure de trafic se calcule en
+quelques secondes.
+
+UTILISATION:
+    python headless.py --scenario pointe --duree 3600
+    python headless.py --duree 600 --trajectoires traces/run
+    python headless.py --scenario pointe --duree 3600 --trafic-dense
+    python headless.py --duree 600 --sans-db --colonnes journal.col
+    python headless.py --duree 86400 --partition 3600 --retention 21600
+    python headless.py --scenario pointe --duree 3600 --processus-bd
+"""
+
+import argparse
+import math
+import time
+
+from clock import SimulatedClock
+from database import DatabaseManager
+from event_queue import POLITIQUES, BLOCK
+from instrumentation import TickProfiler
+from log_sinks import JsonlSink, ColumnarSink, MemorySink
+from log_policy import (LogPolicy, parse_niveau, NIVEAUX_TRAFIC_DENSE, TAUX_TRAFIC_DENSE,
+                        FENETRE_AGREGAT, PLAFOND)
+from partitions import fichiers_partitions
+from recorder import TrajectoryRecorder
+from traffic_light import TrafficLight
+from scenarios import CirculationNormale, HeureDePointe, ModeNuit
+from simulation import Simulation, DIRECTIONS
+
+
+SCENARIOS = {
+    'normale': CirculationNormale,
+    'pointe': HeureDePointe,
+    'nuit': ModeNuit,
+}
+
+
+def build_simulation(scenario, db_manager, clock, recorder=None, directions_aleatoires=False,
+                     profiler=None, aleatoire=None, ids_vehicules=None):
+    """Construit une simulation complète sans aucune vue graphique
+
+    Les véhicules initiaux sont répartis à tour de rôle sur les quatre
+    directions, ou tirés au hasard (`aleatoire`, module random par défaut)
+    si directions_aleatoires. `ids_vehicules` : voir Simulation.
+    """
+    traffic_light = TrafficLight(db_manager, clock)
+    simulation = Simulation(traffic_light, scenario, db_manager, clock=clock,
+                            recorder=recorder, profiler=profiler, aleatoire=aleatoire,
+                            ids_vehicules=ids_vehicules)
+    for i in range(scenario.nb_vehicules):
+        simulation.add_vehicle(None if directions_aleatoires else DIRECTIONS[i % len(DIRECTIONS)])
+    return simulation
+
+
+def run_headless(scenario, ticks, db_manager, clock, recorder=None, profiler=None):
+    """Exécute `ticks` pas de simulation aussi vite que possible"""
+    simulation = build_simulation(scenario, db_manager, clock, recorder, profiler=profiler)
+    profiler = simulation.profiler
+    simulation.start()
+    for _ in range(ticks):
+        simulation.update()
+        profiler.maybe_dump()
+    simulation.stop()
+    profiler.dump()
+    return simulation
+
+
+def main():
+    """Point d'entrée en ligne de commande"""
+    parser = argparse.ArgumentParser(description="Simulation de trafic sans affichage")
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='normale')
+    parser.add_argument('--duree', type=float, default=60.0,
+                        help="durée simulée en secondes")
+    parser.add_argument('--pas', type=float, default=0.03,
+                        help="pas de temps simulé en secondes")
+    parser.add_argument('--db', default="simulation_trafic.db")
+    parser.add_argument('--sans-db', action='store_true',
+                        help="n'écrit pas dans la base SQLite (autres destinations seulement)")
+    parser.add_argument('--jsonl', metavar='CHEMIN', help="journal aussi en JSON Lines")
+    parser.add_argument('--colonnes', metavar='CHEMIN',
+                        help="journal aussi en fichier binaire par colonnes")
+    parser.add_argument('--memoire', type=int, metavar='N',
+                        help="garde aussi les N derniers événements en mémoire")
+    parser.add_argument('--file-max', type=int, default=100000,
+                        help="capacité de la file d'événements")
+    parser.add_argument('--debordement', choices=POLITIQUES, default=BLOCK,
+                        help="politique quand la file est pleine")
+    parser.add_argument('--niveau', action='append', default=[], metavar='TYPE=NIVEAU[:TAUX]',
+                        help="niveau de journalisation d'un type_action "
+                             "(detail, echantillon, agregat, aucun), répétable")
+    parser.add_argument('--trafic-dense', action='store_true',
+                        help="niveaux préréglés : véhicules échantillonnés, violations agrégées")
+    parser.add_argument('--fenetre-agregat', type=float, default=FENETRE_AGREGAT,
+                        help="durée des fenêtres d'agrégation en secondes")
+    parser.add_argument('--plafond', type=int, default=PLAFOND,
+                        help="événements échantillonnés écrits au plus par type et par fenêtre")
+    parser.add_argument('--trajectoires', metavar='CHEMIN',
+                        help="enregistre les trajectoires dans CHEMIN.traj / CHEMIN.idx")
+    parser.add_argument('--metriques', metavar='CHEMIN',
+                        help="ajoute les durées par phase à CHEMIN (une ligne JSON toutes les 5 s)")
+    parser.add_argument('--partition', type=float, metavar='SECONDES',
+                        help="répartit le journal brut en un fichier par période")
+    parser.add_argument('--retention', type=float, metavar='SECONDES',
+                        help="supprime les partitions plus anciennes (avec --partition)")
+    parser.add_argument('--processus-bd', action='store_true',
+                        help="écrit la base depuis un processus séparé")
+    args = parser.parse_args()
+
+    clock = SimulatedClock(args.pas)
+    ticks = math.ceil(args.duree / args.pas)
+    scenario = SCENARIOS[args.scenario]()
+    log_policy = None
+    if args.trafic_dense or args.niveau:
+        niveaux = dict(NIVEAUX_TRAFIC_DENSE) if args.trafic_dense else {}
+        taux = dict(TAUX_TRAFIC_DENSE) if args.trafic_dense else {}
+        for texte in args.niveau:
+            type_action, niveau, taux_type = parse_niveau(texte)
+            niveaux[type_action] = niveau
+            if taux_type is not None:
+                taux[type_action] = taux_type
+        log_policy = LogPolicy(niveaux, taux, args.fenetre_agregat, args.plafond)
+    sinks = []
+    if args.jsonl:
+        sinks.append(JsonlSink(args.jsonl, max_queue=args.file_max,
+                               overflow_policy=args.debordement))
+    if args.colonnes:
+        sinks.append(ColumnarSink(args.colonnes, max_queue=args.file_max,
+                                  overflow_policy=args.debordement))
+    if args.memoire or (args.sans_db and not sinks):
+        sinks.append(MemorySink(args.memoire or 100000, max_queue=args.file_max,
+                                overflow_policy=args.debordement))
+    db_manager = DatabaseManager(None if args.sans_db else args.db, clock,
+                                 max_queue=args.file_max,
+                                 overflow_policy=args.debordement,
+                                 run_description=f"headless {scenario.name}",
+                                 log_policy=log_policy, sinks=sinks,
+                                 partition=args.partition, retention=args.retention,
+                                 processus=args.processus_bd)
+    recorder = None
+    if args.trajectoires:
+        recorder = TrajectoryRecorder(args.trajectoires, db_manager.run_id)
+    profiler = TickProfiler(args.metriques)
+    debut = time.perf_counter()
+    simulation = run_headless(scenario, ticks, db_manager, clock, recorder, profiler)
+    duree = time.perf_counter() - debut
+    if recorder is not None:
+        recorder.close()
+    stats = db_manager.sink_stats()
+    db_manager.close()
+
+    print(f"Exécution      : run_id {db_manager.run_id}")
+    print(f"Scénario       : {simulation.scenario.name}")
+    print(f"Temps simulé   : {args.duree:.0f} s ({ticks} pas) en {duree:.2f} s "
+          f"(x{args.duree / max(duree, 1e-9):.0f} temps réel)")
+    print(f"Véhicules      : {len(simulation.vehicles)}")
+    print(f"Collisions     : {simulation.collisions}")
+    for nom, moyenne, p95, maximum in profiler.summary():
+        print(f"  {nom:<22}: moy {moyenne:.3f} ms, p95 {p95:.3f} ms, max {maximum:.2f} ms")
+    for nom, stats_file in stats.items():
+        print(f"File {nom:<9}: pic {stats_file['pic']}/{stats_file['capacite']}, "
+              f"{stats_file['rejetes']} événements rejetés {stats_file['rejetes_par_type']}")
+    if log_policy is not None:
+        print(f"Niveaux        : {log_policy.stats()}")
+    if db_manager.sqlite is not None and db_manager.sqlite.partitions is not None:
+        supprimees = db_manager.ecrivain_bd.bilan().get('partitions_supprimees', 0)
+        print(f"Partitions     : {len(fichiers_partitions(args.db))} fichiers dans "
+              f"{db_manager.sqlite.partitions.dossier}, {supprimees} supprimés par la rétention")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Module d'instrumentation des pas de simulation
+Chronomètre chaque phase d'un pas (apparitions, feu, collisions, véhicules,
+rendu...) et en tient des histogrammes de durées, affichables en direct et
+écrits périodiquement dans un fichier de métriques (une ligne JSON par période)
+"""
+
+import bisect
+import json
+import time
+
+
+# Bornes supérieures des classes d'histogramme, en millisecondes
+BORNES_MS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 50, 100, 250, 1000)
+
+# Durée d'une fenêtre de mesure (secondes d'horloge murale)
+INTERVALLE_FENETRE = 5.0
+
+
+class PhaseHistogram:
+    """Histogramme des durées d'une phase (classes BORNES_MS + débordement)"""
+
+    def __init__(self, bornes_ns):
+        self.bornes_ns = bornes_ns
+        self.classes = [0] * (len(bornes_ns) + 1)
+        self.nombre = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def observe(self, duree_ns):
+        """Ajoute une durée"""
+        self.classes[bisect.bisect_left(self.bornes_ns, duree_ns)] += 1
+        self.nombre += 1
+        self.total_ns += duree_ns
+        if duree_ns > self.max_ns:
+            self.max_ns = duree_ns
+
+    def moyenne_ms(self):
+        """Durée moyenne en millisecondes"""
+        return self.total_ns / self.nombre / 1e6 if self.nombre else 0.0
+
+    def quantile_ms(self, q):
+        """Borne supérieure de la classe contenant le quantile q (majorant)"""
+        if not self.nombre:
+            return 0.0
+        rang = q * self.nombre
+        cumul = 0
+        for k, effectif in enumerate(self.classes):
+            cumul += effectif
+            if cumul >= rang:
+                break
+        if k < len(self.bornes_ns):
+            return min(self.bornes_ns[k], self.max_ns) / 1e6
+        return self.max_ns / 1e6
+
+    def to_dict(self):
+        """Résumé sérialisable en JSON"""
+        return {
+            'nombre': self.nombre,
+            'moyenne_ms': self.moyenne_ms(),
+            'p95_ms': self.quantile_ms(0.95),
+            'max_ms': self.max_ns / 1e6,
+            'classes': self.classes,
+        }
+
+
+class _Chrono:
+    """Gestionnaire de contexte réutilisable qui chronomètre une phase"""
+
+    __slots__ = ('profiler', 'nom', 'debut')
+
+    def __init__(self, profiler, nom):
+        self.profiler = profiler
+        self.nom = nom
+        self.debut = 0
+
+    def __enter__(self):
+        self.debut = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.observe(self.nom, time.perf_counter_ns() - self.debut)
+        return False
+
+
+class TickProfiler:
+    """Histogrammes de durée par phase, par fenêtres de `intervalle` secondes
+
+    Usage :
+        with profiler.phase('check_collisions'):
+            ...
+        profiler.maybe_dump()   # une fois par pas ou par image
+
+    Les phases gardent leur ordre de première apparition. Une fenêtre
+    close est ajoutée au fichier `chemin` (si fourni) puis sert à
+    l'affichage jusqu'à la clôture de la suivante.
+    """
+
+    def __init__(self, chemin=None, intervalle=INTERVALLE_FENETRE, bornes_ms=BORNES_MS):
+        self.chemin = chemin
+        self.intervalle = intervalle
+        self.bornes_ms = bornes_ms
+        self.bornes_ns = [round(borne * 1e6) for borne in bornes_ms]
+        self.fenetre = {}
+        self.derniere_fenetre = {}
+        self._chronos = {}
+        self._debut_fenetre = time.monotonic()
+
+    def phase(self, nom):
+        """Contexte `with` qui chronomètre la phase `nom`"""
+        chrono = self._chronos.get(nom)
+        if chrono is None:
+            chrono = self._chronos[nom] = _Chrono(self, nom)
+        return chrono
+
+    def observe(self, nom, duree_ns):
+        """Enregistre une durée mesurée ailleurs"""
+        histogramme = self.fenetre.get(nom)
+        if histogramme is None:
+            histogramme = self.fenetre[nom] = PhaseHistogram(self.bornes_ns)
+        histogramme.observe(duree_ns)
+
+    def maybe_dump(self):
+        """Clôt la fenêtre courante si son intervalle est écoulé"""
+        if time.monotonic() - self._debut_fenetre >= self.intervalle:
+            self.dump()
+
+    def dump(self):
+        """Clôt la fenêtre courante et l'écrit dans le fichier de métriques"""
+        maintenant = time.monotonic()
+        if self.chemin and self.fenetre:
+            ligne = {
+                'date': time.strftime("%Y-%m-%d %H:%M:%S"),
+                'duree_s': maintenant - self._debut_fenetre,
+                'bornes_ms': list(self.bornes_ms),
+                'phases': {nom: h.to_dict() for nom, h in self.fenetre.items()},
+            }
+            with open(self.chemin, "a", encoding="utf-8") as fichier:
+                fichier.write(json.dumps(ligne, ensure_ascii=False) + "\n")
+        if self.fenetre:
+            self.derniere_fenetre = self.fenetre
+        self.fenetre = {}
+        self._debut_fenetre = maintenant
+
+    def summary(self):
+        """[(phase, moyenne ms, p95 ms, max ms)] de la dernière fenêtre close
+
+        Avant la première clôture, la fenêtre en cours est utilisée.
+        """
+        fenetre = self.derniere_fenetre or self.fenetre
+        return [(nom, h.moyenne_ms(), h.quantile_ms(0.95), h.max_ns / 1e6)
+                for nom, h in fenetre.items()]
@@ -0,0 +1,128 @@
+"""
+Module d'index des voies
+Maintient, pour chaque direction, les véhicules triés par progression le long
+de la voie : le véhicule devant est le voisin suivant dans la voie
+"""
+
+import numpy as np
+
+
+class LaneIndex:
+    """Index trié des lignes d'un VehicleStore, une voie par direction
+
+    voies[code] contient les indices de lignes de l'arrière vers l'avant ;
+    rang[ligne] est la position de la ligne dans sa voie. Les véhicules ne
+    se doublent pas : l'ordre n'est modifié qu'à l'ajout, au retrait et à
+    la réapparition, et une vérification en O(n) par pas rattrape les
+    rares inversions (véhicules superposés, positions modifiées à la main).
+
+    Le véhicule devant est le premier strictement plus avancé dans la
+    voie : des véhicules à la même position s'ignorent, comme dans le
+    parcours de toute la flotte (Vehicle._is_behind).
+    """
+
+    def __init__(self, store, vecteurs):
+        self.store = store
+        # vecteurs[code] : vecteur unitaire de déplacement de la voie `code`
+        self.vecteurs = vecteurs
+        self.voies = [np.empty(0, dtype=np.int64) for _ in vecteurs]
+        self.rang = np.zeros(store.capacite, dtype=np.int64)
+        self.reparations = 0
+
+    def _progression(self, lignes):
+        """Progression le long de la voie des lignes données"""
+        store = self.store
+        directions = store.direction[lignes]
+        return (store.x[lignes] * self.vecteurs[directions, 0] +
+                store.y[lignes] * self.vecteurs[directions, 1])
+
+    def _renumeroter(self, code, debut=0):
+        """Recalcule le rang des lignes de la voie `code` à partir de `debut`"""
+        voie = self.voies[code]
+        self.rang[voie[debut:]] = np.arange(debut, len(voie))
+
+    def ajouter(self, ligne):
+        """Insère une nouvelle ligne à sa place dans sa voie"""
+        if len(self.rang) < self.store.capacite:
+            rang = np.zeros(self.store.capacite, dtype=np.int64)
+            rang[:len(self.rang)] = self.rang
+            self.rang = rang
+        code = self.store.direction[ligne]
+        voie = self.voies[code]
+        # À position égale, le nouveau venu se place derrière les autres
+        position = np.searchsorted(self._progression(voie),
+                                   self._progression(ligne), side='left')
+        self.voies[code] = np.insert(voie, position, ligne)
+        self._renumeroter(code, position)
+
+    def retirer(self, ligne):
+        """Retire une ligne de sa voie"""
+        code = self.store.direction[ligne]
+        position = self.rang[ligne]
+        self.voies[code] = np.delete(self.voies[code], position)
+        self._renumeroter(code, position)
+
+    def renommer(self, ancienne, nouvelle):
+        """Suit le déplacement d'une ligne dans le magasin (ancienne -> nouvelle)"""
+        code = self.store.direction[ancienne]
+        position = self.rang[ancienne]
+        self.voies[code][position] = nouvelle
+        self.rang[nouvelle] = position
+
+    def reapparus(self, lignes):
+        """Passe les lignes réapparues de l'avant à l'arrière de leur voie"""
+        directions = self.store.direction[lignes]
+        for code in np.unique(directions):
+            voie = self.voies[code]
+            sortis = np.isin(voie, lignes[directions == code])
+            self.voies[code] = np.concatenate((voie[sortis], voie[~sortis]))
+            self._renumeroter(code)
+
+    def reparer(self, s):
+        """Vérifie l'ordre de chaque voie et ne retrie que les voies inversées
+
+        `s` est la progression de toutes les lignes actives.
+        """
+        for code, voie in enumerate(self.voies):
+            s_voie = s[voie]
+            if len(voie) > 1 and np.any(s_voie[1:] < s_voie[:-1]):
+                self.voies[code] = voie[np.argsort(s_voie, kind='stable')]
+                self._renumeroter(code)
+                self.reparations += 1
+
+    def leaders(self, s, distance_detection):
+        """Véhicule devant et écart pour toutes les lignes, en O(n)
+
+        Retourne (leader, ecart) comme VehicleStore.leaders.
+        """
+        n = len(s)
+        leader = np.full(n, -1, dtype=np.int64)
+        ecart = np.full(n, np.inf)
+        for voie in self.voies:
+            if len(voie) < 2:
+                continue
+            # Voie triée : le premier rang strictement plus avancé
+            s_voie = s[voie]
+            rangs = np.searchsorted(s_voie, s_voie, side='right')
+            devant = rangs < len(voie)
+            courant = voie[devant]
+            suivant = voie[rangs[devant]]
+            d = s[suivant] - s[courant]
+            ecart[courant] = d
+            proche = d < distance_detection
+            leader[courant[proche]] = suivant[proche]
+        return leader, ecart
+
+    def leader(self, ligne):
+        """Véhicule devant une ligne (ou -1) et écart, en O(1)
+
+        Seuls les véhicules à la même position que la ligne sont sautés.
+        """
+        code = self.store.direction[ligne]
+        voie = self.voies[code]
+        s_ligne = self._progression(ligne)
+        for suivant in voie[self.rang[ligne] + 1:]:
+            ecart = float(self._progression(suivant) - s_ligne)
+            if ecart > 0:
+                return suivant, ecart
+        return -1, float('inf')
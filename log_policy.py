@@ -0,0 +1,168 @@
+"""
+Module des niveaux de journalisation
+Décide, pour chaque type_action, si un événement est écrit tel quel,
+échantillonné ou seulement compté dans des agrégats par fenêtre de temps
+(« N arrêts au feu rouge en 10 s, direction EST »), pour que le débit
+d'écriture en base reste borné quel que soit le trafic
+"""
+
+import random
+
+
+# Niveaux de journalisation d'un type_action
+DETAIL = "detail"            # chaque événement est écrit
+ECHANTILLON = "echantillon"  # une partie est écrite, tout est compté
+AGREGAT = "agregat"          # seulement compté, par fenêtre
+AUCUN = "aucun"              # ignoré
+
+NIVEAUX = (DETAIL, ECHANTILLON, AGREGAT, AUCUN)
+
+# Réglage pour le trafic dense : feux et système en détail, véhicules
+# échantillonnés (10 % des véhicules, tous leurs événements), collisions
+# plafonnées, violations seulement comptées
+NIVEAUX_TRAFIC_DENSE = {
+    'VOITURE': ECHANTILLON,
+    'COLLISION': ECHANTILLON,
+    'VIOLATION': AGREGAT,
+}
+TAUX_TRAFIC_DENSE = {
+    'VOITURE': 0.1,
+    'COLLISION': 1.0,
+}
+
+# Durée d'une fenêtre d'agrégation (secondes d'horloge de simulation)
+FENETRE_AGREGAT = 10.0
+
+# Événements échantillonnés écrits au plus, par type_action et par fenêtre
+PLAFOND = 200
+
+
+def parse_niveau(texte):
+    """'VOITURE=echantillon:0.1' -> ('VOITURE', 'echantillon', 0.1)"""
+    type_action, _, niveau = texte.partition('=')
+    niveau, _, taux = niveau.partition(':')
+    niveau = niveau.lower()
+    if not type_action or niveau not in NIVEAUX:
+        raise ValueError(f"Niveau invalide : {texte!r} (attendu TYPE=niveau[:taux], "
+                         f"niveaux {', '.join(NIVEAUX)})")
+    return type_action.upper(), niveau, float(taux) if taux else None
+
+
+class LogPolicy:
+    """Filtre placé devant la file du DatabaseManager
+
+    filtrer(event) retourne les éléments à mettre en file : l'événement
+    s'il est gardé, précédé des lignes d'agrégat des fenêtres closes.
+    Une ligne d'agrégat (clé 'agregat' à True) compte, pour une fenêtre,
+    une exécution, un type_action, une action et une direction, le
+    nombre total d'événements et combien ont aussi été écrits en détail.
+
+    L'échantillonnage se fait par véhicule (hachage de id_voiture) : un
+    véhicule retenu garde tous ses événements, ce qui préserve les paires
+    arrêt / redémarrage. Les types absents de `niveaux` sont en DETAIL.
+    """
+
+    def __init__(self, niveaux=None, taux=None, fenetre=FENETRE_AGREGAT,
+                 plafond=PLAFOND, graine=None):
+        self.niveaux = dict(niveaux or {})
+        self.taux = dict(taux or {})
+        for type_action, niveau in self.niveaux.items():
+            if niveau not in NIVEAUX:
+                raise ValueError(f"Niveau inconnu pour {type_action} : {niveau}")
+        self.fenetre_ns = round(fenetre * 1e9)
+        self.plafond = plafond
+        self._aleatoire = random.Random(graine)
+
+        self._fenetre = None
+        self._agregats = {}
+        self._detailles = {}
+
+        # Compteurs
+        self.ignores = 0
+        self.non_echantillonnes = 0
+        self.plafonnes = 0
+        self.lignes_agregat = 0
+
+    @classmethod
+    def trafic_dense(cls, **options):
+        """Politique préréglée pour les scénarios chargés"""
+        return cls(NIVEAUX_TRAFIC_DENSE, TAUX_TRAFIC_DENSE, **options)
+
+    def _garder(self, event, taux):
+        """Tirage d'échantillonnage, stable pour un même véhicule"""
+        id_voiture = event.get('id_voiture')
+        if id_voiture is None:
+            return self._aleatoire.random() < taux
+        return ((id_voiture * 2654435761) & 0xFFFFFFFF) / 2 ** 32 < taux
+
+    def filtrer(self, event):
+        """Éléments à mettre en file pour cet événement"""
+        type_action = event['type_action']
+        niveau = self.niveaux.get(type_action, DETAIL)
+        if niveau == DETAIL:
+            return [event]
+        if niveau == AUCUN:
+            self.ignores += 1
+            return []
+
+        sortie = self._avancer(event['ts_ns'])
+        cle = (event.get('run_id'), type_action, event['action'], event.get('direction'))
+        compteur = self._agregats.get(cle)
+        if compteur is None:
+            compteur = self._agregats[cle] = [0, 0]
+        compteur[0] += 1
+
+        if niveau == ECHANTILLON:
+            if not self._garder(event, self.taux.get(type_action, 1.0)):
+                self.non_echantillonnes += 1
+            elif self.plafond is not None and self._detailles.get(type_action, 0) >= self.plafond:
+                self.plafonnes += 1
+            else:
+                self._detailles[type_action] = self._detailles.get(type_action, 0) + 1
+                compteur[1] += 1
+                sortie.append(event)
+        return sortie
+
+    def _avancer(self, ts_ns):
+        """Clôt la fenêtre courante si ts_ns appartient à une suivante"""
+        fenetre = ts_ns // self.fenetre_ns
+        if fenetre == self._fenetre:
+            return []
+        lignes = self.vider()
+        self._fenetre = fenetre
+        return lignes
+
+    def vider(self):
+        """Lignes d'agrégat de la fenêtre courante, qui est remise à zéro
+
+        À appeler au changement d'exécution et à la fermeture.
+        """
+        if self._fenetre is None or not self._agregats:
+            self._detailles = {}
+            return []
+        debut_ns = self._fenetre * self.fenetre_ns
+        lignes = [{
+            'agregat': True,
+            'run_id': run_id,
+            'debut_ns': debut_ns,
+            'fin_ns': debut_ns + self.fenetre_ns,
+            'type_action': type_action,
+            'action': action,
+            'direction': direction,
+            'nombre': nombre,
+            'detailles': detailles,
+        } for (run_id, type_action, action, direction), (nombre, detailles)
+            in self._agregats.items()]
+        self._agregats = {}
+        self._detailles = {}
+        self.lignes_agregat += len(lignes)
+        return lignes
+
+    def stats(self):
+        """Compteurs d'événements écartés et de lignes d'agrégat produites"""
+        return {
+            'ignores': self.ignores,
+            'non_echantillonnes': self.non_echantillonnes,
+            'plafonnes': self.plafonnes,
+            'lignes_agregat': self.lignes_agregat,
+        }
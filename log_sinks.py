@@ -0,0 +1,629 @@
+"""
+Module des destinations de journalisation
+Chaque destination (SQLite, JSON Lines, anneau en mémoire, fichier binaire
+en colonnes) a sa propre file bornée et son propre thread d'écriture par
+lots ; le DatabaseManager diffuse chaque événement à toutes celles qui
+sont actives. ProcessSink déporte une destination dans un processus à part
+"""
+
+import collections
+import itertools
+import json
+import multiprocessing
+import queue
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from db_schema import init_schema, DICTIONNAIRES, ResumesJournal
+from event_queue import BoundedEventQueue, BLOCK
+from partitions import JournalPartitions
+
+
+# Niveaux acceptés par PRAGMA synchronous
+NIVEAUX_SYNCHRONOUS = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+# Attente maximale d'un verrou tenu par un autre écrivain de la même base
+# (secondes, PRAGMA busy_timeout)
+DELAI_VERROU = 60.0
+
+# Essais d'un lot en échec passager avant de l'abandonner, et pause avant
+# le premier nouvel essai (doublée à chaque échec, secondes)
+ESSAIS_MAX = 5
+PAUSE_ESSAI = 0.1
+
+
+class LogSink:
+    """Destination d'événements, écrite par lots depuis son propre thread
+
+    Les sous-classes redéfinissent ecrire(lot), et au besoin ouvrir() et
+    fermer(), appelés dans le thread d'écriture. Les éléments reçus sont
+    des événements (dict de log_event) ou des lignes d'agrégat (clé
+    'agregat', voir log_policy) ; ils sont partagés entre destinations et
+    ne doivent pas être modifiés.
+
+    stats() ajoute aux compteurs de la file la latence d'écriture : délai
+    entre la mise en file du plus ancien événement d'un lot et la fin de
+    ecrire() (le commit pour SQLiteSink, l'envoi au processus pour
+    ProcessSink).
+    """
+
+    nom = "destination"
+
+    # Erreurs passagères : le lot est réessayé (voir ecrire_lot)
+    erreurs_passageres = ()
+
+    def __init__(self, batch_size=500, flush_interval=0.5, max_queue=100000,
+                 overflow_policy=BLOCK, sample_rates=None):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = BoundedEventQueue(max_queue, overflow_policy, sample_rates)
+        self.worker_thread = None
+        self.lots_ecrits = 0
+        self.latence_ecriture_totale = 0.0
+        self.latence_ecriture_max = 0.0
+        self._depot_lot = None
+
+    def put(self, event):
+        """Ajoute un élément à la file de la destination"""
+        self.queue.put(event)
+
+    def start(self):
+        """Démarre le thread d'écriture"""
+        self.worker_thread = threading.Thread(target=self._worker, daemon=True)
+        self.worker_thread.start()
+
+    def _next_batch(self):
+        """Attend un événement puis vide la file par lots
+
+        Le lot est rendu dès qu'il atteint batch_size événements ou que
+        flush_interval secondes se sont écoulées depuis le premier.
+        Retourne (lot, fin) ; fin vaut True si la sentinelle None a été lue.
+        """
+        try:
+            event = self.queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return [], False
+
+        self._depot_lot = self.queue.dernier_depot
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while event is not None:
+            batch.append(event)
+            if len(batch) >= self.batch_size:
+                return batch, False
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    event = self.queue.get(timeout=remaining)
+                else:
+                    event = self.queue.get_nowait()
+            except queue.Empty:
+                return batch, False
+        return batch, True
+
+    def _worker(self):
+        """Boucle du thread : un appel à ecrire() par lot"""
+        self.ouvrir()
+        fin = False
+        while not fin:
+            batch, fin = self._next_batch()
+            if not batch:
+                continue
+            if self.ecrire_lot(batch):
+                self._mesurer_ecriture()
+        self.fermer()
+
+    def ecrire_lot(self, batch):
+        """Appelle ecrire() ; retourne False si le lot est abandonné
+
+        Un lot en échec passager (erreurs_passageres) est réessayé jusqu'à
+        ESSAIS_MAX fois, avec une pause qui double à chaque essai ; une
+        autre erreur l'abandonne aussitôt. Le lot est réécrit en entier :
+        ecrire() doit l'écrire dans une seule transaction.
+        """
+        pause = PAUSE_ESSAI
+        for essai in range(1, ESSAIS_MAX + 1):
+            try:
+                self.ecrire(batch)
+                return True
+            except self.erreurs_passageres as e:
+                self.apres_erreur()
+                if essai == ESSAIS_MAX:
+                    print(f"Erreur {self.nom}: {e} (lot de {len(batch)} abandonné)")
+                    return False
+                time.sleep(pause)
+                pause *= 2
+            except Exception as e:
+                print(f"Erreur {self.nom}: {e}")
+                self.apres_erreur()
+                return False
+
+    def ouvrir(self):
+        """Prépare l'écriture (dans le thread d'écriture)"""
+
+    def ecrire(self, batch):
+        """Écrit un lot"""
+        raise NotImplementedError
+
+    def apres_erreur(self):
+        """Remet la destination en état après un lot en échec"""
+
+    def fermer(self):
+        """Termine l'écriture (dans le thread d'écriture)"""
+
+    def bilan(self):
+        """Compteurs propres à la destination, à lire après close()"""
+        return {}
+
+    def _mesurer_ecriture(self):
+        """Compte la latence d'écriture du lot qui vient d'être écrit"""
+        latence = time.perf_counter() - self._depot_lot
+        self.lots_ecrits += 1
+        self.latence_ecriture_totale += latence
+        self.latence_ecriture_max = max(self.latence_ecriture_max, latence)
+
+    def stats(self):
+        """Compteurs de charge de la file et latence d'écriture (secondes)"""
+        stats = self.queue.stats()
+        lots = self.lots_ecrits
+        stats['latence_ecriture_moyenne'] = self.latence_ecriture_totale / lots if lots else 0.0
+        stats['latence_ecriture_max'] = self.latence_ecriture_max
+        return stats
+
+    def close(self):
+        """Vide la file puis arrête le thread d'écriture"""
+        self.queue.put(None)
+        if self.worker_thread is not None:
+            self.worker_thread.join()
+
+
+class SQLiteSink(LogSink):
+    """Journal encodé dans une base SQLite (voir db_schema)
+
+    Les textes répétitifs deviennent des codes entiers attribués par le
+    thread d'écriture ; une transaction par lot, base en mode WAL avec
+    un niveau `synchronous` configurable. Plusieurs écrivains (les
+    partitions d'un réseau) partagent la base : chacun attend le verrou
+    jusqu'à DELAI_VERROU secondes, et un lot refusé (base verrouillée)
+    est réessayé plutôt que perdu.
+
+    Avec `partition` (secondes), le journal brut est réparti en un fichier
+    par période, et `retention` (secondes) supprime les plus anciens
+    (voir partitions).
+    """
+
+    nom = "BD"
+    erreurs_passageres = (sqlite3.OperationalError,)
+
+    def __init__(self, db_name="simulation_trafic.db", synchronous="NORMAL",
+                 partition=None, retention=None, **options):
+        super().__init__(**options)
+        synchronous = synchronous.upper()
+        if synchronous not in NIVEAUX_SYNCHRONOUS:
+            raise ValueError(f"Niveau synchronous inconnu : {synchronous}")
+        if retention is not None and partition is None:
+            raise ValueError("La rétention demande un journal partitionné")
+        self.db_name = db_name
+        self.synchronous = synchronous
+        self.conn = None
+        self.partitions = None
+        if partition is not None:
+            self.partitions = JournalPartitions(db_name, partition, retention, synchronous)
+
+        conn = self.connect()
+        init_schema(conn.cursor())
+        conn.commit()
+        self._charger_codes(conn)
+        conn.close()
+
+    def connect(self):
+        """Ouvre une connexion en mode WAL avec le niveau de synchronisation choisi"""
+        conn = sqlite3.connect(self.db_name, timeout=DELAI_VERROU)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        return conn
+
+    def _charger_codes(self, conn):
+        """Charge les dictionnaires en mémoire : l'écrivain encode sans requête"""
+        self._codes = {
+            colonne: dict(conn.execute(f"SELECT libelle, code FROM {table}"))
+            for colonne, table in DICTIONNAIRES.items()
+        }
+
+    def _encoder(self, conn, colonne, libelle):
+        """Code entier d'un libellé, ajouté au dictionnaire s'il est nouveau"""
+        if libelle is None:
+            return None
+        codes = self._codes[colonne]
+        code = codes.get(libelle)
+        if code is None:
+            table = DICTIONNAIRES[colonne]
+            conn.execute(f"INSERT OR IGNORE INTO {table} (libelle) VALUES (?)", (libelle,))
+            code = conn.execute(f"SELECT code FROM {table} WHERE libelle = ?",
+                                (libelle,)).fetchone()[0]
+            codes[libelle] = code
+        return code
+
+    def ouvrir(self):
+        self.conn = self.connect()
+        with self.conn:
+            self.resumes = ResumesJournal(self.conn)
+        if self.partitions is not None:
+            self.partitions.ouvrir(self.conn)
+
+    def ecrire(self, batch):
+        """Encode puis écrit un lot d'événements dans une seule transaction
+
+        Les résumés (voir db_schema.ResumesJournal) sont mis à jour une fois
+        pour tout le lot, dans la même transaction.
+        """
+        conn = self.conn
+        agregats = [event for event in batch if 'agregat' in event]
+        if agregats:
+            batch = [event for event in batch if 'agregat' not in event]
+        if self.partitions is None:
+            groupes = [(None, batch)]
+        else:
+            groupes = self.partitions.repartir(conn, batch)
+        with conn:
+            lignes = []
+            for schema, events in groupes:
+                lot = self._inserer(conn, events)
+                if schema is not None:
+                    self.partitions.deplacer(conn, schema, lot[0][0], lot[-1][0])
+                lignes.extend(lot)
+            self.resumes.cumuler(conn, lignes)
+            if agregats:
+                self._inserer_agregats(conn, agregats)
+
+    def _inserer(self, conn, events):
+        """Insère des événements dans journal_evenements ; retourne les lignes
+
+        Lignes dans l'ordre de COLONNES_JOURNAL. Journal partitionné : les
+        id sont attribués ici, pour rester uniques d'une partition à
+        l'autre (ailleurs, ils valent None).
+        """
+        encoder = self._encoder
+        ids = itertools.repeat(None)
+        if self.partitions is not None:
+            ids = itertools.count(self.partitions.prochain_id)
+            self.partitions.prochain_id += len(events)
+        lignes = [(
+            next(ids),
+            event.get('run_id'),
+            event.get('ts_ns'),
+            encoder(conn, 'type_action', event.get('type_action')),
+            encoder(conn, 'action', event.get('action')),
+            encoder(conn, 'etat_feu', event.get('etat_feu')),
+            encoder(conn, 'scenario', event.get('scenario')),
+            event.get('id_voiture'),
+            event.get('position_x'),
+            event.get('position_y'),
+            event.get('vitesse'),
+            encoder(conn, 'direction', event.get('direction'))
+        ) for event in events]
+        conn.executemany('''
+            INSERT INTO journal_evenements
+            (id, run_id, ts_ns, type_action, action, etat_feu, scenario, id_voiture, position_x, position_y,
+             vitesse, direction)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', lignes)
+        return lignes
+
+    def _inserer_agregats(self, conn, agregats):
+        """Insère des lignes d'agrégat dans agregats_evenements"""
+        encoder = self._encoder
+        conn.executemany('''
+            INSERT INTO agregats_evenements
+            (run_id, debut_ns, fin_ns, type_action, action, direction, nombre, detailles)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(
+            ligne['run_id'],
+            ligne['debut_ns'],
+            ligne['fin_ns'],
+            encoder(conn, 'type_action', ligne['type_action']),
+            encoder(conn, 'action', ligne['action']),
+            encoder(conn, 'direction', ligne['direction']),
+            ligne['nombre'],
+            ligne['detailles']
+        ) for ligne in agregats])
+
+    def apres_erreur(self):
+        # Les codes ajoutés par la transaction annulée n'existent plus
+        self._charger_codes(self.conn)
+
+    def bilan(self):
+        if self.partitions is None:
+            return {}
+        return {'partitions_supprimees': self.partitions.supprimees}
+
+    def fermer(self):
+        if self.partitions is not None:
+            self.partitions.fermer(self.conn)
+        self.conn.close()
+
+
+class JsonlSink(LogSink):
+    """Un objet JSON par ligne, ajouté à `chemin` (lisible, facile à filtrer)"""
+
+    nom = "JSONL"
+
+    def __init__(self, chemin, **options):
+        super().__init__(**options)
+        self.chemin = chemin
+        self.fichier = None
+
+    def ouvrir(self):
+        self.fichier = open(self.chemin, "a", encoding="utf-8")
+
+    def ecrire(self, batch):
+        self.fichier.write("".join(json.dumps(event, ensure_ascii=False) + "\n"
+                                   for event in batch))
+        self.fichier.flush()
+
+    def fermer(self):
+        self.fichier.close()
+
+
+class MemorySink(LogSink):
+    """Anneau des `capacite` derniers éléments, en mémoire
+
+    Rien n'est écrit sur disque : pour les balayages et les tests, où
+    seul l'état final (ou la fin du journal) intéresse.
+    """
+
+    nom = "mémoire"
+
+    def __init__(self, capacite=100000, **options):
+        super().__init__(**options)
+        self.anneau = collections.deque(maxlen=capacite)
+        self.recus = 0
+        self._verrou = threading.Lock()
+
+    def ecrire(self, batch):
+        with self._verrou:
+            self.anneau.extend(batch)
+            self.recus += len(batch)
+
+    def evenements(self, type_action=None):
+        """Copie du contenu de l'anneau, éventuellement filtrée"""
+        with self._verrou:
+            contenu = list(self.anneau)
+        if type_action is None:
+            return contenu
+        return [event for event in contenu if event.get('type_action') == type_action]
+
+
+def _executer_destination(classe, arguments, canal):
+    """Boucle du processus écrivain : un appel à ecrire() par lot reçu
+
+    Le lot None termine la boucle ; le bilan de la destination est alors
+    renvoyé par le même canal.
+    """
+    destination = classe(**arguments)
+    destination.ouvrir()
+    try:
+        while True:
+            batch = canal.recv()
+            if batch is None:
+                break
+            destination.ecrire_lot(batch)
+    finally:
+        destination.fermer()
+    canal.send(destination.bilan())
+    canal.close()
+
+
+class ProcessSink(LogSink):
+    """Destination écrite par un processus séparé
+
+    Le processus écrivain construit classe(**arguments), une autre
+    LogSink, et lui passe les lots reçus par un tube. Ici, le thread
+    d'écriture ne fait que former les lots et les envoyer : encodage,
+    requêtes et déclencheurs ne prennent plus le GIL de la simulation ni
+    de la boucle Tk. Un tube plein bloque l'envoi, la file se remplit et
+    sa politique de débordement s'applique comme pour les autres
+    destinations.
+
+    Le processus est lancé en mode spawn : pas de fork d'un processus qui
+    a des threads et une fenêtre Tk.
+    """
+
+    def __init__(self, classe, arguments=None, **options):
+        super().__init__(**options)
+        self.nom = classe.nom
+        self.classe = classe
+        self.arguments = dict(arguments or {})
+        self.processus = None
+        self.canal = None
+        self._bilan = {}
+
+    def ouvrir(self):
+        contexte = multiprocessing.get_context("spawn")
+        self.canal, canal_fils = contexte.Pipe()
+        self.processus = contexte.Process(target=_executer_destination,
+                                          args=(self.classe, self.arguments, canal_fils),
+                                          name=f"écrivain {self.nom}", daemon=True)
+        self.processus.start()
+        canal_fils.close()
+
+    def ecrire(self, batch):
+        self.canal.send(batch)
+
+    def fermer(self):
+        try:
+            self.canal.send(None)
+            self._bilan = self.canal.recv()
+        except (OSError, EOFError):
+            print(f"Erreur {self.nom}: processus écrivain interrompu")
+        self.canal.close()
+        self.processus.join()
+
+    def bilan(self):
+        return self._bilan
+
+
+# Colonnes du fichier binaire : (nom, type NumPy) ; les libellés sont codés
+# (0 = absent), les entiers absents valent -1 et les réels absents NaN
+COLONNES = (
+    ('ts_ns', '<i8'),
+    ('run_id', '<i4'),
+    ('type_action', '<u1'),
+    ('action', '<u2'),
+    ('etat_feu', '<u1'),
+    ('scenario', '<u1'),
+    ('id_voiture', '<i4'),
+    ('position_x', '<f4'),
+    ('position_y', '<f4'),
+    ('vitesse', '<f4'),
+    ('direction', '<u1'),
+)
+LIBELLES = ('type_action', 'action', 'etat_feu', 'scenario', 'direction')
+SIGNATURE = b"EVTCOL02"
+ENTETE_BLOC = struct.Struct("<I")
+
+# Variante compressée (voir export) : chaque colonne d'un bloc est
+# précédée de sa taille compressée (zlib)
+SIGNATURE_COMPRESSEE = b"EVTCOLZ2"
+
+
+def bloc_colonnes(colonnes, nombre, compression=None):
+    """Octets d'un bloc : nombre de lignes puis chaque colonne de COLONNES
+
+    `colonnes` associe à chaque nom une séquence de `nombre` valeurs déjà
+    codées ; avec `compression` (niveau zlib), chaque colonne est
+    compressée séparément.
+    """
+    blocs = [ENTETE_BLOC.pack(nombre)]
+    for nom, dtype in COLONNES:
+        octets = np.asarray(colonnes[nom], dtype=dtype).tobytes()
+        if compression is not None:
+            octets = zlib.compress(octets, compression)
+            blocs.append(ENTETE_BLOC.pack(len(octets)))
+        blocs.append(octets)
+    return b"".join(blocs)
+
+
+class ColumnarSink(LogSink):
+    """Fichier binaire compact, un bloc de colonnes par lot
+
+    `chemin` reçoit la signature puis, pour chaque lot, le nombre de
+    lignes suivi de chaque colonne de COLONNES à la suite (34 octets par
+    événement). Les dictionnaires de libellés et les lignes d'agrégat
+    sont écrits à la fermeture dans `chemin`.json. Relire avec
+    lire_blocs() et lire_annexe(), ou lire_colonnes().
+    """
+
+    nom = "colonnes"
+
+    def __init__(self, chemin, **options):
+        super().__init__(**options)
+        self.chemin = chemin
+        self.fichier = None
+        self.codes = {colonne: {} for colonne in LIBELLES}
+        self.agregats = []
+
+    def _code(self, colonne, libelle):
+        if libelle is None:
+            return 0
+        codes = self.codes[colonne]
+        code = codes.get(libelle)
+        if code is None:
+            code = codes[libelle] = len(codes) + 1
+        return code
+
+    def ouvrir(self):
+        self.fichier = open(self.chemin, "wb")
+        self.fichier.write(SIGNATURE)
+
+    def ecrire(self, batch):
+        events = []
+        for event in batch:
+            if 'agregat' in event:
+                self.agregats.append(event)
+            else:
+                events.append(event)
+        if not events:
+            return
+        colonnes = {}
+        for nom, dtype in COLONNES:
+            if nom in LIBELLES:
+                colonnes[nom] = [self._code(nom, event.get(nom)) for event in events]
+            elif dtype.startswith('<f'):
+                colonnes[nom] = [np.nan if event.get(nom) is None else event[nom] for event in events]
+            else:
+                colonnes[nom] = [-1 if event.get(nom) is None else event[nom] for event in events]
+        self.fichier.write(bloc_colonnes(colonnes, len(events)))
+        self.fichier.flush()
+
+    def fermer(self):
+        self.fichier.close()
+        with open(self.chemin + ".json", "w", encoding="utf-8") as fichier:
+            json.dump({
+                'libelles': {colonne: list(codes) for colonne, codes in self.codes.items()},
+                'agregats': self.agregats,
+            }, fichier, ensure_ascii=False)
+
+
+def lire_blocs(chemin):
+    """Relit un fichier de colonnes bloc par bloc
+
+    Générateur de {colonne: tableau NumPy}, un par bloc écrit (un lot de
+    ColumnarSink, un paquet de l'export) : seul le bloc courant est en
+    mémoire, quelle que soit la taille du fichier.
+    """
+    with open(chemin, "rb") as fichier:
+        signature = fichier.read(len(SIGNATURE))
+        if signature not in (SIGNATURE, SIGNATURE_COMPRESSEE):
+            raise ValueError(f"{chemin} n'est pas un fichier de colonnes d'événements")
+        compresse = signature == SIGNATURE_COMPRESSEE
+        while True:
+            entete = fichier.read(ENTETE_BLOC.size)
+            if not entete:
+                return
+            (nombre,) = ENTETE_BLOC.unpack(entete)
+            bloc = {}
+            for nom, dtype in COLONNES:
+                if compresse:
+                    (taille,) = ENTETE_BLOC.unpack(fichier.read(ENTETE_BLOC.size))
+                    octets = zlib.decompress(fichier.read(taille))
+                else:
+                    octets = fichier.read(nombre * np.dtype(dtype).itemsize)
+                bloc[nom] = np.frombuffer(octets, dtype=dtype, count=nombre)
+            yield bloc
+
+
+def lire_annexe(chemin):
+    """Libellés et agrégats d'un fichier de colonnes (`chemin`.json)
+
+    Retourne ({colonne: [libellés]}, agrégats) ; le libellé du code k est
+    libelles[colonne][k - 1].
+    """
+    try:
+        with open(chemin + ".json", encoding="utf-8") as fichier:
+            annexe = json.load(fichier)
+    except FileNotFoundError:
+        return {colonne: [] for colonne in LIBELLES}, []
+    return annexe['libelles'], annexe['agregats']
+
+
+def lire_colonnes(chemin):
+    """Relit tout un fichier de ColumnarSink ou de l'export par colonnes
+
+    Retourne ({colonne: tableau NumPy}, {colonne: [libellés]}, agrégats).
+    Les colonnes entières sont en mémoire : pour un gros fichier, parcourir
+    plutôt lire_blocs().
+    """
+    morceaux = {nom: [] for nom, _ in COLONNES}
+    for bloc in lire_blocs(chemin):
+        for nom, colonne in bloc.items():
+            morceaux[nom].append(colonne)
+    colonnes = {nom: np.concatenate(liste) if liste else np.empty(0, dtype=dtype)
+                for (nom, dtype), liste in zip(COLONNES, morceaux.values())}
+    libelles, agregats = lire_annexe(chemin)
+    return colonnes, libelles, agregats
@@ -3,92 +3,122 @@ Module de journalisation
 Gère les logs et événements de la simulation
 """
 
-import time
-import math
-import turtle
+import numpy as np
+
+from spatial_hash import SpatialHash
+from vehicle_store import VehicleStore, CODES_DIRECTION, DIRECTIONS
+
+
+# Nom de direction par code, indexable par un tableau de codes
+NOMS_DIRECTIONS = np.array(DIRECTIONS)
 
 
 class Logger:
-    """Gère la journalisation et les alertes visuelles"""
-    
-    def __init__(self, db_manager):
+    """Gère la journalisation et délègue les alertes visuelles à une vue optionnelle"""
+
+    def __init__(self, db_manager, alert_view=None):
         self.db_manager = db_manager
+        self.alert_view = alert_view
         self.collision_count = 0
         self.violation_count = 0
-        self.last_warning_time = 0
-    
-    def log_collision(self, v1, v2, distance):
-        """Journalise une collision"""
-        self.collision_count += 1
-        
-        self.db_manager.log_event(
+        self.spatial_hash = SpatialHash()
+
+    def log_collisions(self, ids, x, y, directions, premiers, seconds):
+        """Journalise en un seul appel les collisions des paires (premiers[k], seconds[k])
+
+        Les paires sont des indices dans les colonnes ids, x, y et
+        directions (codes) ; chaque collision est rattachée au premier
+        véhicule de sa paire.
+        """
+        nombre = len(premiers)
+        self.collision_count += nombre
+
+        self.db_manager.log_many(
             'COLLISION',
             'Collision détectée',
-            id_voiture=v1.id,
-            position_x=(v1.xcor() + v2.xcor()) / 2,
-            position_y=(v1.ycor() + v2.ycor()) / 2,
-            vitesse=0.0
+            id_voiture=ids[premiers].tolist(),
+            direction=NOMS_DIRECTIONS[directions[premiers]].tolist(),
+            position_x=((x[premiers] + x[seconds]) / 2).tolist(),
+            position_y=((y[premiers] + y[seconds]) / 2).tolist(),
+            vitesse=[0.0] * nombre
         )
-        
-        self._show_collision_warning(v1, v2)
-    
+
+        if self.alert_view:
+            self.alert_view.show_collisions(nombre)
+
     def log_violation(self, v1, v2, distance, recommended):
         """Journalise une violation de distance"""
         self.violation_count += 1
-        
+
         self.db_manager.log_event(
             'VIOLATION',
             'Distance de sécurité violée',
             id_voiture=v1.id,
-            position_x=v1.xcor(),
-            position_y=v1.ycor()
+            direction=v1.direction,
+            position_x=v1.x,
+            position_y=v1.y
         )
-        
-        now = time.time()
-        if now - self.last_warning_time > 2:
-            self._show_violation_warning(v1, v2, distance)
-            self.last_warning_time = now
-    
-    def _show_collision_warning(self, v1, v2):
-        """Affiche un avertissement de collision"""
-        warning = turtle.Turtle()
-        warning.hideturtle()
-        warning.penup()
-        warning.goto(0, 280)
-        warning.color("red")
-        warning.write("⚠ COLLISION DÉTECTÉE !", 
-                     align="center", font=("Arial", 14, "bold"))
-        turtle.ontimer(lambda: warning.clear(), 2000)
-    
-    def _show_violation_warning(self, v1, v2, distance):
-        """Affiche un avertissement de violation"""
-        warning = turtle.Turtle()
-        warning.hideturtle()
-        warning.penup()
-        warning.goto(0, 300)
-        warning.color("orange")
-        warning.write(f"⚠ Distance de sécurité: {distance:.1f} pixels", 
-                     align="center", font=("Arial", 10, "bold"))
-        turtle.ontimer(lambda: warning.clear(), 1000)
-    
+
+        if self.alert_view:
+            self.alert_view.show_violation(v1, v2, distance)
+
     def check_collisions(self, vehicles, distance_threshold=18):
-        """Vérifie les collisions entre véhicules"""
-        for i, v1 in enumerate(vehicles):
-            for j, v2 in enumerate(vehicles):
-                if i >= j:
-                    continue
-                
-                distance = math.sqrt((v1.xcor() - v2.xcor())**2 + 
-                                   (v1.ycor() - v2.ycor())**2)
-                
-                # Collision SEULEMENT si:
-                # 1. Sur la même voie (même direction)
-                # 2. Ou dans le carrefour ET véhicules différents
-                same_direction = (v1.direction == v2.direction)
-                in_intersection = (abs(v1.xcor()) < 70 and abs(v1.ycor()) < 70 and 
-                                 abs(v2.xcor()) < 70 and abs(v2.ycor()) < 70)
-                
-                if distance < distance_threshold and (same_direction or in_intersection):
-                    self.log_collision(v1, v2, distance)
-                    v1.stop()
-                    v2.stop()
+        """Vérifie les collisions entre véhicules
+
+        `vehicles` est un VehicleStore (chemin vectorisé) ou une liste de
+        véhicules. La grille spatiale ne propose que les paires voisines ;
+        seules celles-ci passent le test de distance, et toutes les
+        collisions du pas sont journalisées d'un seul appel.
+        """
+        if isinstance(vehicles, VehicleStore):
+            store = vehicles
+            n = store.n
+            handles = store.handles
+            ids = store.ids[:n]
+            x = store.x[:n]
+            y = store.y[:n]
+            directions = store.direction[:n]
+        else:
+            handles = list(vehicles)
+            n = len(handles)
+            ids = np.array([v.id for v in handles], dtype=np.int64)
+            x = np.array([v.x for v in handles], dtype=float)
+            y = np.array([v.y for v in handles], dtype=float)
+            directions = np.array([CODES_DIRECTION[v.direction] for v in handles])
+        if n < 2:
+            return
+
+        # Phase large : paires de cellules voisines uniquement
+        if self.spatial_hash.taille_cellule < distance_threshold:
+            self.spatial_hash = SpatialHash(distance_threshold)
+        self.spatial_hash.construire(x, y)
+        i, j = self.spatial_hash.paires_candidates()
+        if len(i) == 0:
+            return
+
+        # Phase fine
+        distances = np.hypot(x[i] - x[j], y[i] - y[j])
+
+        # Collision SEULEMENT si:
+        # 1. Sur la même voie (même direction)
+        # 2. Ou dans le carrefour ET véhicules différents
+        same_direction = directions[i] == directions[j]
+        dans_carrefour = self.spatial_hash.dans_carrefour
+        in_intersection = dans_carrefour[i] & dans_carrefour[j]
+
+        collisions = np.flatnonzero((distances < distance_threshold) &
+                                    (same_direction | in_intersection))
+
+        if len(collisions) == 0:
+            return
+
+        # Même ordre que l'ancienne double boucle (i puis j croissants)
+        collisions = collisions[np.lexsort((j[collisions], i[collisions]))]
+        premiers = i[collisions]
+        seconds = j[collisions]
+        self.log_collisions(ids, x, y, directions, premiers, seconds)
+
+        # Chaque véhicule impliqué s'arrête une fois, quel que soit son
+        # nombre de collisions
+        for ligne in np.unique(np.concatenate((premiers, seconds))):
+            handles[ligne].stop()
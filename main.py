@@ -17,156 +17,33 @@ UTILISATION:
 """
 
 import time
-import random
 import turtle
 
+from clock import SimulatedClock
 from database import DatabaseManager
+from instrumentation import TickProfiler
 from traffic_light import TrafficLight
 from scenarios import CirculationNormale, HeureDePointe, ModeNuit
-from vehicles import Vehicle
-from turtle_scene import TurtleScene, TrafficLightView
+from simulation import Simulation
+from turtle_scene import TurtleScene, TrafficLightView, VehiclesView, AlertView
 from gui import GUI
-from logger import Logger
 
 
-class Simulation:
-    """Classe principale gérant la simulation complète"""
-    
-    def __init__(self, traffic_light, scenario, db_manager):
-        self.traffic_light = traffic_light
-        self.scenario = scenario
-        self.db_manager = db_manager
-        self.logger = Logger(db_manager)
-        
-        self.vehicles = []
-        self.running = False
-        self.paused = False
-        self.last_spawn_time = time.time()
-        self.collisions = 0
-        
-        # Journalisation
-        self.db_manager.log_event('SYSTEME', 'Simulation initialisée', 
-                                  scenario=self.scenario.name)
-    
-    def start(self):
-        """Démarre la simulation"""
-        if not self.running:
-            self.running = True
-            self.paused = False
-            self.db_manager.log_event('SYSTEME', 'Démarrage simulation')
-    
-    def pause(self):
-        """Met en pause ou reprend la simulation"""
-        if not self.running:
-            self.start()
-        elif self.paused:
-            self.paused = False
-            self.db_manager.log_event('SYSTEME', 'Reprise simulation')
-        else:
-            self.paused = True
-            self.db_manager.log_event('SYSTEME', 'Pause simulation')
-    
-    def stop(self):
-        """Arrête la simulation"""
-        if self.running:
-            self.running = False
-            self.paused = False
-            self.db_manager.log_event('SYSTEME', 'Arrêt simulation')
-    
-    def reset(self):
-        """Réinitialise la simulation"""
-        for v in self.vehicles:
-            v.hideturtle()
-            del v
-        self.vehicles = []
-        
-        self.traffic_light.etat_ns = self.traffic_light.EtatFeu.ROUGE
-        self.traffic_light.etat_eo = self.traffic_light.EtatFeu.VERT
-        self.traffic_light.phase = "EO"
-        self.traffic_light.mode_manuel = False
-        
-        self.collisions = 0
-        self.logger.collision_count = 0
-        self.logger.violation_count = 0
-        
-        self.running = False
-        self.paused = False
-        
-        self.db_manager.log_event('SYSTEME', 'Réinitialisation simulation')
-    
-    def change_scenario(self, new_scenario):
-        """Change le scénario de simulation"""
-        old_scenario = self.scenario.name
-        self.scenario = new_scenario
-        self.traffic_light.last_change = time.time()
-        self.traffic_light.set_auto_mode()
-        
-        # Ajuster le nombre de véhicules
-        self._adjust_vehicle_count()
-        
-        self.db_manager.log_event('SYSTEME', 'Changement de scénario',
-                                  scenario=new_scenario.name)
-    
-    def _adjust_vehicle_count(self):
-        """Ajuste le nombre de véhicules selon le scénario"""
-        target = self.scenario.nb_vehicules
-        
-        while len(self.vehicles) < target:
-            direction = random.choice(["EST", "OUEST", "NORD", "SUD"])
-            vehicle = Vehicle(direction, self.db_manager)
-            vehicle.distance_securite = self.scenario.distance_securite
-            self.vehicles.append(vehicle)
-        
-        while len(self.vehicles) > target:
-            v = self.vehicles.pop()
-            v.hideturtle()
-            del v
-    
-    def update(self):
-        """Met à jour l'état de la simulation"""
-        if not self.running or self.paused:
-            return
-        
-        # Apparition de nouveaux véhicules
-        if self.scenario.should_spawn_vehicle(self.last_spawn_time):
-            if len(self.vehicles) < self.scenario.nb_vehicules:
-                direction = random.choice(["EST", "OUEST", "NORD", "SUD"])
-                vehicle = Vehicle(direction, self.db_manager)
-                vehicle.distance_securite = self.scenario.distance_securite
-                self.vehicles.append(vehicle)
-                self.last_spawn_time = time.time()
-        
-        # Mise à jour du feu
-        self.traffic_light.update(self.scenario.durees_feu, self.scenario.name)
-        
-        # Vérification des collisions
-        self.logger.check_collisions(self.vehicles)
-        self.collisions = self.logger.collision_count
-        
-        # Mise à jour des véhicules
-        for v in self.vehicles:
-            # D'ABORD : vérifier s'il y a un véhicule devant (PRIORITÉ 1)
-            vehicle_ahead = v.check_vehicle_ahead(self.vehicles)
-            
-            if vehicle_ahead:
-                # Il y a quelqu'un devant : s'arrêter ou ralentir
-                if vehicle_ahead.is_stopped or vehicle_ahead.speed_value < 0.5:
-                    v.stop()
-                else:
-                    v.slow_down()
-            else:
-                # Pas de véhicule devant : regarder LE BON FEU (celui à droite)
-                # EST/OUEST regardent les feux EO
-                # NORD/SUD regardent les feux NS
-                if v.direction in ["EST", "OUEST"]:
-                    etat_feu = self.traffic_light.etat_eo
-                else:
-                    etat_feu = self.traffic_light.etat_ns
-                
-                self.scenario.apply_behavior(v, etat_feu)
-            
-            # Déplacer
-            v.move()
+# Pas de simulation (secondes simulées par update)
+PAS_SIMULATION = 0.03
+
+# Cadence de rendu visée
+IMAGES_PAR_SECONDE = 30
+
+# Pas de rattrapage au plus par tour de boucle
+PAS_MAX_PAR_TOUR = 5
+
+# Images sautées de suite au plus (l'interface doit rester réactive)
+IMAGES_SAUTEES_MAX = 5
+
+# Base écrite par un processus séparé : la journalisation ne prend plus le
+# GIL de la boucle Tk (utile sur plusieurs cœurs, voir log_sinks.ProcessSink)
+BD_PROCESSUS_SEPARE = False
 
 
 class Application:
@@ -178,8 +55,14 @@ class Application:
         print("=" * 70)
         print("\nInitialisation en cours...")
         
+        # Horloge à pas fixe : la boucle principale la cale sur l'horloge
+        # murale, le trafic garde sa vitesse quel que soit le coût du rendu
+        self.clock = SimulatedClock(PAS_SIMULATION)
+        self.images_sautees = 0
+        self.pas_abandonnes = 0
+        
         # Base de données
-        self.db_manager = DatabaseManager()
+        self.db_manager = DatabaseManager(clock=self.clock, processus=BD_PROCESSUS_SEPARE)
         print("✓ Base de données initialisée")
         
         # Scène
@@ -187,15 +70,23 @@ class Application:
         print("✓ Scène graphique créée")
         
         # Feu tricolore
-        self.traffic_light = TrafficLight(self.db_manager)
+        self.traffic_light = TrafficLight(self.db_manager, self.clock)
         print("✓ Feux tricolores initialisés")
         
         # Scénario initial
         self.scenario = CirculationNormale()
         print("✓ Scénario initial chargé")
         
-        # Simulation
-        self.simulation = Simulation(self.traffic_light, self.scenario, self.db_manager)
+        # Chronométrage des phases, écrit toutes les 5 s dans metriques_phases.jsonl
+        self.profiler = TickProfiler("metriques_phases.jsonl")
+        
+        # Simulation (les vues turtle sont de simples observateurs)
+        self.alert_view = AlertView()
+        self.simulation = Simulation(self.traffic_light, self.scenario, self.db_manager,
+                                     alert_view=self.alert_view, clock=self.clock,
+                                     profiler=self.profiler)
+        self.vehicles_view = VehiclesView()
+        self.simulation.add_observer(self.vehicles_view)
         print("✓ Moteur de simulation créé")
         
         # Interface
@@ -228,42 +119,94 @@ class Application:
         """Crée les véhicules initiaux"""
         directions = ["EST", "OUEST", "NORD", "SUD"]
         for i in range(self.scenario.nb_vehicules):
-            direction = directions[i % len(directions)]
-            vehicle = Vehicle(direction, self.db_manager)
-            vehicle.distance_securite = self.scenario.distance_securite
-            self.simulation.vehicles.append(vehicle)
+            self.simulation.add_vehicle(directions[i % len(directions)])
     
     def _main_loop(self):
-        """Boucle principale de la simulation"""
+        """Boucle principale à pas fixe
+        
+        La simulation avance par pas de PAS_SIMULATION secondes, autant
+        de pas qu'en demande l'horloge murale ; le rendu suit sa propre
+        cadence (IMAGES_PAR_SECONDE). Quand la simulation est en retard,
+        les images sont sautées pour la laisser rattraper, et l'attente
+        ne porte que sur le temps restant jusqu'à la prochaine échéance.
+        """
         try:
+            profiler = self.profiler
+            periode_image = 1 / IMAGES_PAR_SECONDE
+            prochain_pas = prochaine_image = time.perf_counter()
+            images_sautees = 0
             while True:
-                # Mise à jour
-                self.simulation.update()
+                # Simulation : rattrape le temps écoulé, par pas fixes
+                maintenant = time.perf_counter()
+                pas_faits = 0
+                while prochain_pas <= maintenant and pas_faits < PAS_MAX_PAR_TOUR:
+                    with profiler.phase('update'):
+                        self.simulation.update()
+                    prochain_pas += PAS_SIMULATION
+                    pas_faits += 1
                 
-                # Affichage des feux
-                for direction in ['EST', 'OUEST', 'NORD', 'SUD']:
-                    if direction in ['EST', 'OUEST']:
-                        etat = self.traffic_light.etat_eo
-                    else:
-                        etat = self.traffic_light.etat_ns
-                    
-                    self.traffic_light_views[direction].draw(etat, self.traffic_light.clignotement)
+                # Trop de retard (machine saturée) : on renonce à le rattraper
+                # plutôt que d'accumuler, le trafic ralentit sans se dérégler
+                if maintenant - prochain_pas > PAS_SIMULATION * PAS_MAX_PAR_TOUR:
+                    self.pas_abandonnes += round((maintenant - prochain_pas) / PAS_SIMULATION)
+                    prochain_pas = maintenant
                 
-                # Mise à jour du statut
-                self.gui.update_status()
+                # Rendu : à la cadence cible, sauté tant que la simulation
+                # est en retard (mais jamais plus de IMAGES_SAUTEES_MAX de suite,
+                # le rafraîchissement traite aussi les clics)
+                if prochaine_image <= maintenant:
+                    en_retard = prochain_pas <= time.perf_counter()
+                    if en_retard and images_sautees < IMAGES_SAUTEES_MAX:
+                        images_sautees += 1
+                        self.images_sautees += 1
+                    else:
+                        images_sautees = 0
+                        self._render()
+                    prochaine_image = max(prochaine_image + periode_image, maintenant)
                 
-                # Rafraîchir
-                self.scene.refresh()
+                profiler.maybe_dump()
                 
-                time.sleep(0.03)
+                # Attendre la prochaine échéance (pas ou image), pas plus
+                attente = min(prochain_pas, prochaine_image) - time.perf_counter()
+                if attente > 0:
+                    time.sleep(attente)
         
         except turtle.Terminator:
             print("\nSimulation terminée.")
         except KeyboardInterrupt:
             print("\nArrêt demandé par l'utilisateur.")
         finally:
+            print(f"Images sautées : {self.images_sautees}, "
+                  f"pas de simulation abandonnés : {self.pas_abandonnes}")
             print("Fermeture de l'application...")
     
+    def _render(self):
+        """Dessine une image : véhicules, feux, statut, rafraîchissement"""
+        profiler = self.profiler
+        with profiler.phase('render'):
+            # Affichage des véhicules
+            self.vehicles_view.draw()
+            
+            # Affichage des feux
+            for direction in ['EST', 'OUEST', 'NORD', 'SUD']:
+                if direction in ['EST', 'OUEST']:
+                    etat = self.traffic_light.etat_eo
+                else:
+                    etat = self.traffic_light.etat_ns
+                
+                self.traffic_light_views[direction].draw(etat, self.traffic_light.clignotement)
+            
+            # Alertes regroupées
+            self.alert_view.draw()
+        
+        # Mise à jour du statut
+        with profiler.phase('status'):
+            self.gui.update_status()
+        
+        # Rafraîchir
+        with profiler.phase('refresh'):
+            self.scene.refresh()
+    
     def _show_instructions(self):
         """Affiche les instructions"""
         print("\n📖 INSTRUCTIONS:")
@@ -0,0 +1,337 @@
+"""
+Module du réseau d'intersections
+Relie plusieurs carrefours (chacun avec son feu tricolore) en un graphe routier,
+transmet les véhicules d'un carrefour au suivant et répartit les grands réseaux
+en partitions exécutées chacune dans son processus
+
+Chaque intersection est une Simulation complète dans son repère local (le
+carrefour habituel, départs à ±420 / ±300) ; `position` la place dans le
+repère du réseau. Un véhicule qui quitte un carrefour par un côté relié
+entre dans le voisin par son départ dans la même direction : un véhicule
+allant vers l'EST sort à l'est de A et entre à l'ouest de B. Un véhicule
+qui sort par un côté non relié quitte le réseau.
+
+UTILISATION:
+    python network.py --lignes 4 --colonnes 8 --processus 4 --duree 300
+"""
+
+import argparse
+import itertools
+import math
+import multiprocessing
+import random
+import sqlite3
+import time
+
+from clock import SimulatedClock, SharedClockView
+from database import DatabaseManager
+from db_schema import init_schema
+from headless import SCENARIOS, build_simulation
+from sweep import SweepStats
+
+
+# Direction opposée (lien retour)
+OPPOSEES = {"EST": "OUEST", "OUEST": "EST", "NORD": "SUD", "SUD": "NORD"}
+
+# Distance entre deux carrefours voisins dans le repère du réseau
+ESPACEMENT = 900
+
+# Identifiants de véhicules réservés à chaque carrefour : un véhicule créé
+# au carrefour numéro k reçoit un id de k * ID_PAR_CARREFOUR + 1 à
+# (k + 1) * ID_PAR_CARREFOUR, qu'il garde d'un carrefour à l'autre
+ID_PAR_CARREFOUR = 1_000_000
+
+
+class Intersection:
+    """Description d'un carrefour du réseau (sérialisable vers un processus)
+
+    liens[direction] est le nom du carrefour atteint par les véhicules
+    qui sortent en roulant dans cette direction ; `numero` est son rang
+    d'ajout dans le réseau.
+    """
+
+    def __init__(self, nom, position, scenario, numero=0):
+        self.nom = nom
+        self.numero = numero
+        self.position = position
+        self.scenario = scenario
+        self.liens = {}
+
+
+class RoadNetwork:
+    """Graphe routier : carrefours et liens orientés entre eux"""
+
+    def __init__(self):
+        self.intersections = {}
+
+    def ajouter(self, nom, position, scenario):
+        """Ajoute un carrefour avec son scénario (instance de Scenario)"""
+        if nom in self.intersections:
+            raise ValueError(f"Carrefour déjà présent : {nom}")
+        intersection = Intersection(nom, position, scenario, len(self.intersections))
+        self.intersections[nom] = intersection
+        return intersection
+
+    def relier(self, depart, direction, arrivee):
+        """Relie `depart` à `arrivee` dans `direction`, et le retour"""
+        self.intersections[depart].liens[direction] = arrivee
+        self.intersections[arrivee].liens[OPPOSEES[direction]] = depart
+
+    @classmethod
+    def grille(cls, lignes, colonnes, scenario="normale"):
+        """Réseau en grille lignes x colonnes, carrefours nommés 'L<i>C<j>'"""
+        reseau = cls()
+        for i in range(lignes):
+            for j in range(colonnes):
+                reseau.ajouter(f"L{i}C{j}", (j * ESPACEMENT, i * ESPACEMENT),
+                               SCENARIOS[scenario]())
+        for i in range(lignes):
+            for j in range(colonnes):
+                if j + 1 < colonnes:
+                    reseau.relier(f"L{i}C{j}", "EST", f"L{i}C{j + 1}")
+                if i + 1 < lignes:
+                    reseau.relier(f"L{i}C{j}", "NORD", f"L{i + 1}C{j}")
+        return reseau
+
+    @classmethod
+    def corridor(cls, longueur, scenario="normale"):
+        """Enfilade de carrefours d'ouest en est"""
+        return cls.grille(1, longueur, scenario)
+
+    def partitionner(self, nombre):
+        """Découpe le réseau en `nombre` partitions de carrefours contigus
+
+        Les carrefours sont rangés par colonne (x) puis par ligne (y) et
+        coupés en blocs égaux : dans une grille, seules les frontières
+        entre blocs de colonnes échangent des véhicules.
+        """
+        noms = sorted(self.intersections,
+                      key=lambda nom: self.intersections[nom].position)
+        nombre = max(1, min(nombre, len(noms)))
+        taille = math.ceil(len(noms) / nombre)
+        return [noms[k:k + taille] for k in range(0, len(noms), taille)]
+
+
+class IntersectionJournal:
+    """Journal d'un carrefour : partage le DatabaseManager de sa partition
+    mais ses événements portent son propre run_id
+
+    `evenements` compte les événements journalisés par le carrefour.
+    """
+
+    def __init__(self, db_manager, description):
+        self.db_manager = db_manager
+        self.run_id = db_manager.open_run(description)
+        self.evenements = 0
+
+    def log_event(self, type_action, action, **kwargs):
+        self.db_manager.log_event(type_action, action, run_id=self.run_id, **kwargs)
+        self.evenements += 1
+
+    def log_many(self, type_action, action, **colonnes):
+        self.db_manager.log_many(type_action, action, run_id=self.run_id, **colonnes)
+        self.evenements += len(next(iter(colonnes.values())))
+
+    def start_run(self, description=None):
+        self.db_manager.end_run(self.run_id)
+        self.run_id = self.db_manager.open_run(description)
+        return self.run_id
+
+
+class PartitionEngine:
+    """Fait avancer les carrefours d'une partition, pas par pas
+
+    step(entrants) injecte les véhicules reçus au pas précédent, met à
+    jour chaque carrefour et rend les véhicules à transmettre. Tous les
+    transferts, internes à la partition ou non, prennent effet au pas
+    suivant : le trajet d'un véhicule ne dépend pas du découpage.
+
+    Les carrefours lisent l'horloge de la partition, avancée une fois par
+    pas, et tirent leurs apparitions dans un générateur propre, dérivé de
+    `graine` et de leur nom : le résultat ne dépend pas non plus du nombre
+    de processus.
+
+    Un transfert est un tuple (carrefour d'arrivée, direction, vitesse,
+    id du véhicule) ; le véhicule garde son id dans le carrefour suivant.
+    `depart` (secondes epoch, l'heure actuelle par défaut) est commun à
+    toutes les partitions d'un réseau.
+    """
+
+    def __init__(self, intersections, pas=0.03, db_name=None, depart=None, graine=0):
+        self.clock = SimulatedClock(pas, depart)
+        horloge_carrefours = SharedClockView(self.clock)
+        self.db_manager = None
+        if db_name is not None:
+            self.db_manager = DatabaseManager(db_name, self.clock,
+                                              run_description="réseau (partition)")
+        self.intersections = {intersection.nom: intersection for intersection in intersections}
+        self.simulations = {}
+        self.stats = {}
+        self._sortants = []
+        for nom, intersection in self.intersections.items():
+            if self.db_manager is not None:
+                journal = IntersectionJournal(self.db_manager, f"réseau {nom}")
+            else:
+                journal = SweepStats(self.clock)
+            simulation = build_simulation(intersection.scenario, journal, horloge_carrefours,
+                                          aleatoire=random.Random(f"{graine}:{nom}"),
+                                          ids_vehicules=itertools.count(
+                                              intersection.numero * ID_PAR_CARREFOUR + 1))
+            simulation.exit_handler = self._sortie
+            simulation.nom = nom
+            simulation.start()
+            self.simulations[nom] = simulation
+            self.stats[nom] = {'entres': 0, 'transmis': 0, 'sortis_reseau': 0}
+
+    def _sortie(self, simulation, vehicules):
+        """Transmet les véhicules sortis au voisin, ou les retire du réseau"""
+        liens = self.intersections[simulation.nom].liens
+        stats = self.stats[simulation.nom]
+        for vehicle in vehicules:
+            voisin = liens.get(vehicle.direction)
+            if voisin is None:
+                stats['sortis_reseau'] += 1
+            else:
+                stats['transmis'] += 1
+                self._sortants.append((voisin, vehicle.direction, vehicle.max_speed, vehicle.id))
+            simulation._remove_vehicle(vehicle)
+
+    def step(self, entrants=()):
+        """Un pas de toute la partition ; retourne les transferts produits"""
+        for nom, direction, vitesse, id_voiture in entrants:
+            simulation = self.simulations[nom]
+            vehicle = simulation.add_vehicle(direction, id_voiture,
+                                             action='Entrée depuis un carrefour voisin')
+            vehicle.max_speed = vitesse
+            self.stats[nom]['entres'] += 1
+
+        self._sortants = []
+        self.clock.tick()
+        for simulation in self.simulations.values():
+            simulation.update()
+        return self._sortants
+
+    def resume(self):
+        """Statistiques par carrefour (et événements journalisés avec une base)"""
+        resume = {}
+        for nom, simulation in self.simulations.items():
+            resume[nom] = {'vehicules': len(simulation.vehicles),
+                           'collisions': simulation.collisions,
+                           **self.stats[nom]}
+            if self.db_manager is not None:
+                resume[nom]['evenements'] = simulation.db_manager.evenements
+        return resume
+
+    def close(self):
+        """Clôt les exécutions et vide la file de journalisation"""
+        if self.db_manager is not None:
+            for simulation in self.simulations.values():
+                self.db_manager.end_run(simulation.db_manager.run_id)
+            self.db_manager.close()
+
+
+def _partition_worker(connexion, intersections, pas, db_name, depart, graine):
+    """Processus d'une partition : un pas par message reçu"""
+    engine = PartitionEngine(intersections, pas, db_name, depart, graine)
+    while True:
+        message = connexion.recv()
+        if message is None:
+            break
+        connexion.send(engine.step(message))
+    engine.close()
+    connexion.send(engine.resume())
+    connexion.close()
+
+
+def run_network(reseau, ticks, processus=1, pas=0.03, db_name=None, graine=0, depart=None):
+    """Simule le réseau pendant `ticks` pas sur `processus` processus
+
+    Le processus principal sert de routeur : à chaque pas, il envoie à
+    chaque partition les véhicules qui lui arrivent, puis attend les
+    véhicules qu'elle transmet. Toutes les partitions partent de
+    `depart` (secondes epoch, l'heure actuelle par défaut). Retourne les
+    statistiques par carrefour.
+    """
+    partitions = reseau.partitionner(processus)
+    if depart is None:
+        depart = time.time()
+    if db_name is not None:
+        # Schéma créé une seule fois, avant que les partitions ne l'ouvrent
+        conn = sqlite3.connect(db_name)
+        init_schema(conn.cursor())
+        conn.commit()
+        conn.close()
+
+    if len(partitions) == 1:
+        engine = PartitionEngine([reseau.intersections[nom] for nom in partitions[0]],
+                                 pas, db_name, depart, graine)
+        entrants = []
+        for _ in range(ticks):
+            entrants = engine.step(entrants)
+        engine.close()
+        return engine.resume()
+
+    partition_de = {nom: k for k, noms in enumerate(partitions) for nom in noms}
+    connexions = []
+    workers = []
+    for noms in partitions:
+        parent, enfant = multiprocessing.Pipe()
+        worker = multiprocessing.Process(
+            target=_partition_worker,
+            args=(enfant, [reseau.intersections[nom] for nom in noms], pas, db_name,
+                  depart, graine),
+            daemon=True)
+        worker.start()
+        connexions.append(parent)
+        workers.append(worker)
+
+    entrants = [[] for _ in partitions]
+    for _ in range(ticks):
+        for connexion, arrivees in zip(connexions, entrants):
+            connexion.send(arrivees)
+        entrants = [[] for _ in partitions]
+        for connexion in connexions:
+            for transfert in connexion.recv():
+                entrants[partition_de[transfert[0]]].append(transfert)
+
+    resume = {}
+    for connexion, worker in zip(connexions, workers):
+        connexion.send(None)
+        resume.update(connexion.recv())
+        worker.join()
+    return resume
+
+
+def main():
+    """Point d'entrée en ligne de commande"""
+    parser = argparse.ArgumentParser(description="Simulation d'un réseau de carrefours")
+    parser.add_argument('--lignes', type=int, default=1)
+    parser.add_argument('--colonnes', type=int, default=4)
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='normale')
+    parser.add_argument('--duree', type=float, default=60.0,
+                        help="durée simulée en secondes")
+    parser.add_argument('--pas', type=float, default=0.03)
+    parser.add_argument('--processus', type=int, default=1,
+                        help="nombre de partitions (un processus chacune)")
+    parser.add_argument('--db', help="journalise dans cette base (une exécution par carrefour)")
+    parser.add_argument('--graine', type=int, default=0,
+                        help="graine des apparitions (même résultat quel que soit --processus)")
+    args = parser.parse_args()
+
+    reseau = RoadNetwork.grille(args.lignes, args.colonnes, args.scenario)
+    ticks = math.ceil(args.duree / args.pas)
+    debut = time.perf_counter()
+    resume = run_network(reseau, ticks, args.processus, args.pas, args.db, args.graine)
+    duree = time.perf_counter() - debut
+
+    print(f"Réseau {args.lignes} x {args.colonnes} ({len(resume)} carrefours), "
+          f"{args.processus} processus : {args.duree:.0f} s simulées en {duree:.2f} s")
+    for nom in sorted(resume, key=lambda nom: reseau.intersections[nom].position):
+        stats = resume[nom]
+        print(f"  {nom:<8} véhicules {stats['vehicules']:3d}  collisions {stats['collisions']:5d}  "
+              f"entrés {stats['entres']:4d}  transmis {stats['transmis']:4d}  "
+              f"sortis du réseau {stats['sortis_reseau']:4d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Module du partitionnement du journal par période
+Le journal brut peut être réparti en fichiers SQLite d'une période chacun
+(une heure, un jour...) rangés dans <base>_journal/ à côté de la base
+principale, qui garde exécutions, dictionnaires, tables typées, résumés
+et cumuls par minute / heure. La rétention supprime les fichiers entiers
+des périodes trop anciennes : ni DELETE ni VACUUM sur un gros fichier.
+"""
+
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+
+from db_schema import (COLONNES_JOURNAL, SQL_VUE_EVENEMENTS, TABLES_TYPEES,
+                       create_journal_partition)
+
+
+# Nom d'un fichier de partition : début de sa période (UTC)
+FORMAT_FICHIER = "journal_%Y%m%dT%H%M%SZ.db"
+
+# Partitions attachées au plus par l'écrivain (la courante et la précédente,
+# pour les événements en retard d'un lot)
+ATTACHEES_MAX = 2
+
+
+def dossier_partitions(db_name):
+    """Dossier des partitions du journal d'une base"""
+    return os.path.splitext(db_name)[0] + "_journal"
+
+
+def fichiers_partitions(db_name):
+    """[(début en secondes epoch, chemin)] des partitions, de la plus ancienne à la plus récente"""
+    dossier = dossier_partitions(db_name)
+    if not os.path.isdir(dossier):
+        return []
+    fichiers = []
+    for nom in os.listdir(dossier):
+        try:
+            debut = datetime.strptime(nom, FORMAT_FICHIER).replace(tzinfo=timezone.utc)
+        except ValueError:
+            continue
+        fichiers.append((debut.timestamp(), os.path.join(dossier, nom)))
+    return sorted(fichiers)
+
+
+def _supprimer_fichier(chemin):
+    """Supprime une base SQLite et ses fichiers WAL"""
+    for suffixe in ("", "-wal", "-shm"):
+        if os.path.exists(chemin + suffixe):
+            os.remove(chemin + suffixe)
+
+
+def attacher_partitions(conn, db_name):
+    """Rend les partitions lisibles depuis `conn` par la vue `evenements`
+
+    Attache chaque partition et crée une vue temporaire `evenements`, qui
+    masque celle de la base principale et couvre aussi les partitions.
+    Sans partition, ne fait rien. Le nombre de bases attachées est limité
+    par SQLite (10 par défaut) : au-delà, lire les partitions une à une.
+    """
+    fichiers = fichiers_partitions(db_name)
+    if not fichiers:
+        return 0
+    limite = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+    if len(fichiers) > limite:
+        raise ValueError(f"{len(fichiers)} partitions, SQLite n'en attache que {limite}")
+    sources = ['main.journal_evenements']
+    for k, (_, chemin) in enumerate(fichiers):
+        conn.execute(f"ATTACH DATABASE ? AS lecture_{k}", (chemin,))
+        sources.append(f"lecture_{k}.journal_evenements")
+    conn.execute("CREATE TEMP VIEW evenements AS "
+                 + " UNION ALL ".join(SQL_VUE_EVENEMENTS.format(journal=source)
+                                      for source in sources))
+    return len(fichiers)
+
+
+class JournalPartitions:
+    """Routage des événements vers la partition de leur période
+
+    Utilisé par SQLiteSink dans son thread d'écriture. La période d'un
+    événement se lit sur son heure murale (runs.debut_epoch + écart de
+    ts_ns au début de l'exécution), comme l'horodatage de la vue
+    `evenements`. Les id restent uniques d'une partition à l'autre : les
+    tables typées y renvoient.
+
+    Les lignes déjà présentes dans le journal de la base principale (base
+    antérieure au partitionnement) y restent : elles ne sont rattachées à
+    aucune période, la vue `evenements` les montre toujours et la
+    rétention n'y touche pas.
+
+    Avec `retention` (secondes), chaque nouvelle période fait supprimer les
+    partitions terminées depuis plus longtemps que la rétention par rapport
+    à l'événement le plus récent, avec les lignes correspondantes des
+    tables typées. Résumés et cumuls sont gardés.
+    """
+
+    def __init__(self, db_name, periode, retention=None, synchronous="NORMAL"):
+        if periode <= 0:
+            raise ValueError("La période d'une partition doit être positive")
+        if retention is not None and retention < periode:
+            raise ValueError("La rétention doit couvrir au moins une période")
+        self.dossier = dossier_partitions(db_name)
+        self.periode = periode
+        self.retention = retention
+        self.synchronous = synchronous
+        self.db_name = db_name
+
+        self.attachees = {}       # période -> nom de la base attachée
+        self.debuts_runs = {}     # run_id -> (debut_epoch, debut_ns)
+        self.prochain_id = None
+        self.plus_recent = None
+        self.supprimees = 0
+
+    def chemin(self, periode):
+        """Fichier de la partition d'une période"""
+        debut = datetime.fromtimestamp(periode * self.periode, timezone.utc)
+        return os.path.join(self.dossier, debut.strftime(FORMAT_FICHIER))
+
+    def ouvrir(self, conn):
+        """Reprend la numérotation des id après le plus grand déjà écrit"""
+        os.makedirs(self.dossier, exist_ok=True)
+        plus_grand = conn.execute("SELECT MAX(id) FROM journal_evenements").fetchone()[0] or 0
+        for _, chemin in fichiers_partitions(self.db_name):
+            plus_grand = max(plus_grand, self._plus_grand_id(chemin))
+        self.prochain_id = plus_grand + 1
+
+    @staticmethod
+    def _plus_grand_id(chemin):
+        """Plus grand id du journal d'une partition (0 si vide)"""
+        conn = sqlite3.connect(chemin)
+        try:
+            return conn.execute("SELECT MAX(id) FROM journal_evenements").fetchone()[0] or 0
+        except sqlite3.OperationalError:
+            return 0
+        finally:
+            conn.close()
+
+    def _epoch(self, conn, event):
+        """Heure murale d'un événement, en secondes"""
+        run_id = event.get('run_id')
+        debut = self.debuts_runs.get(run_id)
+        if debut is None and run_id is not None:
+            ligne = conn.execute("SELECT debut_epoch, debut_ns FROM runs WHERE run_id = ?",
+                                 (run_id,)).fetchone()
+            if ligne is not None and ligne[0] is not None:
+                debut = self.debuts_runs[run_id] = ligne
+        if debut is None:
+            return time.time()
+        return debut[0] + (event['ts_ns'] - debut[1]) / 1e9
+
+    def repartir(self, conn, events):
+        """Groupe les événements par partition, attachée au besoin
+
+        Retourne [(schéma, événements)] dans l'ordre d'arrivée des
+        périodes. À appeler hors transaction (ATTACH l'interdit).
+        """
+        groupes = {}
+        for event in events:
+            epoch = self._epoch(conn, event)
+            if self.plus_recent is None or epoch > self.plus_recent:
+                self.plus_recent = epoch
+            groupes.setdefault(int(epoch // self.periode), []).append(event)
+        nouvelles = [periode for periode in groupes if periode not in self.attachees]
+        for periode in nouvelles:
+            self._attacher(conn, periode, gardees=groupes)
+        if nouvelles and self.retention is not None:
+            self._appliquer_retention(conn, gardees=groupes)
+        return [(self.attachees[periode], lot) for periode, lot in groupes.items()]
+
+    def _attacher(self, conn, periode, gardees=()):
+        anciennes = sorted(p for p in self.attachees if p not in gardees)
+        while anciennes and len(self.attachees) >= ATTACHEES_MAX:
+            self._detacher(conn, anciennes.pop(0))
+        schema = f"partition_{periode}"
+        conn.execute("ATTACH DATABASE ? AS " + schema, (self.chemin(periode),))
+        conn.execute(f"PRAGMA {schema}.journal_mode=WAL")
+        conn.execute(f"PRAGMA {schema}.synchronous={self.synchronous}")
+        create_journal_partition(conn.cursor(), schema)
+        self.attachees[periode] = schema
+
+    def _detacher(self, conn, periode):
+        conn.execute("DETACH DATABASE " + self.attachees.pop(periode))
+
+    def deplacer(self, conn, schema, premier, dernier):
+        """Transfère vers la partition les lignes que le lot vient d'insérer
+
+        Le lot passe d'abord par journal_evenements de la base principale
+        pour déclencher les tables typées ; il ne fait qu'y transiter. Seuls les id `premier`..`dernier` (ceux du lot) sont
+        transférés.
+        """
+        colonnes = ", ".join(COLONNES_JOURNAL)
+        conn.execute(f"INSERT INTO {schema}.journal_evenements ({colonnes}) "
+                     f"SELECT {colonnes} FROM main.journal_evenements "
+                     "WHERE id BETWEEN ? AND ?", (premier, dernier))
+        conn.execute("DELETE FROM main.journal_evenements WHERE id BETWEEN ? AND ?",
+                     (premier, dernier))
+
+    def _appliquer_retention(self, conn, gardees=()):
+        """Supprime les partitions sorties de la fenêtre de rétention
+
+        Les périodes de `gardees` (celles du lot en cours) sont épargnées.
+        """
+        limite = self.plus_recent - self.retention
+        for debut, chemin in fichiers_partitions(self.db_name):
+            if debut + self.periode > limite:
+                break
+            periode = int(debut // self.periode)
+            if periode in gardees:
+                continue
+            if periode in self.attachees:
+                self._detacher(conn, periode)
+            # Les id d'une partition ne forment pas une plage (événements
+            # en retard) : supprimer exactement les siens
+            conn.execute("ATTACH DATABASE ? AS retention", (chemin,))
+            try:
+                with conn:
+                    for table in TABLES_TYPEES:
+                        conn.execute(f"DELETE FROM {table} WHERE evenement_id IN "
+                                     "(SELECT id FROM retention.journal_evenements)")
+            finally:
+                conn.execute("DETACH DATABASE retention")
+            _supprimer_fichier(chemin)
+            self.supprimees += 1
+
+    def fermer(self, conn):
+        """Détache les partitions"""
+        for periode in list(self.attachees):
+            self._detacher(conn, periode)
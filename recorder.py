@@ -0,0 +1,167 @@
+"""
+Module d'enregistrement des trajectoires
+Écrit à chaque pas l'état de tous les véhicules dans un fichier binaire à
+lignes de largeur fixe, relu ensuite par projection mémoire (memmap)
+
+Un enregistrement se compose de deux fichiers :
+    <chemin>.traj : en-tête puis une ligne LIGNE par véhicule et par pas
+    <chemin>.idx  : en-tête puis une ligne INDEX par pas (première ligne,
+                    nombre de lignes et horodatage en nanosecondes)
+"""
+
+import os
+import struct
+
+import numpy as np
+
+
+# Une ligne par véhicule et par pas (22 octets, petit-boutiste)
+LIGNE = np.dtype([
+    ('tick', '<u4'),
+    ('id', '<u4'),
+    ('x', '<f4'),
+    ('y', '<f4'),
+    ('speed', '<f4'),
+    ('direction', 'u1'),   # code de vehicle_store.DIRECTIONS
+    ('arret', 'u1'),       # 1 si le véhicule est arrêté
+])
+
+# Une ligne d'index par pas : les lignes du pas t sont [debut, debut + nb)
+INDEX = np.dtype([
+    ('debut', '<u8'),
+    ('nb', '<u4'),
+    ('ts_ns', '<i8'),
+])
+
+# En-tête commun aux deux fichiers : signature et run_id (-1 si inconnu)
+SIGNATURE = b"TRAJ0001"
+ENTETE = struct.Struct("<8sq")
+
+
+def _chemins(chemin):
+    """Chemins du fichier de lignes et du fichier d'index"""
+    return chemin + ".traj", chemin + ".idx"
+
+
+class TrajectoryRecorder:
+    """Enregistreur des trajectoires de tous les véhicules, pas par pas
+
+    record() copie les colonnes du magasin dans un tampon ; le tampon est
+    écrit sur disque dès qu'il dépasse `taille_tampon` lignes, et à la
+    fermeture. Les lignes sont toujours écrites avant l'index : un
+    lecteur ne voit jamais un pas dont les lignes manquent.
+    """
+
+    def __init__(self, chemin, run_id=None, taille_tampon=65536):
+        self.chemin = chemin
+        self.run_id = run_id
+        self.taille_tampon = taille_tampon
+        self.tick = 0
+        self.nb_lignes = 0
+
+        chemin_lignes, chemin_index = _chemins(chemin)
+        entete = ENTETE.pack(SIGNATURE, -1 if run_id is None else run_id)
+        self._fichier_lignes = open(chemin_lignes, "wb")
+        self._fichier_index = open(chemin_index, "wb")
+        self._fichier_lignes.write(entete)
+        self._fichier_index.write(entete)
+
+        self._lignes = []
+        self._index = []
+        self._en_attente = 0
+
+    def record(self, ts_ns, store):
+        """Ajoute l'état courant de tous les véhicules du magasin"""
+        n = store.n
+        lignes = np.empty(n, dtype=LIGNE)
+        lignes['tick'] = self.tick
+        lignes['id'] = store.ids[:n]
+        lignes['x'] = store.x[:n]
+        lignes['y'] = store.y[:n]
+        lignes['speed'] = store.speed[:n]
+        lignes['direction'] = store.direction[:n]
+        lignes['arret'] = store.is_stopped[:n]
+        self._lignes.append(lignes)
+        self._index.append((self.nb_lignes, n, ts_ns))
+
+        self.tick += 1
+        self.nb_lignes += n
+        self._en_attente += n
+        if self._en_attente >= self.taille_tampon:
+            self.flush()
+
+    def flush(self):
+        """Écrit le tampon sur disque"""
+        if self._index:
+            self._fichier_lignes.write(np.concatenate(self._lignes).tobytes())
+            self._fichier_lignes.flush()
+            self._fichier_index.write(np.array(self._index, dtype=INDEX).tobytes())
+            self._fichier_index.flush()
+        self._lignes = []
+        self._index = []
+        self._en_attente = 0
+
+    def close(self):
+        """Vide le tampon et ferme les fichiers"""
+        self.flush()
+        self._fichier_lignes.close()
+        self._fichier_index.close()
+
+
+class TrajectoryReader:
+    """Lecture d'un enregistrement par projection mémoire
+
+    Les tranches renvoyées sont des vues sur le fichier (tableaux
+    structurés de dtype LIGNE) : rien n'est lu avant d'être utilisé.
+    """
+
+    def __init__(self, chemin):
+        chemin_lignes, chemin_index = _chemins(chemin)
+        with open(chemin_index, "rb") as fichier:
+            signature, run_id = ENTETE.unpack(fichier.read(ENTETE.size))
+        if signature != SIGNATURE:
+            raise ValueError(f"Fichier de trajectoires invalide : {chemin_index}")
+        self.run_id = None if run_id < 0 else run_id
+
+        self.index = self._projeter(chemin_index, INDEX)
+        self.lignes = self._projeter(chemin_lignes, LIGNE)
+        # Un enregistrement interrompu peut avoir des lignes non indexées
+        if len(self.index):
+            fin = int(self.index['debut'][-1]) + int(self.index['nb'][-1])
+            self.lignes = self.lignes[:fin]
+
+    @staticmethod
+    def _projeter(chemin, dtype):
+        """memmap du fichier après l'en-tête (tableau vide si aucune ligne)"""
+        nb = (os.path.getsize(chemin) - ENTETE.size) // dtype.itemsize
+        if nb <= 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(chemin, dtype=dtype, mode="r", offset=ENTETE.size, shape=(nb,))
+
+    @property
+    def nb_ticks(self):
+        """Nombre de pas enregistrés"""
+        return len(self.index)
+
+    def ticks(self, debut=0, fin=None):
+        """Lignes des pas [debut, fin)"""
+        fin = self.nb_ticks if fin is None else min(fin, self.nb_ticks)
+        if debut >= fin:
+            return self.lignes[:0]
+        premiere = int(self.index['debut'][debut])
+        derniere = int(self.index['debut'][fin - 1]) + int(self.index['nb'][fin - 1])
+        return self.lignes[premiere:derniere]
+
+    def tick(self, t):
+        """Lignes d'un seul pas"""
+        return self.ticks(t, t + 1)
+
+    def vehicule(self, id_voiture, debut=0, fin=None):
+        """Trajectoire d'un véhicule sur les pas [debut, fin)"""
+        lignes = self.ticks(debut, fin)
+        return lignes[lignes['id'] == id_voiture]
+
+    def tick_a(self, ts_ns):
+        """Dernier pas enregistré à l'instant ts_ns ou avant (0 si avant le début)"""
+        t = int(np.searchsorted(self.index['ts_ns'], ts_ns, side="right")) - 1
+        return max(t, 0)
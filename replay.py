@@ -0,0 +1,353 @@
+"""
+Module de relecture d'une exécution enregistrée
+Rejoue une exécution à partir du journal `evenements` et des trajectoires
+(voir recorder), avec lecture, pause, vitesse variable et saut instantané
+
+UTILISATION:
+    python replay.py --trajectoires traces/run
+    python replay.py --trajectoires traces/run --depart 3540 --vitesse 0.5
+
+Clavier : Espace lecture/pause, ← → recul/avance de 10 s,
+↑ ↓ vitesse x2 / ÷2
+"""
+
+import argparse
+import bisect
+import collections
+import sqlite3
+import time
+import turtle
+
+from partitions import attacher_partitions
+from recorder import TrajectoryReader
+from traffic_light import EtatFeu
+from turtle_scene import TurtleScene, TrafficLightView, VehiclesView
+from vehicle_store import CAPS
+from vehicles import COULEURS_VEHICULES
+
+
+# Intervalle par défaut entre deux images clés (secondes simulées)
+INTERVALLE_IMAGE_CLE = 10.0
+
+# Événements lus par appel à fetchmany
+TAILLE_PAQUET = 5000
+
+# Demi-période du clignotement orange du mode nuit (voir TrafficLight)
+DEMI_PERIODE_CLIGNOTEMENT_NS = 500_000_000
+
+
+class ReplayState:
+    """État reconstruit à partir du journal : feux, scénario et compteurs"""
+
+    def __init__(self):
+        self.etat_ns = EtatFeu.ROUGE
+        self.etat_eo = EtatFeu.VERT
+        self.scenario = None
+        self.collisions = 0
+        self.violations = 0
+
+    def copy(self):
+        """Copie indépendante (image clé)"""
+        copie = ReplayState()
+        copie.__dict__.update(self.__dict__)
+        return copie
+
+    def apply(self, type_action, action, etat_feu, scenario):
+        """Applique un événement du journal"""
+        if etat_feu:
+            # 'NS:VERT' ou 'NS:ROUGE, EO:VERT'
+            for partie in etat_feu.split(','):
+                axe, _, etat = partie.strip().partition(':')
+                if axe == 'NS':
+                    self.etat_ns = EtatFeu(etat)
+                elif axe == 'EO':
+                    self.etat_eo = EtatFeu(etat)
+        if scenario:
+            self.scenario = scenario
+        if type_action == 'COLLISION':
+            self.collisions += 1
+        elif type_action == 'VIOLATION':
+            self.violations += 1
+
+
+class ReplayEngine:
+    """Moteur de relecture, indépendant de l'affichage
+
+    Le journal de l'exécution (horodaté en ts_ns) n'est jamais chargé en
+    entier : il est lu une fois par paquets de `taille_paquet` pour
+    prendre une image clé de ReplayState toutes les
+    `intervalle_image_cle` secondes, puis relu au fil de la lecture. Un
+    saut repart de l'image clé précédente et ne relit que les événements
+    qui la suivent. Les véhicules n'ont pas besoin d'images clés : le
+    fichier de trajectoires contient déjà l'état complet de chaque pas.
+
+    Les positions sont exprimées en secondes depuis le premier pas
+    enregistré. close() ferme la base.
+    """
+
+    def __init__(self, chemin_trajectoires, db_name="simulation_trafic.db", run_id=None,
+                 intervalle_image_cle=INTERVALLE_IMAGE_CLE, taille_paquet=TAILLE_PAQUET):
+        self.trajectoires = TrajectoryReader(chemin_trajectoires)
+        if self.trajectoires.nb_ticks == 0:
+            raise ValueError(f"Aucun pas enregistré dans {chemin_trajectoires}")
+        self.run_id = run_id if run_id is not None else self.trajectoires.run_id
+        self.debut_ns = int(self.trajectoires.index['ts_ns'][0])
+        self.fin_ns = int(self.trajectoires.index['ts_ns'][-1])
+        self.taille_paquet = taille_paquet
+
+        self.conn = sqlite3.connect(db_name)
+        attacher_partitions(self.conn, db_name)
+        self._construire_images_cles(round(intervalle_image_cle * 1e9))
+
+        self._curseur = None
+        self._paquet = collections.deque()
+        self.position_ns = self.debut_ns
+        self.vitesse = 1.0
+        self.en_lecture = False
+        self.seek(0.0)
+
+    def _evenements(self, apres_ns=None):
+        """Curseur sur les événements de l'exécution (postérieurs à `apres_ns`)"""
+        if apres_ns is None:
+            return self.conn.execute('''
+                SELECT ts_ns, type_action, action, etat_feu, scenario
+                FROM evenements WHERE run_id = ?
+                ORDER BY ts_ns, id
+            ''', (self.run_id,))
+        return self.conn.execute('''
+            SELECT ts_ns, type_action, action, etat_feu, scenario
+            FROM evenements WHERE run_id = ? AND ts_ns > ?
+            ORDER BY ts_ns, id
+        ''', (self.run_id, apres_ns))
+
+    def _construire_images_cles(self, intervalle_ns):
+        """Parcourt le journal une fois et photographie l'état à intervalle fixe
+
+        images_cles[k] = (ts_ns, état après tous les événements datés
+        jusqu'à ts_ns inclus). La première est au début de l'enregistrement.
+        """
+        etat = ReplayState()
+        self.images_cles = []
+        prochaine = self.debut_ns
+        curseur = self._evenements()
+        while True:
+            paquet = curseur.fetchmany(self.taille_paquet)
+            if not paquet:
+                break
+            for evenement in paquet:
+                while evenement[0] > prochaine:
+                    self.images_cles.append((prochaine, etat.copy()))
+                    prochaine += intervalle_ns
+                etat.apply(*evenement[1:])
+        self.images_cles.append((prochaine, etat.copy()))
+        self._temps_images_cles = [image[0] for image in self.images_cles]
+
+    def close(self):
+        """Ferme la base du journal"""
+        self.conn.close()
+
+    # Commandes de lecture
+
+    def play(self):
+        """Lance la lecture"""
+        self.en_lecture = True
+
+    def pause(self):
+        """Met la lecture en pause"""
+        self.en_lecture = False
+
+    def toggle(self):
+        """Bascule lecture / pause"""
+        self.en_lecture = not self.en_lecture
+
+    def set_speed(self, vitesse):
+        """Multiplicateur de vitesse (1 = temps réel de la simulation)"""
+        self.vitesse = max(vitesse, 0.0)
+
+    def seek(self, secondes):
+        """Saut instantané à `secondes` depuis le début de l'enregistrement"""
+        cible = self.debut_ns + round(secondes * 1e9)
+        cible = min(max(cible, self.debut_ns), self.fin_ns)
+        k = bisect.bisect_right(self._temps_images_cles, cible) - 1
+        temps, etat = self.images_cles[k]
+        # En avant et au-delà de l'image clé : poursuivre la lecture en cours
+        if self._curseur is None or not temps <= self.position_ns <= cible:
+            self.etat = etat.copy()
+            self._curseur = self._evenements(temps)
+            self._paquet.clear()
+        self.position_ns = cible
+        self._appliquer_jusqua(cible)
+
+    def advance(self, dt):
+        """Avance la lecture de `dt` secondes d'horloge murale"""
+        if not self.en_lecture:
+            return
+        cible = self.position_ns + round(dt * self.vitesse * 1e9)
+        if cible >= self.fin_ns:
+            cible = self.fin_ns
+            self.en_lecture = False
+        self.position_ns = cible
+        self._appliquer_jusqua(cible)
+
+    def _appliquer_jusqua(self, cible):
+        """Applique les événements horodatés jusqu'à `cible` incluse"""
+        paquet = self._paquet
+        while True:
+            if not paquet:
+                paquet.extend(self._curseur.fetchmany(self.taille_paquet))
+                if not paquet:
+                    return
+            if paquet[0][0] > cible:
+                return
+            self.etat.apply(*paquet.popleft()[1:])
+
+    # État courant
+
+    @property
+    def position(self):
+        """Position de lecture en secondes depuis le début"""
+        return (self.position_ns - self.debut_ns) / 1e9
+
+    @property
+    def duree(self):
+        """Durée enregistrée en secondes"""
+        return (self.fin_ns - self.debut_ns) / 1e9
+
+    def vehicules(self):
+        """Lignes de trajectoire (dtype recorder.LIGNE) du pas courant"""
+        return self.trajectoires.tick(self.trajectoires.tick_a(self.position_ns))
+
+    def clignotement(self):
+        """Phase du clignotement orange à la position courante"""
+        return (self.position_ns // DEMI_PERIODE_CLIGNOTEMENT_NS) % 2 == 0
+
+    def etats_feux(self):
+        """(état NS, état EO) à afficher, orange clignotant en mode nuit"""
+        if self.etat.scenario == "Mode nuit":
+            return EtatFeu.ORANGE_CLIGNOTANT, EtatFeu.ORANGE_CLIGNOTANT
+        return self.etat.etat_ns, self.etat.etat_eo
+
+
+class VehiculeRejoue:
+    """Véhicule reconstruit d'une ligne de trajectoire, affichable par VehiclesView"""
+
+    def __init__(self, id_voiture):
+        self.id = id_voiture
+        self.color = COULEURS_VEHICULES[id_voiture % len(COULEURS_VEHICULES)]
+        self.x = 0.0
+        self.y = 0.0
+        self.heading = 0
+
+    def update(self, ligne):
+        """Recopie une ligne de trajectoire"""
+        self.x = float(ligne['x'])
+        self.y = float(ligne['y'])
+        self.heading = int(CAPS[ligne['direction']])
+
+
+class ReplayViewer:
+    """Affiche une relecture dans la scène turtle habituelle"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.scene = TurtleScene()
+        self.scene.screen.title("Relecture - Simulation de Circulation Urbaine")
+        self.traffic_light_views = {
+            'EST': TrafficLightView(-70, -100, "NS"),
+            'OUEST': TrafficLightView(70, 100, "NS"),
+            'NORD': TrafficLightView(100, -70, "EO"),
+            'SUD': TrafficLightView(-100, 70, "EO"),
+        }
+        self.vehicles_view = VehiclesView()
+        self.vehicules = {}
+
+        self.status = turtle.Turtle()
+        self.status.hideturtle()
+        self.status.penup()
+        self.status.goto(0, -380)
+
+        screen = self.scene.screen
+        screen.onkey(engine.toggle, "space")
+        screen.onkey(lambda: engine.seek(engine.position - 10), "Left")
+        screen.onkey(lambda: engine.seek(engine.position + 10), "Right")
+        screen.onkey(lambda: engine.set_speed(engine.vitesse * 2), "Up")
+        screen.onkey(lambda: engine.set_speed(engine.vitesse / 2), "Down")
+        screen.listen()
+
+    def _sync_vehicules(self):
+        """Ajoute, déplace et retire les véhicules du pas courant"""
+        presents = set()
+        for ligne in self.engine.vehicules():
+            id_voiture = int(ligne['id'])
+            presents.add(id_voiture)
+            vehicule = self.vehicules.get(id_voiture)
+            if vehicule is None:
+                vehicule = self.vehicules[id_voiture] = VehiculeRejoue(id_voiture)
+                vehicule.update(ligne)
+                self.vehicles_view.on_vehicle_added(vehicule)
+            else:
+                vehicule.update(ligne)
+        for id_voiture in list(self.vehicules):
+            if id_voiture not in presents:
+                self.vehicles_view.on_vehicle_removed(self.vehicules.pop(id_voiture))
+
+    def draw(self):
+        """Dessine l'état courant de la relecture"""
+        engine = self.engine
+        self._sync_vehicules()
+        self.vehicles_view.draw()
+
+        etat_ns, etat_eo = engine.etats_feux()
+        for direction, view in self.traffic_light_views.items():
+            etat = etat_eo if direction in ['EST', 'OUEST'] else etat_ns
+            view.draw(etat, engine.clignotement())
+
+        self.status.clear()
+        self.status.write(
+            f"{'▶' if engine.en_lecture else '⏸'}  {engine.position:.1f} / {engine.duree:.1f} s"
+            f"   x{engine.vitesse:g}   {engine.etat.scenario or ''}"
+            f"   collisions : {engine.etat.collisions}",
+            align="center", font=("Arial", 11, "bold"))
+        self.scene.refresh()
+
+    def run(self, pas=0.03):
+        """Boucle d'affichage jusqu'à la fermeture de la fenêtre"""
+        precedent = time.perf_counter()
+        try:
+            while True:
+                maintenant = time.perf_counter()
+                self.engine.advance(maintenant - precedent)
+                precedent = maintenant
+                self.draw()
+                time.sleep(pas)
+        except turtle.Terminator:
+            pass
+
+
+def main():
+    """Point d'entrée en ligne de commande"""
+    parser = argparse.ArgumentParser(description="Relecture d'une exécution enregistrée")
+    parser.add_argument('--trajectoires', required=True, metavar='CHEMIN',
+                        help="enregistrement produit par headless.py --trajectoires")
+    parser.add_argument('--db', default="simulation_trafic.db")
+    parser.add_argument('--run-id', type=int,
+                        help="exécution du journal (par défaut celle de l'enregistrement)")
+    parser.add_argument('--depart', type=float, default=0.0,
+                        help="position de départ en secondes")
+    parser.add_argument('--vitesse', type=float, default=1.0)
+    parser.add_argument('--image-cle', type=float, default=INTERVALLE_IMAGE_CLE,
+                        help="intervalle entre images clés en secondes")
+    args = parser.parse_args()
+
+    engine = ReplayEngine(args.trajectoires, args.db, args.run_id, args.image_cle)
+    engine.set_speed(args.vitesse)
+    engine.seek(args.depart)
+    engine.play()
+    try:
+        ReplayViewer(engine).run()
+    finally:
+        engine.close()
+
+
+if __name__ == "__main__":
+    main()
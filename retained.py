@@ -0,0 +1,72 @@
+"""
+Module d'affichage en mode retenu
+Crée une seule fois les éléments du canevas Tk sous-jacent à turtle
+(rectangles, pastilles, textes) et ne modifie à chaque image que ceux
+dont l'état a changé, au lieu d'effacer et de tout redessiner
+"""
+
+import turtle
+
+
+# Ancrage Tk correspondant à l'alignement de turtle.write
+ANCRAGES = {"left": "sw", "center": "s", "right": "se"}
+
+
+class CanvasItem:
+    """Élément persistant du canevas et ses dernières options appliquées"""
+
+    __slots__ = ('layer', 'item', 'options')
+
+    def __init__(self, layer, item, options):
+        self.layer = layer
+        self.item = item
+        self.options = options
+
+    def set(self, **options):
+        """Applique les options qui diffèrent de l'état déjà dessiné
+
+        Retourne True si le canevas a été modifié.
+        """
+        changees = {cle: valeur for cle, valeur in options.items()
+                    if self.options.get(cle) != valeur}
+        if not changees:
+            return False
+        self.layer.canvas.itemconfigure(self.item, **changees)
+        self.options.update(changees)
+        self.layer.mises_a_jour += 1
+        return True
+
+    def delete(self):
+        """Retire l'élément du canevas"""
+        self.layer.canvas.delete(self.item)
+
+
+class RetainedLayer:
+    """Fabrique d'éléments persistants, en coordonnées turtle
+
+    Le canevas de turtle a son origine au centre et l'axe y vers le bas :
+    (x, y) turtle devient (x, -y) sur le canevas. `mises_a_jour` compte
+    les modifications réellement envoyées à Tk.
+    """
+
+    def __init__(self, screen=None):
+        self.canvas = (screen or turtle.Screen()).getcanvas()
+        self.mises_a_jour = 0
+
+    def rectangle(self, x0, y0, x1, y1, fill):
+        """Rectangle plein entre deux coins opposés"""
+        item = self.canvas.create_rectangle(x0, -y0, x1, -y1, fill=fill, outline=fill)
+        return CanvasItem(self, item, {'fill': fill, 'outline': fill})
+
+    def dot(self, x, y, diametre, fill):
+        """Pastille ronde centrée en (x, y), comme turtle.dot"""
+        rayon = diametre / 2
+        item = self.canvas.create_oval(x - rayon, -y - rayon, x + rayon, -y + rayon,
+                                       fill=fill, outline=fill)
+        return CanvasItem(self, item, {'fill': fill, 'outline': fill})
+
+    def text(self, x, y, texte="", font=("Arial", 11, "normal"), fill="black", align="left"):
+        """Texte placé comme turtle.write(texte, align=align)"""
+        item = self.canvas.create_text(x - 1, -y, text=texte, anchor=ANCRAGES[align],
+                                       fill=fill, font=font)
+        return CanvasItem(self, item, {'text': texte, 'fill': fill})
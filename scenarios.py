@@ -3,35 +3,63 @@ Module de gestion des scénarios de circulation
 Définit les différents scénarios et leurs paramètres
 """
 
+import numpy as np
+
 from traffic_light import EtatFeu
-import time
+from vehicle_store import (CODES_DIRECTION, VECTEURS,
+                           ACTION_ARRET, ACTION_AVANCER, ACTION_RALENTIR)
+
+
+# Codes numériques des états du feu, pour les décisions vectorisées
+CODES_ETAT = {etat: code for code, etat in enumerate(EtatFeu)}
+ROUGE = CODES_ETAT[EtatFeu.ROUGE]
+ORANGE = CODES_ETAT[EtatFeu.ORANGE]
 
 
 class Scenario:
-    """Classe de base abstraite pour les scénarios"""
-    
+    """Classe de base abstraite pour les scénarios
+
+    Les règles de conduite sont écrites une seule fois dans decide(), sur
+    des tableaux NumPy : le moteur l'appelle pour tous les véhicules d'un
+    coup, et apply_behavior() l'appelle pour un seul véhicule.
+    """
+
     def __init__(self, name):
         self.name = name
         self.durees_feu = {}
         self.nb_vehicules = 5
         self.taux_apparition = 4.0
         self.distance_securite = 40
-    
+
     def get_duree_feu(self, etat):
         return self.durees_feu.get(etat, 0)
-    
+
+    def decide(self, x, y, progression, etats):
+        """Retourne le code d'action de chaque véhicule
+
+        x, y : positions ; progression : coordonnée le long de la voie
+        (négative avant le carrefour, 0 au centre) ; etats : code de l'état
+        du feu que regarde chaque véhicule (voir CODES_ETAT).
+        """
+        raise NotImplementedError
+
     def apply_behavior(self, vehicle, etat_feu):
         """Applique le comportement du véhicule selon le scénario"""
-        raise NotImplementedError
-    
-    def should_spawn_vehicle(self, last_spawn_time):
-        """Détermine si un nouveau véhicule doit apparaître"""
-        return time.time() - last_spawn_time > self.taux_apparition
+        dx, dy = VECTEURS[CODES_DIRECTION[vehicle.direction]]
+        x = np.array([vehicle.x])
+        y = np.array([vehicle.y])
+        actions = self.decide(x, y, x * dx + y * dy,
+                              np.array([CODES_ETAT[etat_feu]]))
+        vehicle.apply_action(actions[0])
+
+    def should_spawn_vehicle(self, last_spawn_time, now):
+        """Détermine si un nouveau véhicule doit apparaître à l'instant `now`"""
+        return now - last_spawn_time > self.taux_apparition
 
 
 class CirculationNormale(Scenario):
     """Scénario 1: Circulation normale"""
-    
+
     def __init__(self):
         super().__init__("Circulation normale")
         self.durees_feu = {
@@ -42,102 +70,32 @@ class CirculationNormale(Scenario):
         self.nb_vehicules = 8
         self.taux_apparition = 3.5
         self.distance_securite = 40
-    
-    def apply_behavior(self, vehicle, etat_feu):
+
+    def decide(self, x, y, progression, etats):
         """Comportement en circulation normale avec respect STRICT des feux"""
         zone_carrefour = 50
         distance_avant_feu = 100
-        
-        # DÉJÀ dans le carrefour OU APRÈS le carrefour : continuer sans regarder le feu
-        if abs(vehicle.xcor()) < zone_carrefour and abs(vehicle.ycor()) < zone_carrefour:
-            vehicle.move_forward()
-            return
-        
-        # AVANT le carrefour : respecter le feu UNIQUEMENT si on approche
-        if vehicle.direction == "EST":
-            # Véhicule vient de l'OUEST (x négatif) et va vers l'EST (x positif)
-            if vehicle.xcor() < -distance_avant_feu:
-                # Très loin : circuler librement
-                vehicle.move_forward()
-            elif vehicle.xcor() < -zone_carrefour:
-                # Zone d'arrêt AVANT le carrefour : respecter le feu
-                if etat_feu == EtatFeu.ROUGE:
-                    vehicle.stop()
-                elif etat_feu == EtatFeu.ORANGE:
-                    if vehicle.xcor() < -80:
-                        vehicle.stop()
-                    else:
-                        vehicle.move_forward()
-                else:  # VERT
-                    vehicle.move_forward()
-            else:
-                # APRÈS le feu ou dans le carrefour : toujours avancer
-                vehicle.move_forward()
-        
-        elif vehicle.direction == "OUEST":
-            # Véhicule vient de l'EST (x positif) et va vers l'OUEST (x négatif)
-            if vehicle.xcor() > distance_avant_feu:
-                # Très loin : circuler librement
-                vehicle.move_forward()
-            elif vehicle.xcor() > zone_carrefour:
-                # Zone d'arrêt AVANT le carrefour : respecter le feu
-                if etat_feu == EtatFeu.ROUGE:
-                    vehicle.stop()
-                elif etat_feu == EtatFeu.ORANGE:
-                    if vehicle.xcor() > 80:
-                        vehicle.stop()
-                    else:
-                        vehicle.move_forward()
-                else:  # VERT
-                    vehicle.move_forward()
-            else:
-                # APRÈS le feu ou dans le carrefour : toujours avancer
-                vehicle.move_forward()
-        
-        elif vehicle.direction == "NORD":
-            # Véhicule vient du SUD (y négatif) et va vers le NORD (y positif)
-            if vehicle.ycor() < -distance_avant_feu:
-                # Très loin : circuler librement
-                vehicle.move_forward()
-            elif vehicle.ycor() < -zone_carrefour:
-                # Zone d'arrêt AVANT le carrefour : respecter le feu
-                if etat_feu == EtatFeu.ROUGE:
-                    vehicle.stop()
-                elif etat_feu == EtatFeu.ORANGE:
-                    if vehicle.ycor() < -80:
-                        vehicle.stop()
-                    else:
-                        vehicle.move_forward()
-                else:  # VERT
-                    vehicle.move_forward()
-            else:
-                # APRÈS le feu ou dans le carrefour : toujours avancer
-                vehicle.move_forward()
-        
-        elif vehicle.direction == "SUD":
-            # Véhicule vient du NORD (y positif) et va vers le SUD (y négatif)
-            if vehicle.ycor() > distance_avant_feu:
-                # Très loin : circuler librement
-                vehicle.move_forward()
-            elif vehicle.ycor() > zone_carrefour:
-                # Zone d'arrêt AVANT le carrefour : respecter le feu
-                if etat_feu == EtatFeu.ROUGE:
-                    vehicle.stop()
-                elif etat_feu == EtatFeu.ORANGE:
-                    if vehicle.ycor() > 80:
-                        vehicle.stop()
-                    else:
-                        vehicle.move_forward()
-                else:  # VERT
-                    vehicle.move_forward()
-            else:
-                # APRÈS le feu ou dans le carrefour : toujours avancer
-                vehicle.move_forward()
+
+        actions = np.full(len(x), ACTION_AVANCER, dtype=np.int8)
+
+        # DÉJÀ dans le carrefour : continuer sans regarder le feu
+        dans_carrefour = (np.abs(x) < zone_carrefour) & (np.abs(y) < zone_carrefour)
+
+        # Zone d'arrêt AVANT le carrefour : respecter le feu. Très loin, ou
+        # APRÈS le feu, on circule librement.
+        zone_arret = ((progression >= -distance_avant_feu) &
+                      (progression < -zone_carrefour) & ~dans_carrefour)
+
+        # ROUGE : arrêt ; ORANGE : arrêt seulement si encore loin de la ligne
+        arret = zone_arret & ((etats == ROUGE) |
+                              ((etats == ORANGE) & (progression < -80)))
+        actions[arret] = ACTION_ARRET
+        return actions
 
 
 class HeureDePointe(Scenario):
     """Scénario 2: Heure de pointe"""
-    
+
     def __init__(self):
         super().__init__("Heure de pointe")
         self.durees_feu = {
@@ -148,60 +106,35 @@ class HeureDePointe(Scenario):
         self.nb_vehicules = 10
         self.taux_apparition = 2.0
         self.distance_securite = 30
-    
-    def apply_behavior(self, vehicle, etat_feu):
+
+    def decide(self, x, y, progression, etats):
         """Comportement en heure de pointe - démarrage plus rapide"""
         zone_arret = 70
         zone_carrefour = 60
-        
+
+        actions = np.full(len(x), ACTION_AVANCER, dtype=np.int8)
+
         # Dans le carrefour, continuer
-        if abs(vehicle.xcor()) < zone_carrefour and abs(vehicle.ycor()) < zone_carrefour:
-            vehicle.move_forward()
-            return
-        
-        # Est-Ouest
-        if vehicle.direction == "EST":
-            if vehicle.xcor() < -zone_arret and etat_feu == EtatFeu.ROUGE:
-                vehicle.stop()
-            elif vehicle.xcor() < -zone_carrefour and etat_feu == EtatFeu.ORANGE:
-                vehicle.slow_down()
-            else:
-                vehicle.move_forward()
-        elif vehicle.direction == "OUEST":
-            if vehicle.xcor() > zone_arret and etat_feu == EtatFeu.ROUGE:
-                vehicle.stop()
-            elif vehicle.xcor() > zone_carrefour and etat_feu == EtatFeu.ORANGE:
-                vehicle.slow_down()
-            else:
-                vehicle.move_forward()
-        
-        # Nord-Sud
-        elif vehicle.direction == "NORD":
-            if vehicle.ycor() < -zone_arret and etat_feu == EtatFeu.ROUGE:
-                vehicle.stop()
-            elif vehicle.ycor() < -zone_carrefour and etat_feu == EtatFeu.ORANGE:
-                vehicle.slow_down()
-            else:
-                vehicle.move_forward()
-        elif vehicle.direction == "SUD":
-            if vehicle.ycor() > zone_arret and etat_feu == EtatFeu.ROUGE:
-                vehicle.stop()
-            elif vehicle.ycor() > zone_carrefour and etat_feu == EtatFeu.ORANGE:
-                vehicle.slow_down()
-            else:
-                vehicle.move_forward()
+        hors_carrefour = ~((np.abs(x) < zone_carrefour) & (np.abs(y) < zone_carrefour))
+
+        arret = hors_carrefour & (progression < -zone_arret) & (etats == ROUGE)
+        ralenti = (hors_carrefour & ~arret & (progression < -zone_carrefour) &
+                   (etats == ORANGE))
+        actions[arret] = ACTION_ARRET
+        actions[ralenti] = ACTION_RALENTIR
+        return actions
 
 
 class ModeNuit(Scenario):
     """Scénario 3: Faible circulation (mode nuit)"""
-    
+
     def __init__(self):
         super().__init__("Mode nuit")
         self.durees_feu = {}
         self.nb_vehicules = 5
         self.taux_apparition = 6.0
         self.distance_securite = 60
-    
-    def apply_behavior(self, vehicle, etat_feu):
+
+    def decide(self, x, y, progression, etats):
         """Comportement en mode nuit - vitesse réduite"""
-        vehicle.slow_down()
+        return np.full(len(x), ACTION_RALENTIR, dtype=np.int8)
@@ -0,0 +1,250 @@
+"""
+Module du moteur de simulation
+Fait évoluer feux, véhicules et collisions sans aucune dépendance graphique
+"""
+
+import random
+
+import numpy as np
+
+from instrumentation import TickProfiler
+from logger import Logger
+from scenarios import CODES_ETAT
+from traffic_light import EtatFeu
+from vehicle_store import (VehicleStore, DIRECTIONS, CODES_DIRECTION,
+                           ACTION_ARRET, ACTION_RALENTIR)
+from vehicles import Vehicle
+
+
+class Simulation:
+    """Classe principale gérant la simulation complète
+
+    Les vues graphiques sont des observateurs optionnels : elles sont
+    prévenues de l'ajout et du retrait des véhicules via
+    on_vehicle_added / on_vehicle_removed.
+
+    Le temps provient de `clock` (par défaut celle du feu) : chaque appel
+    à update() fait avancer l'horloge d'un pas.
+
+    L'état des véhicules vit dans un VehicleStore (colonnes NumPy) ; un
+    pas de simulation décide, déplace et fait réapparaître tous les
+    véhicules en quelques opérations vectorisées.
+
+    Un `recorder` optionnel (voir recorder.TrajectoryRecorder) reçoit
+    l'état de tous les véhicules à la fin de chaque pas.
+
+    Chaque phase d'un pas est chronométrée par `profiler`
+    (instrumentation.TickProfiler), partagé avec la boucle d'affichage.
+
+    `exit_handler(simulation, vehicules)`, s'il est défini, reçoit les
+    véhicules sortis de la scène pendant le pas (déjà replacés à leur
+    départ) au lieu de les laisser réapparaître (voir network).
+
+    `aleatoire` (random.Random) tire la direction des véhicules qui
+    apparaissent ; par défaut, le module random. `ids_vehicules`, un
+    itérateur, numérote les véhicules créés ici (compteur de Vehicle par
+    défaut).
+    """
+
+    def __init__(self, traffic_light, scenario, db_manager, alert_view=None, clock=None,
+                 recorder=None, profiler=None, aleatoire=None, ids_vehicules=None):
+        self.traffic_light = traffic_light
+        self.scenario = scenario
+        self.db_manager = db_manager
+        self.clock = clock or traffic_light.clock
+        self.logger = Logger(db_manager, alert_view)
+        self.recorder = recorder
+        self.profiler = profiler or TickProfiler()
+        self.exit_handler = None
+        self.aleatoire = aleatoire or random
+        self.ids_vehicules = ids_vehicules
+
+        self.store = VehicleStore()
+        self.observers = []
+        self.running = False
+        self.paused = False
+        self.last_spawn_time = self.clock.now()
+        self.collisions = 0
+
+        # Journalisation
+        self.db_manager.log_event('SYSTEME', 'Simulation initialisée',
+                                  scenario=self.scenario.name)
+
+    @property
+    def vehicles(self):
+        """Véhicules actifs (dans l'ordre des lignes du magasin)"""
+        return self.store.handles
+
+    def add_observer(self, observer):
+        """Abonne une vue aux ajouts et retraits de véhicules"""
+        self.observers.append(observer)
+        for v in self.vehicles:
+            observer.on_vehicle_added(v)
+
+    def add_vehicle(self, direction=None, id_voiture=None, action='Création véhicule'):
+        """Crée un véhicule du scénario courant et prévient les observateurs
+
+        `id_voiture` et `action` : voir Vehicle.
+        """
+        if direction is None:
+            direction = self.aleatoire.choice(DIRECTIONS)
+        if id_voiture is None and self.ids_vehicules is not None:
+            id_voiture = next(self.ids_vehicules)
+        vehicle = Vehicle(direction, self.db_manager, self.store, id_voiture, action)
+        vehicle.distance_securite = self.scenario.distance_securite
+        for observer in self.observers:
+            observer.on_vehicle_added(vehicle)
+        return vehicle
+
+    def _remove_vehicle(self, vehicle):
+        """Retire un véhicule et prévient les observateurs"""
+        vehicle.detach()
+        for observer in self.observers:
+            observer.on_vehicle_removed(vehicle)
+
+    def start(self):
+        """Démarre la simulation"""
+        if not self.running:
+            self.running = True
+            self.paused = False
+            self.db_manager.log_event('SYSTEME', 'Démarrage simulation')
+
+    def pause(self):
+        """Met en pause ou reprend la simulation"""
+        if not self.running:
+            self.start()
+        elif self.paused:
+            self.paused = False
+            self.db_manager.log_event('SYSTEME', 'Reprise simulation')
+        else:
+            self.paused = True
+            self.db_manager.log_event('SYSTEME', 'Pause simulation')
+
+    def stop(self):
+        """Arrête la simulation"""
+        if self.running:
+            self.running = False
+            self.paused = False
+            self.db_manager.log_event('SYSTEME', 'Arrêt simulation')
+
+    def reset(self):
+        """Réinitialise la simulation"""
+        for v in list(self.vehicles):
+            self._remove_vehicle(v)
+
+        self.traffic_light.etat_ns = EtatFeu.ROUGE
+        self.traffic_light.etat_eo = EtatFeu.VERT
+        self.traffic_light.phase = "EO"
+        self.traffic_light.mode_manuel = False
+
+        self.collisions = 0
+        self.logger.collision_count = 0
+        self.logger.violation_count = 0
+
+        self.running = False
+        self.paused = False
+
+        self.db_manager.log_event('SYSTEME', 'Réinitialisation simulation')
+        self.db_manager.start_run(self.scenario.name)
+
+    def change_scenario(self, new_scenario):
+        """Change le scénario de simulation"""
+        old_scenario = self.scenario.name
+        self.scenario = new_scenario
+        self.traffic_light.last_change = self.clock.now()
+        self.traffic_light.set_auto_mode()
+
+        # Ajuster le nombre de véhicules
+        self._adjust_vehicle_count()
+
+        self.db_manager.log_event('SYSTEME', 'Changement de scénario',
+                                  scenario=new_scenario.name)
+
+    def _adjust_vehicle_count(self):
+        """Ajuste le nombre de véhicules selon le scénario"""
+        target = self.scenario.nb_vehicules
+
+        while len(self.vehicles) < target:
+            self.add_vehicle()
+
+        while len(self.vehicles) > target:
+            self._remove_vehicle(self.vehicles[-1])
+
+    def update(self):
+        """Met à jour l'état de la simulation"""
+        if not self.running or self.paused:
+            return
+
+        self.clock.tick()
+        now = self.clock.now()
+        profiler = self.profiler
+
+        # Apparition de nouveaux véhicules
+        with profiler.phase('spawn'):
+            if self.scenario.should_spawn_vehicle(self.last_spawn_time, now):
+                if len(self.vehicles) < self.scenario.nb_vehicules:
+                    self.add_vehicle()
+                    self.last_spawn_time = now
+
+        # Mise à jour du feu
+        with profiler.phase('traffic_light.update'):
+            self.traffic_light.update(self.scenario.durees_feu, self.scenario.name)
+
+        # Vérification des collisions
+        with profiler.phase('check_collisions'):
+            self.logger.check_collisions(self.store)
+            self.collisions = self.logger.collision_count
+
+        # Mise à jour des véhicules (vectorisée sur tout le magasin)
+        with profiler.phase('vehicules'):
+            if self.store.n > 0:
+                self._update_vehicles()
+
+        if self.recorder is not None:
+            with profiler.phase('recorder'):
+                self.recorder.record(self.clock.now_ns(), self.store)
+
+    def _update_vehicles(self):
+        """Décide, déplace et fait réapparaître tous les véhicules"""
+        store = self.store
+        n = store.n
+
+        # D'ABORD : vérifier s'il y a un véhicule devant (PRIORITÉ 1)
+        progression = store.progression()
+        leader, _ = store.leaders(progression)
+        devant = leader >= 0
+        actions = np.empty(n, dtype=np.int8)
+
+        # Il y a quelqu'un devant : s'arrêter ou ralentir
+        meneurs = leader[devant]
+        bloque = store.is_stopped[meneurs] | (store.speed[meneurs] < 0.5)
+        actions[devant] = np.where(bloque, ACTION_ARRET, ACTION_RALENTIR)
+
+        # Pas de véhicule devant : regarder LE BON FEU (celui à droite)
+        # EST/OUEST regardent les feux EO, NORD/SUD regardent les feux NS
+        libres = ~devant
+        axe_eo = store.direction[:n] < CODES_DIRECTION["NORD"]
+        etats = np.where(axe_eo,
+                         CODES_ETAT[self.traffic_light.etat_eo],
+                         CODES_ETAT[self.traffic_light.etat_ns])
+        actions[libres] = self.scenario.decide(
+            store.x[:n][libres], store.y[:n][libres],
+            progression[libres], etats[libres])
+
+        arretes, redemarres = store.apply_actions(actions)
+
+        # Journalisation des transitions (peu nombreuses à chaque pas)
+        handles = store.handles
+        for i in arretes:
+            handles[i].log_stop()
+        for i in redemarres:
+            handles[i].log_restart()
+
+        # Déplacer ; les véhicules sortis réapparaissent à leur départ,
+        # sauf si un gestionnaire de sortie (réseau) les prend en charge
+        sortis = [handles[i] for i in store.move()]
+        if self.exit_handler is not None:
+            self.exit_handler(self, sortis)
+        else:
+            for vehicle in sortis:
+                vehicle.log_respawn()
@@ -0,0 +1,79 @@
+"""
+Module de hachage spatial
+Découpe la scène en grille uniforme pour ne tester les collisions qu'entre
+véhicules voisins (phase large), et suit l'occupation du carrefour central
+"""
+
+import numpy as np
+
+
+# Taille d'une cellule de la grille (pixels) : au moins le seuil de collision
+TAILLE_CELLULE = 20
+
+# Demi-largeur de la boîte centrale du carrefour
+DEMI_CARREFOUR = 70
+
+# Cellules voisines examinées depuis chaque cellule. La moitié du voisinage
+# suffit : la paire (A, B) est trouvée depuis A, jamais une seconde fois
+# depuis B.
+VOISINES = ((1, -1), (1, 0), (1, 1), (0, 1))
+
+
+class SpatialHash:
+    """Grille uniforme de la scène, reconstruite à chaque pas
+
+    cellules[(cx, cy)] donne les indices des véhicules de la cellule ;
+    occupation_carrefour est l'ensemble des indices présents dans la boîte
+    centrale |x| < 70 et |y| < 70.
+    """
+
+    def __init__(self, taille_cellule=TAILLE_CELLULE):
+        self.taille_cellule = taille_cellule
+        self.cellules = {}
+        self.dans_carrefour = np.zeros(0, dtype=bool)
+        self.occupation_carrefour = set()
+
+    def construire(self, x, y):
+        """Range chaque véhicule dans sa cellule, en O(n)"""
+        cx = np.floor(x / self.taille_cellule).astype(np.int64).tolist()
+        cy = np.floor(y / self.taille_cellule).astype(np.int64).tolist()
+        cellules = {}
+        for i, cle in enumerate(zip(cx, cy)):
+            cellule = cellules.get(cle)
+            if cellule is None:
+                cellules[cle] = [i]
+            else:
+                cellule.append(i)
+        self.cellules = cellules
+
+        self.dans_carrefour = ((np.abs(x) < DEMI_CARREFOUR) &
+                               (np.abs(y) < DEMI_CARREFOUR))
+        self.occupation_carrefour = set(np.flatnonzero(self.dans_carrefour).tolist())
+
+    def paires_candidates(self):
+        """Paires (i, j) de véhicules dans la même cellule ou des cellules voisines
+
+        Retourne deux tableaux d'indices, avec i < j pour chaque paire.
+        """
+        premiers = []
+        seconds = []
+        cellules = self.cellules
+        for (cx, cy), cellule in cellules.items():
+            # Paires internes à la cellule
+            for k, a in enumerate(cellule):
+                for b in cellule[k + 1:]:
+                    premiers.append(a)
+                    seconds.append(b)
+            # Paires avec les cellules voisines
+            for dx, dy in VOISINES:
+                voisine = cellules.get((cx + dx, cy + dy))
+                if voisine is None:
+                    continue
+                for a in cellule:
+                    for b in voisine:
+                        premiers.append(a)
+                        seconds.append(b)
+
+        i = np.array(premiers, dtype=np.int64)
+        j = np.array(seconds, dtype=np.int64)
+        return np.minimum(i, j), np.maximum(i, j)
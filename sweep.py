@@ -0,0 +1,215 @@
+"""
+Module de balayage de paramètres (Monte-Carlo)
+Lance de nombreuses simulations sans affichage sur tous les cœurs et
+agrège collisions, arrêts, attente moyenne et débit par configuration
+
+UTILISATION:
+    python sweep.py --scenario pointe --vert 4 6 8 --nb-vehicules 8 12 16 \\
+        --graines 5 --duree 300 --sortie balayage.csv
+"""
+
+import argparse
+import csv
+import itertools
+import math
+import os
+import random
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from clock import SimulatedClock
+from headless import SCENARIOS, build_simulation
+from traffic_light import EtatFeu
+
+
+# Paramètres de scénario qu'un balayage peut faire varier
+# (la distance de sécurité des scénarios n'influe pas sur la détection du
+# véhicule devant, fixée par DISTANCE_DETECTION : elle n'est pas balayée)
+PARAMETRES = ('durees_feu', 'nb_vehicules', 'taux_apparition')
+
+# Mesures agrégées par configuration
+MESURES = ('collisions', 'arrets', 'attente_moyenne', 'debit')
+
+
+class SweepStats:
+    """Remplace le DatabaseManager pendant un balayage : compte au lieu d'écrire
+
+    Offre la même interface que DatabaseManager (log_event, log_many,
+    start_run, close). L'attente d'un véhicule va de son dernier « Arrêt au feu
+    rouge » au « Redémarrage au feu vert » suivant ; le débit compte les
+    véhicules sortis de la scène.
+    """
+
+    run_id = None
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.arrets = 0
+        self.sorties = 0
+        self.attentes = 0
+        self.attente_totale = 0.0
+        self._arretes_depuis = {}
+
+    def log_event(self, type_action, action, **kwargs):
+        """Met à jour les compteurs à partir d'un événement"""
+        if type_action != 'VOITURE':
+            return
+        if action == 'Arrêt au feu rouge':
+            self.arrets += 1
+            self._arretes_depuis[kwargs.get('id_voiture')] = self.clock.now()
+        elif action == 'Redémarrage au feu vert':
+            debut = self._arretes_depuis.pop(kwargs.get('id_voiture'), None)
+            if debut is not None:
+                self.attentes += 1
+                self.attente_totale += self.clock.now() - debut
+        elif action == 'Réapparition véhicule':
+            self.sorties += 1
+
+    def log_many(self, type_action, action, **colonnes):
+        """Comme log_event, pour chaque ligne de `colonnes`"""
+        if type_action != 'VOITURE':
+            return
+        noms = list(colonnes)
+        for valeurs in zip(*colonnes.values()):
+            self.log_event(type_action, action, **dict(zip(noms, valeurs)))
+
+    def start_run(self, description=None):
+        """Rien à ouvrir : les compteurs suffisent"""
+
+    def close(self):
+        """Rien à vider"""
+
+
+def configurations(grille):
+    """Produit cartésien d'une grille {paramètre: [valeurs]}"""
+    inconnus = set(grille) - set(PARAMETRES)
+    if inconnus:
+        raise ValueError(f"Paramètres inconnus : {sorted(inconnus)}")
+    noms = list(grille)
+    for valeurs in itertools.product(*(grille[nom] for nom in noms)):
+        yield dict(zip(noms, valeurs))
+
+
+def run_configuration(tache):
+    """Exécute une simulation (dans un processus du pool)
+
+    tache = (clé du scénario, paramètres, graine, durée, pas). La graine
+    fixe les directions des véhicules initiaux et de ceux qui apparaissent.
+    """
+    nom_scenario, parametres, graine, duree, pas = tache
+    random.seed(graine)
+
+    scenario = SCENARIOS[nom_scenario]()
+    for nom, valeur in parametres.items():
+        if nom == 'durees_feu':
+            valeur = {**scenario.durees_feu, **valeur}
+        setattr(scenario, nom, valeur)
+
+    clock = SimulatedClock(pas, depart=0)
+    stats = SweepStats(clock)
+    simulation = build_simulation(scenario, stats, clock, directions_aleatoires=True)
+    simulation.start()
+    for _ in range(math.ceil(duree / pas)):
+        simulation.update()
+
+    return {
+        'collisions': simulation.collisions,
+        'arrets': stats.arrets,
+        'attente_moyenne': stats.attente_totale / stats.attentes if stats.attentes else 0.0,
+        'debit': stats.sorties * 60 / duree,
+    }
+
+
+def sweep(nom_scenario, grille, graines, duree=300.0, pas=0.03, processus=None):
+    """Lance toutes les configurations x graines sur un pool de processus
+
+    Retourne une ligne par configuration : ses paramètres, puis la moyenne
+    et l'écart-type de chaque mesure sur les graines.
+    """
+    combinaisons = list(configurations(grille))
+    taches = [(nom_scenario, parametres, graine, duree, pas)
+              for parametres in combinaisons for graine in graines]
+    processus = processus or os.cpu_count()
+    paquet = max(1, len(taches) // (processus * 4))
+    with ProcessPoolExecutor(max_workers=processus) as pool:
+        mesures = list(pool.map(run_configuration, taches, chunksize=paquet))
+
+    lignes = []
+    for k, parametres in enumerate(combinaisons):
+        essais = mesures[k * len(graines):(k + 1) * len(graines)]
+        ligne = {'scenario': nom_scenario, **_formater(parametres), 'graines': len(graines)}
+        for mesure in MESURES:
+            valeurs = [essai[mesure] for essai in essais]
+            ligne[f'{mesure}_moyenne'] = statistics.fmean(valeurs)
+            ligne[f'{mesure}_ecart_type'] = statistics.pstdev(valeurs)
+        lignes.append(ligne)
+    return lignes
+
+
+def _formater(parametres):
+    """Paramètres à plat pour la table de résultats (durees_feu éclaté par état)"""
+    plats = {}
+    for nom, valeur in parametres.items():
+        if nom == 'durees_feu':
+            for etat, duree in valeur.items():
+                plats[f'duree_{etat.value.lower()}'] = duree
+        else:
+            plats[nom] = valeur
+    return plats
+
+
+def ecrire_csv(lignes, chemin):
+    """Écrit la table de résultats"""
+    with open(chemin, "w", newline="", encoding="utf-8") as fichier:
+        writer = csv.DictWriter(fichier, fieldnames=list(lignes[0]))
+        writer.writeheader()
+        writer.writerows(lignes)
+
+
+def main():
+    """Point d'entrée en ligne de commande"""
+    parser = argparse.ArgumentParser(description="Balayage de paramètres de scénario")
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='normale')
+    parser.add_argument('--vert', type=float, nargs='+', help="durées du feu vert (s)")
+    parser.add_argument('--orange', type=float, nargs='+', help="durées du feu orange (s)")
+    parser.add_argument('--nb-vehicules', type=int, nargs='+')
+    parser.add_argument('--taux-apparition', type=float, nargs='+')
+    parser.add_argument('--graines', type=int, default=3,
+                        help="nombre de graines aléatoires par configuration")
+    parser.add_argument('--duree', type=float, default=300.0,
+                        help="durée simulée de chaque exécution en secondes")
+    parser.add_argument('--pas', type=float, default=0.03)
+    parser.add_argument('--processus', type=int, help="taille du pool (tous les cœurs par défaut)")
+    parser.add_argument('--sortie', default="balayage.csv")
+    args = parser.parse_args()
+
+    grille = {}
+    if args.vert or args.orange:
+        grille['durees_feu'] = [
+            {EtatFeu.VERT: vert, EtatFeu.ORANGE: orange}
+            for vert in (args.vert or [SCENARIOS[args.scenario]().durees_feu[EtatFeu.VERT]])
+            for orange in (args.orange or [SCENARIOS[args.scenario]().durees_feu[EtatFeu.ORANGE]])
+        ]
+    for nom in ('nb_vehicules', 'taux_apparition'):
+        if getattr(args, nom):
+            grille[nom] = getattr(args, nom)
+
+    debut = time.perf_counter()
+    lignes = sweep(args.scenario, grille, list(range(args.graines)),
+                   args.duree, args.pas, args.processus)
+    ecrire_csv(lignes, args.sortie)
+
+    print(f"{len(lignes)} configurations x {args.graines} graines "
+          f"en {time.perf_counter() - debut:.1f} s -> {args.sortie}")
+    for ligne in sorted(lignes, key=lambda l: l['collisions_moyenne'])[:10]:
+        parametres = ", ".join(f"{cle}={valeur}" for cle, valeur in ligne.items()
+                               if cle not in ('scenario', 'graines') and
+                               not cle.endswith(('_moyenne', '_ecart_type')))
+        print(f"  {parametres or 'défaut'} : {ligne['collisions_moyenne']:.1f} collisions, "
+              f"attente {ligne['attente_moyenne_moyenne']:.1f} s, "
+              f"débit {ligne['debit_moyenne']:.1f} véh/min")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Tests de la détection des collisions (grille spatiale et phase fine)
+"""
+
+import random
+
+import numpy as np
+
+from clock import SimulatedClock
+from database import DatabaseManager
+from log_sinks import MemorySink
+from logger import Logger
+from spatial_hash import SpatialHash, DEMI_CARREFOUR
+from sweep import SweepStats
+from vehicle_store import VehicleStore, DIRECTIONS
+from vehicles import Vehicle
+
+# Seuil par défaut de Logger.check_collisions
+SEUIL = 18
+
+
+def _paires_attendues(x, y, directions):
+    """Double boucle de référence sur toutes les paires"""
+    paires = set()
+    for i in range(len(x)):
+        for j in range(i + 1, len(x)):
+            proches = np.hypot(x[i] - x[j], y[i] - y[j]) < SEUIL
+            carrefour = all(abs(v) < DEMI_CARREFOUR for v in (x[i], y[i], x[j], y[j]))
+            if proches and (directions[i] == directions[j] or carrefour):
+                paires.add((i, j))
+    return paires
+
+
+def _flotte(nombre, graine):
+    """Véhicules semés au hasard autour du carrefour"""
+    aleatoire = random.Random(graine)
+    store = VehicleStore()
+    for _ in range(nombre):
+        vehicule = Vehicle(aleatoire.choice(DIRECTIONS), store=store)
+        vehicule.x = aleatoire.uniform(-150, 150)
+        vehicule.y = aleatoire.uniform(-150, 150)
+    return store
+
+
+def test_grille_propose_toutes_les_paires_proches():
+    aleatoire = np.random.default_rng(0)
+    x = aleatoire.uniform(-200, 200, 500)
+    y = aleatoire.uniform(-200, 200, 500)
+    grille = SpatialHash()
+    grille.construire(x, y)
+    i, j = grille.paires_candidates()
+    candidates = set(zip(i.tolist(), j.tolist()))
+    assert len(candidates) == len(i)
+    proches = {(a, b) for a in range(500) for b in range(a + 1, 500)
+               if np.hypot(x[a] - x[b], y[a] - y[b]) < SEUIL}
+    assert proches <= candidates
+
+
+def test_une_collision_par_paire_en_un_seul_lot():
+    store = _flotte(400, graine=1)
+    n = store.n
+    attendues = _paires_attendues(store.x[:n], store.y[:n], store.direction[:n])
+    impliques = {ligne for paire in attendues for ligne in paire}
+
+    clock = SimulatedClock(0.03, depart=0)
+    memoire = MemorySink()
+    db_manager = DatabaseManager(None, clock, sinks=[memoire])
+    for vehicule in store.handles:
+        vehicule.db_manager = db_manager
+    logger = Logger(db_manager)
+    logger.check_collisions(store)
+    db_manager.close()
+
+    assert attendues
+    assert logger.collision_count == len(attendues)
+    collisions = memoire.evenements('COLLISION')
+    assert len(collisions) == len(attendues)
+    assert len({event['ts_ns'] for event in collisions}) == 1
+    assert {event['id_voiture'] for event in collisions} == \
+        {int(store.ids[i]) for i, _ in attendues}
+    assert len(memoire.evenements('VOITURE')) == len(impliques)
+    assert all(store.is_stopped[ligne] for ligne in impliques)
+
+
+def test_liste_et_magasin_donnent_les_memes_collisions():
+    store = _flotte(200, graine=2)
+    stats = SweepStats(SimulatedClock(0.03, depart=0))
+    par_magasin = Logger(stats)
+    par_liste = Logger(stats)
+    par_magasin.check_collisions(store)
+    par_liste.check_collisions(list(store.handles))
+    assert par_magasin.collision_count == par_liste.collision_count > 0
@@ -0,0 +1,173 @@
+"""
+Tests du schéma : résumés et cumuls tenus à jour par lots
+"""
+
+import sqlite3
+import time
+
+import pytest
+
+from analytics import resume_run, par_direction
+from clock import RealTimeClock, SimulatedClock
+from database import DatabaseManager
+from db_schema import init_schema, ROLLUPS
+
+S = 1_000_000_000
+
+# (secondes, type_action, action, colonnes)
+SCENARIO = [
+    (0, 'FEU', 'Initialisation', {'etat_feu': 'NS:VERT, EO:ROUGE'}),
+    (1, 'VOITURE', 'Arrêt au feu rouge', {'id_voiture': 1, 'direction': 'EST'}),
+    (2, 'VOITURE', 'Arrêt au feu rouge', {'id_voiture': 2, 'direction': 'NORD'}),
+    (3, 'VOITURE', 'Redémarrage au feu vert', {'id_voiture': 1, 'direction': 'EST'}),
+    # Jamais arrêté : pas d'attente
+    (4, 'VOITURE', 'Redémarrage au feu vert', {'id_voiture': 3, 'direction': 'SUD'}),
+    # Nouvel arrêt du même véhicule : l'attente repart de là
+    (5, 'VOITURE', 'Arrêt au feu rouge', {'id_voiture': 2, 'direction': 'NORD'}),
+    (10, 'FEU', 'NS passe à ORANGE', {'etat_feu': 'NS:ORANGE'}),
+    (12, 'FEU', 'Changement manuel', {'etat_feu': 'NS:ROUGE, EO:VERT'}),
+    (13, 'VOITURE', 'Redémarrage au feu vert', {'id_voiture': 2, 'direction': 'NORD'}),
+    (20, 'FEU', 'EO passe à ORANGE', {'etat_feu': 'EO:ORANGE'}),
+    (21, 'VOITURE', 'Arrêt au feu rouge', {'id_voiture': 4, 'direction': 'EST'}),
+]
+
+
+def _journaliser(db, evenements, batch_size=500):
+    """Écrit les événements, chacun à son instant ; retourne le run_id"""
+    clock = SimulatedClock(1.0, depart=0)
+    db_manager = DatabaseManager(db, clock, batch_size=batch_size, flush_interval=0.01,
+                                 run_description="test")
+    for secondes, type_action, action, colonnes in evenements:
+        while clock.now() < secondes:
+            clock.tick()
+        db_manager.log_event(type_action, action, **colonnes)
+    db_manager.close()
+    return db_manager.run_id
+
+
+@pytest.mark.parametrize("batch_size", [1, 3, 500])
+def test_attentes_et_phases(tmp_path, batch_size):
+    """Appariement arrêt/redémarrage et durées de phases, d'un lot à l'autre"""
+    db = str(tmp_path / "resumes.db")
+    run_id = _journaliser(db, SCENARIO, batch_size)
+
+    conn = sqlite3.connect(db)
+    resume = resume_run(conn, run_id)
+    assert (resume['evenements'], resume['arrets'], resume['attentes']) == (11, 4, 2)
+    assert resume['attente_moyenne'] == pytest.approx(5.0)
+    directions = {ligne['direction']: ligne for ligne in par_direction(conn, run_id)}
+    assert directions['EST']['attentes'] == 1
+    assert directions['EST']['attente_moyenne'] == pytest.approx(2.0)
+    assert directions['NORD']['attente_moyenne'] == pytest.approx(8.0)
+    assert directions['SUD']['attentes'] == 0
+    assert conn.execute("SELECT id_voiture, debut_ns FROM attentes_en_cours").fetchall() \
+        == [(4, 21 * S)]
+
+    phases = {(axe, etat): (nombre, duree_ns) for axe, etat, nombre, duree_ns
+              in conn.execute("SELECT axe, etat, nombre, duree_ns FROM stats_phases")}
+    assert phases == {('NS', 'VERT'): (1, 10 * S), ('NS', 'ORANGE'): (1, 2 * S),
+                      ('EO', 'ROUGE'): (1, 12 * S), ('EO', 'VERT'): (1, 8 * S)}
+    assert sorted(conn.execute("SELECT axe, etat, depuis_ns FROM feux_en_cours")) \
+        == [('EO', 'ORANGE', 20 * S), ('NS', 'ROUGE', 12 * S)]
+    conn.close()
+
+
+def test_cumuls_par_minute_et_par_heure(tmp_path):
+    """Tranches alignées sur l'heure murale, quel que soit le découpage en lots"""
+    db = str(tmp_path / "cumuls.db")
+    evenements = []
+    for secondes in range(3590, 3730, 10):
+        evenements.append((secondes, 'VOITURE', 'Création véhicule', {'id_voiture': secondes}))
+        evenements.append((secondes, 'COLLISION', 'Collision', {'id_voiture': secondes}))
+    evenements.append((3725, 'FEU', 'NS passe à ORANGE', {'etat_feu': 'NS:ORANGE'}))
+    evenements.append((3725, 'VOITURE', 'Arrêt au feu rouge', {'id_voiture': 1}))
+    run_id = _journaliser(db, evenements, batch_size=3)
+
+    conn = sqlite3.connect(db)
+    minutes = conn.execute('''
+        SELECT debut_ns, apparitions, arrets, collisions, violations, changements_feu
+        FROM rollups_minute WHERE run_id = ? ORDER BY debut_ns
+    ''', (run_id,)).fetchall()
+    assert minutes == [(3540 * S, 1, 0, 1, 0, 0), (3600 * S, 6, 0, 6, 0, 0),
+                       (3660 * S, 6, 0, 6, 0, 0), (3720 * S, 1, 1, 1, 0, 1)]
+    heures = conn.execute("SELECT debut_ns, apparitions, arrets, changements_feu "
+                          "FROM rollups_heure ORDER BY debut_ns").fetchall()
+    assert heures == [(0, 1, 0, 0), (3600 * S, 13, 1, 1)]
+    conn.close()
+
+
+def test_cumuls_en_temps_reel_sur_l_heure_murale(tmp_path):
+    """Avec RealTimeClock, ts_ns suit l'horloge monotone : les tranches
+    restent alignées sur l'heure murale"""
+    db = str(tmp_path / "temps_reel.db")
+    db_manager = DatabaseManager(db, RealTimeClock(), run_description="temps réel")
+    avant = time.time()
+    for id_voiture in range(5):
+        db_manager.log_event('COLLISION', 'Collision', id_voiture=id_voiture)
+    db_manager.close()
+
+    conn = sqlite3.connect(db)
+    for table, duree in ROLLUPS.items():
+        tranches = conn.execute(f'''
+            SELECT r.debut_epoch + (g.debut_ns - r.debut_ns) / 1e9, g.collisions
+            FROM {table} g JOIN runs r ON r.run_id = g.run_id
+        ''').fetchall()
+        assert sum(collisions for _, collisions in tranches) == 5
+        for debut, _ in tranches:
+            assert debut == pytest.approx(round(debut / duree) * duree, abs=1e-3)
+            assert avant - duree - 1 < debut <= time.time()
+    conn.close()
+
+
+def test_migration_de_l_ancienne_table_texte(tmp_path):
+    """Une base d'avant le journal encodé (table texte evenements, sans
+    run_id) donne les mêmes résumés qu'une base écrite directement"""
+    ancienne = str(tmp_path / "ancienne.db")
+    conn = sqlite3.connect(ancienne)
+    conn.execute('''
+        CREATE TABLE evenements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            type_action TEXT NOT NULL,
+            action TEXT NOT NULL,
+            etat_feu TEXT,
+            scenario TEXT,
+            id_voiture INTEGER,
+            position_x REAL,
+            position_y REAL,
+            vitesse REAL
+        )
+    ''')
+    conn.executemany('''
+        INSERT INTO evenements (timestamp, type_action, action, etat_feu, id_voiture)
+        VALUES (?, ?, ?, ?, ?)
+    ''', [(f"2024-01-01 10:00:{secondes:02d}", type_action, action,
+           colonnes.get('etat_feu'), colonnes.get('id_voiture'))
+          for secondes, type_action, action, colonnes in SCENARIO])
+    conn.commit()
+    assert init_schema(conn.cursor())
+    assert not init_schema(conn.cursor())
+
+    (run_id, description), = conn.execute("SELECT run_id, description FROM runs")
+    assert description == 'Historique importé'
+    assert conn.execute("SELECT ts_ns FROM journal_evenements ORDER BY id").fetchall() \
+        == [(secondes * S,) for secondes, _, _, _ in SCENARIO]
+    assert conn.execute("SELECT COUNT(*) FROM changements_feu_tricolore").fetchone()[0] == 4
+    assert conn.execute("SELECT SUM(changements_feu) FROM rollups_heure").fetchone()[0] == 4
+
+    # Même scénario sans directions (l'ancienne table n'en avait pas)
+    nouvelle = str(tmp_path / "nouvelle.db")
+    sans_direction = [(secondes, type_action, action,
+                       {cle: valeur for cle, valeur in colonnes.items() if cle != 'direction'})
+                      for secondes, type_action, action, colonnes in SCENARIO]
+    run_reference = _journaliser(nouvelle, sans_direction)
+    reference = sqlite3.connect(nouvelle)
+    mesures = ('evenements', 'collisions', 'arrets', 'attentes', 'attente_moyenne')
+    migre, attendu = resume_run(conn, run_id), resume_run(reference, run_reference)
+    assert {cle: migre[cle] for cle in mesures} == {cle: attendu[cle] for cle in mesures}
+    requete = "SELECT axe, etat, nombre, duree_ns FROM stats_phases ORDER BY axe, etat"
+    assert conn.execute(requete).fetchall() == reference.execute(requete).fetchall()
+    assert conn.execute("SELECT * FROM attentes_en_cours").fetchall() \
+        == [(run_id, 4, 21 * S)]
+    reference.close()
+    conn.close()
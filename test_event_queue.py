@@ -0,0 +1,47 @@
+"""
+Tests de la file d'événements bornée
+"""
+
+import queue
+
+import pytest
+
+from event_queue import BoundedEventQueue, DROP_OLDEST
+
+
+def _vider(file):
+    elements = []
+    while True:
+        try:
+            elements.append(file.get_nowait())
+        except queue.Empty:
+            return elements
+
+
+def test_drop_oldest_garde_la_sentinelle():
+    """Des événements ajoutés après close() ne chassent pas la sentinelle"""
+    file = BoundedEventQueue(capacite=3, politique=DROP_OLDEST)
+    file.put({'type_action': 'VOITURE', 'n': 0})
+    file.put(None)
+    for n in range(1, 6):
+        assert file.put({'type_action': 'VOITURE', 'n': n})
+
+    elements = _vider(file)
+    assert elements[0] is None
+    assert [event['n'] for event in elements[1:]] == [4, 5]
+    assert file.rejetes_par_type['VOITURE'] == 4
+
+
+def test_drop_oldest_sacrifie_le_plus_ancien():
+    file = BoundedEventQueue(capacite=2, politique=DROP_OLDEST)
+    for n in range(4):
+        file.put({'type_action': 'FEU', 'n': n})
+    assert [event['n'] for event in _vider(file)] == [2, 3]
+
+
+@pytest.mark.parametrize("capacite", [1, 2])
+def test_sentinelle_seule(capacite):
+    file = BoundedEventQueue(capacite=capacite, politique=DROP_OLDEST)
+    file.put(None)
+    file.put({'type_action': 'FEU'})
+    assert _vider(file)[0] is None
@@ -0,0 +1,107 @@
+"""
+Tests de l'export du journal (CSV et colonnes, par paquets)
+"""
+
+import csv
+import gzip
+import sqlite3
+
+import numpy as np
+import pytest
+
+from clock import SimulatedClock
+from database import DatabaseManager
+from export import Filtres, exporter_csv, exporter_colonnes
+from log_policy import LogPolicy, AGREGAT
+from log_sinks import lire_blocs, lire_annexe, lire_colonnes
+from partitions import attacher_partitions, fichiers_partitions
+
+# Début des exécutions (secondes epoch) ; partitions d'une minute
+DEPART = 1_800_000_000
+
+
+@pytest.fixture(scope="module")
+def base(tmp_path_factory):
+    """Deux exécutions sur trois minutes, violations seulement agrégées"""
+    db = str(tmp_path_factory.mktemp("export") / "export.db")
+    clock = SimulatedClock(1.0, depart=DEPART)
+    db_manager = DatabaseManager(db, clock, partition=60, run_description="normale",
+                                 log_policy=LogPolicy({'VIOLATION': AGREGAT}))
+    for seconde in range(180):
+        if seconde == 90:
+            db_manager.start_run("pointe")
+        db_manager.log_event('VOITURE', 'Création véhicule', id_voiture=seconde,
+                             direction=('EST', 'NORD')[seconde % 2], vitesse=1.5)
+        if seconde % 4 == 0:
+            db_manager.log_event('COLLISION', 'Collision', id_voiture=seconde,
+                                 position_x=seconde * 0.5, position_y=-1.0)
+        if seconde % 30 == 0:
+            db_manager.log_event('FEU', 'NS passe à ORANGE', etat_feu='NS:ORANGE')
+        db_manager.log_event('VIOLATION', 'Feu rouge grillé', id_voiture=seconde)
+        clock.tick()
+    db_manager.close()
+    assert len(fichiers_partitions(db)) == 3
+    return db
+
+
+def _vue(db, requete, parametres=()):
+    """Lignes de la vue evenements, partitions comprises"""
+    conn = sqlite3.connect(db)
+    attacher_partitions(conn, db)
+    lignes = conn.execute(requete, parametres).fetchall()
+    conn.close()
+    return lignes
+
+
+def _texte(ligne):
+    return ['' if valeur is None else str(valeur) for valeur in ligne]
+
+
+@pytest.mark.parametrize("sortie", ["tout.csv", "tout.csv.gz"])
+def test_csv_identique_a_la_vue(base, tmp_path, sortie):
+    chemin = str(tmp_path / sortie)
+    assert exporter_csv(base, chemin, taille=7) == 180 + 45 + 6
+    ouvrir = gzip.open if sortie.endswith(".gz") else open
+    with ouvrir(chemin, "rt", newline="", encoding="utf-8") as fichier:
+        entete, *lignes = list(csv.reader(fichier))
+    attendues = _vue(base, f"SELECT {', '.join(entete)} FROM evenements ORDER BY id")
+    assert lignes == [_texte(ligne) for ligne in attendues]
+
+
+def test_filtres(base, tmp_path):
+    chemin = str(tmp_path / "filtre.csv")
+    filtres = Filtres(run_ids=[2], types=['COLLISION', 'FEU'],
+                      debut=DEPART + 100, fin=DEPART + 150)
+    nombre = exporter_csv(base, chemin, filtres, taille=5)
+    attendues = _vue(base, '''
+        SELECT id FROM evenements
+        WHERE run_id = 2 AND type_action IN ('COLLISION', 'FEU')
+          AND ts_ns >= ? AND ts_ns < ? ORDER BY id
+    ''', ((DEPART + 100) * 10**9, (DEPART + 150) * 10**9))
+    with open(chemin, newline="", encoding="utf-8") as fichier:
+        lignes = list(csv.DictReader(fichier))
+    assert nombre == len(lignes) == len(attendues) > 0
+    assert [int(ligne['id']) for ligne in lignes] == [id_ for id_, in attendues]
+
+
+def test_colonnes_par_blocs(base, tmp_path):
+    chemin = str(tmp_path / "tout.col")
+    assert exporter_colonnes(base, chemin, taille=7) == 231
+    blocs = list(lire_blocs(chemin))
+    assert len(blocs) > 1
+    assert all(len(bloc['ts_ns']) <= 7 for bloc in blocs)
+
+    colonnes, libelles, agregats = lire_colonnes(chemin)
+    assert np.array_equal(colonnes['ts_ns'], np.concatenate([bloc['ts_ns'] for bloc in blocs]))
+    attendues = _vue(base, "SELECT ts_ns, type_action, id_voiture, direction "
+                           "FROM evenements ORDER BY id")
+    types = [libelles['type_action'][code - 1] for code in colonnes['type_action']]
+    directions = [libelles['direction'][code - 1] if code else None
+                  for code in colonnes['direction']]
+    identifiants = [None if id_ < 0 else int(id_) for id_ in colonnes['id_voiture']]
+    assert list(zip(colonnes['ts_ns'].tolist(), types, identifiants, directions)) == attendues
+
+    # Une ligne d'agrégat par fenêtre de 10 s et par exécution
+    assert (libelles, agregats) == lire_annexe(chemin)
+    assert len(agregats) == 18
+    assert sum(agregat['nombre'] for agregat in agregats) == 180
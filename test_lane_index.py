@@ -0,0 +1,52 @@
+"""
+Tests de l'index des voies
+"""
+
+import random
+
+import numpy as np
+
+from vehicle_store import VehicleStore, DEPARTS, VECTEURS, CODES_DIRECTION, DIRECTIONS
+from vehicles import Vehicle
+
+
+def _flotte(positions):
+    """Magasin avec un véhicule par (direction, avancée depuis le départ)"""
+    store = VehicleStore()
+    vehicules = []
+    for direction, avancee in positions:
+        vehicule = Vehicle(direction, store=store)
+        code = CODES_DIRECTION[direction]
+        vehicule.x, vehicule.y = DEPARTS[code] + avancee * VECTEURS[code]
+        vehicules.append(vehicule)
+    return store, vehicules
+
+
+def test_vehicules_superposes_s_ignorent():
+    store, (a, b, c) = _flotte([("EST", 100), ("EST", 100), ("EST", 130)])
+    leader, ecart = store.leaders()
+    assert leader[a._index] == leader[b._index] == c._index
+    assert ecart[a._index] == ecart[b._index] == 30
+    assert leader[c._index] == -1
+    assert a.check_vehicle_ahead() is c
+    assert b.check_vehicle_ahead() is c
+
+
+def test_meme_vehicule_devant_que_le_parcours_de_la_flotte():
+    """Index et parcours de toute la flotte, y compris à position égale"""
+    aleatoire = random.Random(0)
+    positions = [(aleatoire.choice(DIRECTIONS), aleatoire.randrange(0, 400, 10))
+                 for _ in range(300)]
+    store, vehicules = _flotte(positions)
+    leader, _ = store.leaders()
+
+    def position(v):
+        # Plusieurs véhicules devant à la même position : n'importe lequel
+        return None if v is None else (v.x, v.y)
+
+    for vehicule in vehicules:
+        attendu = position(vehicule.check_vehicle_ahead(vehicules))
+        indice = leader[vehicule._index]
+        assert position(store.handles[indice] if indice >= 0 else None) == attendu
+        assert position(vehicule.check_vehicle_ahead()) == attendu
+    assert np.any(leader >= 0)
@@ -0,0 +1,65 @@
+"""
+Tests du réseau de carrefours
+"""
+
+import sqlite3
+import time
+
+import pytest
+
+from network import RoadNetwork, PartitionEngine, run_network
+
+
+def test_horloge_avance_d_un_pas_par_pas_de_partition():
+    reseau = RoadNetwork.corridor(4)
+    engine = PartitionEngine(list(reseau.intersections.values()), pas=0.03, depart=0)
+    for _ in range(100):
+        engine.step()
+    assert engine.clock.now() == pytest.approx(3.0)
+
+
+def test_resultat_independant_du_nombre_de_processus():
+    resumes = [run_network(RoadNetwork.grille(2, 4, "pointe"), 1000, processus, graine=1)
+               for processus in (1, 4)]
+    assert resumes[0] == resumes[1]
+    assert sum(stats['entres'] for stats in resumes[0].values()) > 0
+
+
+def test_journal_du_reseau(tmp_path):
+    """Horodatages actuels, ids uniques et gardés aux frontières"""
+    db = str(tmp_path / "reseau.db")
+    depart = time.time()
+    run_network(RoadNetwork.corridor(3, "pointe"), 1000, processus=2, db_name=db, depart=depart)
+
+    conn = sqlite3.connect(db)
+    premier, dernier = conn.execute("SELECT MIN(ts_ns), MAX(ts_ns) FROM journal_evenements").fetchone()
+    assert premier == pytest.approx(depart * 1e9, abs=1e9)
+    assert dernier <= (depart + 1000 * 0.03) * 1e9
+
+    evenements = conn.execute('''
+        SELECT run_id, action, id_voiture FROM evenements
+        WHERE action IN ('Création véhicule', 'Entrée depuis un carrefour voisin')
+    ''').fetchall()
+    conn.close()
+    crees = [(run_id, id_voiture) for run_id, action, id_voiture in evenements
+             if action == 'Création véhicule']
+    entres = [(run_id, id_voiture) for run_id, action, id_voiture in evenements
+              if action != 'Création véhicule']
+    assert entres
+    assert len({id_voiture for _, id_voiture in crees}) == len(crees)
+    run_creation = dict((id_voiture, run_id) for run_id, id_voiture in crees)
+    for run_id, id_voiture in entres:
+        assert run_creation[id_voiture] != run_id
+
+
+def test_aucun_evenement_perdu_entre_processus(tmp_path):
+    """Quatre processus écrivent la même base : chaque événement y arrive"""
+    db = str(tmp_path / "reseau.db")
+    resume = run_network(RoadNetwork.grille(2, 4, "pointe"), 1500, processus=4, db_name=db)
+
+    conn = sqlite3.connect(db)
+    lignes = conn.execute("SELECT COUNT(*) FROM journal_evenements").fetchone()[0]
+    conn.close()
+    emis = sum(stats['evenements'] for stats in resume.values())
+    assert emis > 0
+    assert lignes == emis
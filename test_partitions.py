@@ -0,0 +1,49 @@
+"""
+Tests du journal partitionné (transfert des lots et rétention)
+"""
+
+import sqlite3
+
+from clock import SimulatedClock
+from database import DatabaseManager
+from partitions import fichiers_partitions
+
+S = 1_000_000_000
+
+
+def test_lots_transferes_et_retention(tmp_path):
+    """Une collision toutes les 5 s pendant 5 min, partitions d'une minute
+    gardées 2 min : les lots à cheval sur deux périodes sont répartis,
+    les plus anciennes partitions supprimées, résumés et cumuls gardés"""
+    db = str(tmp_path / "partitions.db")
+    clock = SimulatedClock(5.0, depart=0)
+    db_manager = DatabaseManager(db, clock, batch_size=7, flush_interval=0.01,
+                                 partition=60, retention=120)
+    for id_voiture in range(60):
+        db_manager.log_event('COLLISION', 'Collision', id_voiture=id_voiture)
+        clock.tick()
+    db_manager.close()
+    assert db_manager.ecrivain_bd.bilan() == {'partitions_supprimees': 2}
+
+    # Les partitions terminées plus de 120 s avant le dernier événement
+    # (295 s) ont disparu
+    fichiers = fichiers_partitions(db)
+    assert [debut for debut, _ in fichiers] == [120, 180, 240]
+    ids = []
+    for debut, chemin in fichiers:
+        partition = sqlite3.connect(chemin)
+        lignes = partition.execute("SELECT id, ts_ns FROM journal_evenements").fetchall()
+        partition.close()
+        assert len(lignes) == 12
+        assert all(debut * S <= ts_ns < (debut + 60) * S for _, ts_ns in lignes)
+        ids.extend(id_ for id_, _ in lignes)
+    assert len(set(ids)) == len(ids)
+
+    conn = sqlite3.connect(db)
+    assert conn.execute("SELECT COUNT(*) FROM journal_evenements").fetchone()[0] == 0
+    assert sorted(ligne[0] for ligne in conn.execute("SELECT evenement_id FROM collisions")) \
+        == sorted(ids)
+    assert conn.execute("SELECT collisions FROM stats_runs").fetchone()[0] == 60
+    assert conn.execute("SELECT debut_ns, collisions FROM rollups_minute ORDER BY debut_ns") \
+        .fetchall() == [(minute * 60 * S, 12) for minute in range(5)]
+    conn.close()
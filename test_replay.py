@@ -0,0 +1,66 @@
+"""
+Tests du moteur de relecture (images clés, saut, avance)
+"""
+
+import sqlite3
+
+import pytest
+
+from clock import SimulatedClock
+from database import DatabaseManager
+from headless import run_headless
+from recorder import TrajectoryRecorder
+from replay import ReplayEngine, ReplayState
+from scenarios import HeureDePointe
+
+
+@pytest.fixture(scope="module")
+def enregistrement(tmp_path_factory):
+    """Une minute de pointe, journal et trajectoires"""
+    dossier = tmp_path_factory.mktemp("relecture")
+    db = str(dossier / "relecture.db")
+    clock = SimulatedClock(0.03, depart=1000)
+    db_manager = DatabaseManager(db, clock, run_description="relecture")
+    recorder = TrajectoryRecorder(str(dossier / "run"), db_manager.run_id)
+    run_headless(HeureDePointe(), 2000, db_manager, clock, recorder)
+    recorder.close()
+    db_manager.close()
+    return str(dossier / "run"), db
+
+
+def _etat_attendu(db, run_id, cible_ns):
+    """État obtenu en appliquant tout le journal jusqu'à cible_ns"""
+    conn = sqlite3.connect(db)
+    etat = ReplayState()
+    for ligne in conn.execute('''
+        SELECT type_action, action, etat_feu, scenario FROM evenements
+        WHERE run_id = ? AND ts_ns <= ? ORDER BY ts_ns, id
+    ''', (run_id, cible_ns)):
+        etat.apply(*ligne)
+    conn.close()
+    return etat.__dict__
+
+
+def test_saut_et_avance(enregistrement):
+    trajectoires, db = enregistrement
+    engine = ReplayEngine(trajectoires, db, intervalle_image_cle=5.0, taille_paquet=7)
+    assert len(engine.images_cles) > 5
+
+    # Sauts en avant, en arrière et sur une image clé
+    for secondes in (42.0, 12.5, 13.0, 5.0, 0.0, 59.0, 30.0):
+        engine.seek(secondes)
+        assert engine.etat.__dict__ == _etat_attendu(db, engine.run_id, engine.position_ns)
+    assert engine.etat.collisions > 0
+
+    engine.seek(10.0)
+    engine.play()
+    for _ in range(40):
+        engine.advance(0.25)
+        assert engine.etat.__dict__ == _etat_attendu(db, engine.run_id, engine.position_ns)
+    assert engine.position == pytest.approx(20.0)
+
+    # La fin de l'enregistrement arrête la lecture
+    engine.advance(3600)
+    assert not engine.en_lecture
+    assert engine.position_ns == engine.fin_ns
+    engine.close()
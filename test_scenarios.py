@@ -0,0 +1,87 @@
+"""
+Tests des scénarios : décisions vectorisées contre les règles véhicule par véhicule
+"""
+
+import numpy as np
+import pytest
+
+from scenarios import CirculationNormale, HeureDePointe, ModeNuit, CODES_ETAT
+from traffic_light import EtatFeu
+from vehicle_store import (CODES_DIRECTION, VECTEURS, DIRECTIONS,
+                           ACTION_ARRET, ACTION_AVANCER, ACTION_RALENTIR)
+from vehicles import Vehicle
+
+
+def _normale(direction, x, y, etat_feu):
+    """Règles de CirculationNormale écrites direction par direction"""
+    if abs(x) < 50 and abs(y) < 50:
+        return ACTION_AVANCER
+    # Coordonnée qui décroît vers le carrefour, dans le sens de la voie
+    avant = {"EST": -x, "OUEST": x, "NORD": -y, "SUD": y}[direction]
+    if avant > 100 or avant <= 50:
+        return ACTION_AVANCER
+    if etat_feu == EtatFeu.ROUGE:
+        return ACTION_ARRET
+    if etat_feu == EtatFeu.ORANGE and avant > 80:
+        return ACTION_ARRET
+    return ACTION_AVANCER
+
+
+def _pointe(direction, x, y, etat_feu):
+    """Règles de HeureDePointe écrites direction par direction"""
+    if abs(x) < 60 and abs(y) < 60:
+        return ACTION_AVANCER
+    avant = {"EST": -x, "OUEST": x, "NORD": -y, "SUD": y}[direction]
+    if avant > 70 and etat_feu == EtatFeu.ROUGE:
+        return ACTION_ARRET
+    if avant > 60 and etat_feu == EtatFeu.ORANGE:
+        return ACTION_RALENTIR
+    return ACTION_AVANCER
+
+
+def _nuit(direction, x, y, etat_feu):
+    """Mode nuit : toujours au ralenti"""
+    return ACTION_RALENTIR
+
+
+REGLES = [(CirculationNormale, _normale), (HeureDePointe, _pointe), (ModeNuit, _nuit)]
+
+# Toute la scène au pas de 5, bornes des zones comprises
+POSITIONS = [(x, y) for x in range(-200, 201, 5) for y in range(-200, 201, 5)]
+
+
+@pytest.mark.parametrize("classe, regle", REGLES)
+def test_decide_comme_les_regles_scalaires(classe, regle):
+    scenario = classe()
+    cas = [(direction, x, y, etat) for direction in DIRECTIONS
+           for x, y in POSITIONS for etat in EtatFeu]
+    directions = np.array([CODES_DIRECTION[direction] for direction, _, _, _ in cas])
+    x = np.array([x for _, x, _, _ in cas], dtype=float)
+    y = np.array([y for _, _, y, _ in cas], dtype=float)
+    etats = np.array([CODES_ETAT[etat] for _, _, _, etat in cas])
+    # Progression comme la calcule le magasin de véhicules
+    progression = x * VECTEURS[directions, 0] + y * VECTEURS[directions, 1]
+
+    actions = scenario.decide(x, y, progression, etats)
+    attendues = [regle(*un_cas) for un_cas in cas]
+    assert actions.tolist() == attendues
+
+
+@pytest.mark.parametrize("classe, regle", REGLES)
+def test_apply_behavior_sur_un_vehicule(classe, regle):
+    scenario = classe()
+    for direction in DIRECTIONS:
+        for x, y in POSITIONS[::37]:
+            for etat in EtatFeu:
+                vehicule = Vehicle(direction)
+                vehicule.x, vehicule.y = x, y
+                scenario.apply_behavior(vehicule, etat)
+                action = regle(direction, x, y, etat)
+                if action == ACTION_ARRET:
+                    assert vehicule.is_stopped and vehicule.speed_value == 0
+                elif action == ACTION_AVANCER:
+                    assert not vehicule.is_stopped
+                    assert vehicule.speed_value == vehicule.max_speed
+                else:
+                    assert not vehicule.is_stopped
+                    assert vehicule.speed_value == max(0.3, vehicule.max_speed * 0.4)
@@ -0,0 +1,54 @@
+"""
+Tests du balayage de paramètres
+"""
+
+import pytest
+
+from clock import SimulatedClock
+from sweep import SweepStats, configurations, run_configuration, sweep, MESURES
+from traffic_light import EtatFeu
+
+
+def test_compteurs_du_balayage():
+    clock = SimulatedClock(1.0, depart=0)
+    stats = SweepStats(clock)
+    stats.log_event('VOITURE', 'Arrêt au feu rouge', id_voiture=1)
+    stats.log_many('VOITURE', 'Arrêt au feu rouge', id_voiture=[2, 3], vitesse=[0, 0])
+    for _ in range(4):
+        clock.tick()
+    stats.log_event('VOITURE', 'Redémarrage au feu vert', id_voiture=1)
+    stats.log_many('VOITURE', 'Redémarrage au feu vert', id_voiture=[2, 4])
+    # Seuls les événements VOITURE comptent
+    stats.log_event('COLLISION', 'Arrêt au feu rouge', id_voiture=5)
+    stats.log_many('FEU', 'Réapparition véhicule', id_voiture=[6])
+    stats.log_event('VOITURE', 'Réapparition véhicule', id_voiture=1)
+
+    assert (stats.arrets, stats.attentes, stats.sorties) == (3, 2, 1)
+    assert stats.attente_totale == pytest.approx(8.0)
+
+
+def test_configurations():
+    grille = {'nb_vehicules': [8, 12], 'taux_apparition': [2.0, 3.0, 4.0]}
+    combinaisons = list(configurations(grille))
+    assert len(combinaisons) == 6
+    assert combinaisons[0] == {'nb_vehicules': 8, 'taux_apparition': 2.0}
+    with pytest.raises(ValueError):
+        list(configurations({'distance_securite': [30]}))
+
+
+def test_meme_graine_meme_resultat():
+    tache = ('pointe', {'nb_vehicules': 6}, 3, 20.0, 0.1)
+    assert run_configuration(tache) == run_configuration(tache)
+
+
+def test_lignes_agregees_par_configuration():
+    """Deux fois la même graine : moyenne = une exécution, écart-type nul"""
+    grille = {'durees_feu': [{EtatFeu.VERT: 4}, {EtatFeu.VERT: 8}]}
+    lignes = sweep('normale', grille, [1, 1], duree=20.0, pas=0.1, processus=2)
+    assert [ligne['duree_vert'] for ligne in lignes] == [4, 8]
+    for ligne, parametres in zip(lignes, grille['durees_feu']):
+        seule = run_configuration(('normale', {'durees_feu': parametres}, 1, 20.0, 0.1))
+        assert ligne['graines'] == 2
+        for mesure in MESURES:
+            assert ligne[f'{mesure}_moyenne'] == pytest.approx(seule[mesure])
+            assert ligne[f'{mesure}_ecart_type'] == 0
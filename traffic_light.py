@@ -4,7 +4,8 @@ Gère les états et les transitions du feu tricolore
 """
 
 from enum import Enum
-import time
+
+from clock import RealTimeClock
 
 
 class EtatFeu(Enum):
@@ -18,15 +19,16 @@ class EtatFeu(Enum):
 class TrafficLight:
     """Classe représentant un feu tricolore"""
     
-    def __init__(self, db_manager):
+    def __init__(self, db_manager, clock=None):
         self.db_manager = db_manager
+        self.clock = clock or RealTimeClock()
         self.etat_ns = EtatFeu.ROUGE  # Nord-Sud
         self.etat_eo = EtatFeu.VERT   # Est-Ouest
         self.phase = "EO"  # Phase active
-        self.last_change = time.time()
+        self.last_change = self.clock.now()
         self.mode_manuel = False
         self.clignotement = True
-        self.last_blink = time.time()
+        self.last_blink = self.clock.now()
         
         # Journalisation initialisation
         self.db_manager.log_event('SYSTEME', 'Initialisation feu tricolore',
@@ -34,7 +36,7 @@ class TrafficLight:
     
     def update(self, durees, scenario_name):
         """Met à jour l'état du feu selon le scénario"""
-        now = time.time()
+        now = self.clock.now()
         
         # Mode nuit : orange clignotant
         if scenario_name == "Mode nuit":
@@ -59,7 +61,7 @@ class TrafficLight:
                 self.phase = "NS"
                 self.etat_ns = EtatFeu.VERT
                 self.db_manager.log_event('FEU', 'Passage NS à VERT', etat_feu='NS:VERT')
-                self.last_change = time.time()
+                self.last_change = self.clock.now()
         else:
             if self.etat_ns == EtatFeu.VERT and now - self.last_change > durees.get(EtatFeu.VERT, 5):
                 self._next_ns()
@@ -69,7 +71,7 @@ class TrafficLight:
                 self.phase = "EO"
                 self.etat_eo = EtatFeu.VERT
                 self.db_manager.log_event('FEU', 'Passage EO à VERT', etat_feu='EO:VERT')
-                self.last_change = time.time()
+                self.last_change = self.clock.now()
     
     def _next_eo(self):
         """Passe à l'état suivant pour Est-Ouest"""
@@ -80,7 +82,7 @@ class TrafficLight:
             self.etat_eo = EtatFeu.ROUGE
             # L'autre axe reste ROUGE pendant 1 seconde avant de passer au VERT
             self.db_manager.log_event('FEU', 'EO passe à ROUGE', etat_feu='EO:ROUGE')
-        self.last_change = time.time()
+        self.last_change = self.clock.now()
     
     def _next_ns(self):
         """Passe à l'état suivant pour Nord-Sud"""
@@ -91,7 +93,7 @@ class TrafficLight:
             self.etat_ns = EtatFeu.ROUGE
             # L'autre axe reste ROUGE pendant 1 seconde avant de passer au VERT
             self.db_manager.log_event('FEU', 'NS passe à ROUGE', etat_feu='NS:ROUGE')
-        self.last_change = time.time()
+        self.last_change = self.clock.now()
     
     def manual_change(self):
         """Change manuellement l'état du feu"""
@@ -108,7 +110,7 @@ class TrafficLight:
         
         self.db_manager.log_event('FEU', 'Changement manuel', 
                                   etat_feu=f'NS:{self.etat_ns.value}, EO:{self.etat_eo.value}')
-        self.last_change = time.time()
+        self.last_change = self.clock.now()
     
     def set_auto_mode(self):
         """Active le mode automatique"""
@@ -1,10 +1,13 @@
 """
 Module de gestion de la scène graphique
-Dessine le carrefour, les routes et les feux tricolores
+Dessine le carrefour, les routes, les feux tricolores et les véhicules
 """
 
+import time
 import turtle
 
+from retained import RetainedLayer
+
 
 class TurtleScene:
     """Gère l'affichage graphique de la simulation"""
@@ -136,78 +139,217 @@ class TurtleScene:
 
 
 class TrafficLightView:
-    """Vue graphique d'un feu tricolore"""
+    """Vue graphique d'un feu tricolore
+    
+    Le boîtier et les trois pastilles sont créés une fois sur le canevas ;
+    draw() ne change que la couleur des pastilles dont l'état a changé.
+    """
+    
+    ETEINT = "#333333"
     
-    def __init__(self, x, y, orientation="NS"):
+    def __init__(self, x, y, orientation="NS", layer=None):
         self.x = x
         self.y = y
         self.orientation = orientation
-        self.turtle = turtle.Turtle()
-        self.turtle.hideturtle()
-        self.turtle.speed(0)
-        self.turtle.width(2)
+        self.layer = layer or RetainedLayer()
+        
+        if self.orientation in ["NORD", "SUD", "NS"]:
+            # Feu vertical : rouge en haut, vert en bas
+            self.layer.rectangle(x - 15, y + 50, x + 15, y - 50, "black")
+            positions = [(x, y + 30), (x, y), (x, y - 30)]
+        else:
+            # Feu horizontal : rouge à gauche, vert à droite
+            self.layer.rectangle(x - 50, y + 15, x + 50, y - 15, "black")
+            positions = [(x - 30, y), (x, y), (x + 30, y)]
+        self.lights = [self.layer.dot(px, py, 20, self.ETEINT) for px, py in positions]
+        self._dernier = None
     
     def draw(self, etat, blink_state=True):
-        """Dessine le feu tricolore avec l'état actuel"""
-        self.turtle.clear()
+        """Allume les pastilles correspondant à l'état actuel"""
+        allumes = (etat.value == "ROUGE",
+                   etat.value == "ORANGE" or (etat.value == "ORANGE_CLIGNOTANT" and blink_state),
+                   etat.value == "VERT")
+        if allumes == self._dernier:
+            return
+        self._dernier = allumes
+        for light, actif, color in zip(self.lights, allumes, ("red", "orange", "green")):
+            couleur = color if actif else self.ETEINT
+            light.set(fill=couleur, outline=couleur)
+
+
+class VehicleView(turtle.Turtle):
+    """Vue graphique d'un véhicule (tortue synchronisée sur ses données)"""
+    
+    _car_shapes_registered = False
+    
+    @classmethod
+    def _register_car_shapes(cls):
+        """Enregistre les formes de voitures personnalisées une seule fois"""
+        if cls._car_shapes_registered:
+            return
         
-        # Dessiner le support
-        self.turtle.penup()
+        screen = turtle.Screen()
         
-        if self.orientation in ["NORD", "SUD", "NS"]:
-            # Feu vertical
-            self.turtle.goto(self.x - 15, self.y + 50)
-            self.turtle.color("black")
-            self.turtle.pendown()
-            self.turtle.begin_fill()
-            for _ in range(2):
-                self.turtle.forward(30)
-                self.turtle.right(90)
-                self.turtle.forward(100)
-                self.turtle.right(90)
-            self.turtle.end_fill()
-            
-            # Dessiner les trois feux
-            self._draw_light(self.y + 30, etat.value == "ROUGE", "red")
-            self._draw_light(self.y, etat.value == "ORANGE" or (etat.value == "ORANGE_CLIGNOTANT" and blink_state), "orange")
-            self._draw_light(self.y - 30, etat.value == "VERT", "green")
+        # Forme de voiture réaliste (vue de dessus)
+        car_shape = (
+            # Avant de la voiture
+            (-10, -6), (-10, -8), (-8, -10), (8, -10), (10, -8), (10, -6),
+            # Côté droit avec rétroviseur
+            (10, -4), (12, -4), (12, 0), (10, 0),
+            # Arrière droit
+            (10, 6), (10, 8), (8, 10), 
+            # Arrière
+            (-8, 10), (-10, 8), (-10, 6),
+            # Côté gauche avec rétroviseur
+            (-10, 0), (-12, 0), (-12, -4), (-10, -4),
+            # Fermeture
+            (-10, -6)
+        )
         
+        screen.register_shape("car_shape", car_shape)
+        cls._car_shapes_registered = True
+    
+    def __init__(self, vehicle):
+        super().__init__()
+        
+        VehicleView._register_car_shapes()
+        
+        # Configuration graphique - VOITURE RÉALISTE
+        self.shape("car_shape")
+        self.shapesize(1.5)
+        self.penup()
+        self.bind(vehicle)
+    
+    def bind(self, vehicle):
+        """Associe la tortue (neuve ou recyclée) à un véhicule et l'affiche"""
+        self.vehicle = vehicle
+        self.color(vehicle.color)
+        self.sync()
+        self.showturtle()
+    
+    def release(self):
+        """Masque la tortue et oublie son véhicule, en attendant d'être recyclée"""
+        self.hideturtle()
+        self.vehicle = None
+    
+    def sync(self):
+        """Recopie la position et le cap du véhicule sur la tortue"""
+        self.setheading(self.vehicle.heading)
+        self.goto(self.vehicle.x, self.vehicle.y)
+
+
+class VehiclesView:
+    """Observateur de la simulation qui affiche les véhicules avec turtle
+    
+    Une tortue n'est jamais détruite : turtle garde toutes les tortues
+    (et leurs éléments de canevas) enregistrées auprès de l'écran. Les
+    tortues des véhicules retirés sont donc masquées et mises en réserve,
+    puis réutilisées pour les véhicules suivants ; leur nombre ne dépasse
+    pas le plus grand nombre de véhicules affichés en même temps.
+    """
+    
+    def __init__(self):
+        self.views = {}
+        self.pool = []
+        self.tortues_creees = 0
+    
+    def on_vehicle_added(self, vehicle):
+        """Associe une tortue de la réserve (ou une nouvelle) au véhicule"""
+        if self.pool:
+            view = self.pool.pop()
+            view.bind(vehicle)
         else:
-            # Feu horizontal
-            self.turtle.goto(self.x - 50, self.y + 15)
-            self.turtle.color("black")
-            self.turtle.pendown()
-            self.turtle.begin_fill()
-            for _ in range(2):
-                self.turtle.forward(100)
-                self.turtle.right(90)
-                self.turtle.forward(30)
-                self.turtle.right(90)
-            self.turtle.end_fill()
-            
-            # Dessiner les trois feux
-            self._draw_light_h(self.x - 30, etat.value == "ROUGE", "red")
-            self._draw_light_h(self.x, etat.value == "ORANGE" or (etat.value == "ORANGE_CLIGNOTANT" and blink_state), "orange")
-            self._draw_light_h(self.x + 30, etat.value == "VERT", "green")
-    
-    def _draw_light(self, y, active, color):
-        """Dessine un feu individuel (vertical)"""
-        self.turtle.penup()
-        self.turtle.goto(self.x, y)
-        if active:
-            self.turtle.color(color)
-            self.turtle.dot(20)
-        else:
-            self.turtle.color("#333333")
-            self.turtle.dot(20)
-    
-    def _draw_light_h(self, x, active, color):
-        """Dessine un feu individuel (horizontal)"""
-        self.turtle.penup()
-        self.turtle.goto(x, self.y)
-        if active:
-            self.turtle.color(color)
-            self.turtle.dot(20)
-        else:
-            self.turtle.color("#333333")
-            self.turtle.dot(20)
+            view = VehicleView(vehicle)
+            self.tortues_creees += 1
+        self.views[vehicle.id] = view
+    
+    def on_vehicle_removed(self, vehicle):
+        """Masque la tortue d'un véhicule retiré et la remet en réserve"""
+        view = self.views.pop(vehicle.id, None)
+        if view is not None:
+            view.release()
+            self.pool.append(view)
+    
+    def draw(self):
+        """Synchronise toutes les tortues avec l'état des véhicules"""
+        for view in self.views.values():
+            view.sync()
+
+
+class AlertSlot:
+    """Emplacement d'alerte réutilisable : un texte persistant du canevas
+    
+    Les alertes reçues sont comptées ; l'affichage n'est mis à jour
+    qu'une fois par fenêtre de `fenetre` secondes, avec le nombre
+    d'alertes regroupées, puis effacé `duree` secondes après la dernière.
+    """
+    
+    def __init__(self, layer, y, color, font, duree, fenetre):
+        self.text = layer.text(0, y, "", font=font, fill=color, align="center")
+        self.duree = duree
+        self.fenetre = fenetre
+        self.compte = 0
+        self.message = ""
+        self.derniere_maj = float("-inf")
+        self.expiration = 0.0
+    
+    def signal(self, message, nombre=1):
+        """Compte `nombre` alertes ; `message(n)` formate n alertes regroupées"""
+        self.compte += nombre
+        self.message = message
+    
+    def draw(self, now):
+        """Affiche le cumul de la fenêtre écoulée, ou efface l'alerte expirée"""
+        if self.compte and now - self.derniere_maj >= self.fenetre:
+            self.text.set(text=self.message(self.compte))
+            self.compte = 0
+            self.derniere_maj = now
+            self.expiration = now + self.duree
+        elif now >= self.expiration:
+            self.text.set(text="")
+
+
+class AlertView:
+    """Affichage des alertes visuelles (collisions, violations)
+    
+    show_collisions et show_violation ne font que compter : ils sont
+    appelés depuis la simulation, parfois des centaines de fois par pas
+    pendant un carambolage. draw(), appelé à chaque image, met à jour
+    les deux emplacements fixes au plus une fois par fenêtre.
+    """
+    
+    FENETRE = 0.5
+    
+    def __init__(self, layer=None):
+        layer = layer or RetainedLayer()
+        self.collisions = AlertSlot(layer, 280, "red", ("Arial", 14, "bold"),
+                                    duree=2.0, fenetre=self.FENETRE)
+        self.violations = AlertSlot(layer, 300, "orange", ("Arial", 10, "bold"),
+                                    duree=1.0, fenetre=self.FENETRE)
+        self.distance_min = None
+    
+    def show_collisions(self, nombre=1):
+        """Compte `nombre` avertissements de collision"""
+        self.collisions.signal(self._message_collisions, nombre)
+    
+    def show_violation(self, v1, v2, distance):
+        """Compte un avertissement de violation (garde la plus courte distance)"""
+        if self.violations.compte == 0 or distance < self.distance_min:
+            self.distance_min = distance
+        self.violations.signal(self._message_violations)
+    
+    def _message_collisions(self, n):
+        if n == 1:
+            return "⚠ COLLISION DÉTECTÉE !"
+        return f"⚠ {n} COLLISIONS"
+    
+    def _message_violations(self, n):
+        if n == 1:
+            return f"⚠ Distance de sécurité: {self.distance_min:.1f} pixels"
+        return f"⚠ {n} violations de distance (min {self.distance_min:.1f} pixels)"
+    
+    def draw(self):
+        """Met à jour les emplacements d'alerte"""
+        now = time.monotonic()
+        self.collisions.draw(now)
+        self.violations.draw(now)
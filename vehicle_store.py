@@ -0,0 +1,191 @@
+"""
+Module de stockage vectorisé des véhicules
+Range l'état de tous les véhicules dans des colonnes NumPy (structure de tableaux)
+et applique déplacements, réapparitions et changements de vitesse en une seule
+opération par pas de simulation
+"""
+
+import numpy as np
+
+from lane_index import LaneIndex
+
+
+# Codes de direction : indice dans cette liste
+DIRECTIONS = ["EST", "OUEST", "NORD", "SUD"]
+CODES_DIRECTION = {direction: code for code, direction in enumerate(DIRECTIONS)}
+
+# Position de départ et cap par code de direction (schéma du carrefour)
+DEPARTS = np.array([
+    [-420.0, -20.0],   # EST : voie basse (en dessous de la ligne centrale)
+    [420.0, 20.0],     # OUEST : voie haute (au-dessus de la ligne centrale)
+    [20.0, -300.0],    # NORD : voie de droite pour MONTER (x > 0)
+    [-20.0, 300.0],    # SUD : voie de gauche pour DESCENDRE (x < 0)
+])
+CAPS = np.array([0, 180, 90, 270])
+
+# Vecteur unitaire de déplacement par code de direction
+VECTEURS = np.array([
+    [1.0, 0.0],
+    [-1.0, 0.0],
+    [0.0, 1.0],
+    [0.0, -1.0],
+])
+
+# Limite de la scène au-delà de laquelle un véhicule réapparaît
+LIMITE_SCENE = 450
+
+# Distance en dessous de laquelle le véhicule devant impose de freiner
+DISTANCE_DETECTION = 50
+
+# Codes d'action décidés à chaque pas
+ACTION_AUCUNE = 0
+ACTION_ARRET = 1
+ACTION_AVANCER = 2
+ACTION_RALENTIR = 3
+
+
+class VehicleStore:
+    """Colonnes NumPy contenant l'état de tous les véhicules
+
+    Les lignes 0..n-1 sont actives. Chaque ligne est associée à un objet
+    Vehicle (self.handles) qui sert de vue sur la ligne. Le retrait d'un
+    véhicule déplace la dernière ligne dans le trou pour garder les
+    colonnes contiguës. self.lanes garde les lignes triées par voie.
+    """
+
+    def __init__(self, capacite=64):
+        self.n = 0
+        self.handles = []
+        self._allouer(max(1, capacite))
+        self.lanes = LaneIndex(self, VECTEURS)
+
+    def _allouer(self, capacite):
+        """(Ré)alloue les colonnes en conservant les lignes actives"""
+        anciennes = getattr(self, 'x', None) is not None
+        colonnes = {
+            'ids': np.zeros(capacite, dtype=np.int64),
+            'x': np.zeros(capacite),
+            'y': np.zeros(capacite),
+            'heading': np.zeros(capacite, dtype=np.int16),
+            'direction': np.zeros(capacite, dtype=np.int8),
+            'speed': np.zeros(capacite),
+            'max_speed': np.zeros(capacite),
+            'is_stopped': np.zeros(capacite, dtype=bool),
+            'distance_securite': np.zeros(capacite),
+        }
+        for nom, colonne in colonnes.items():
+            if anciennes:
+                colonne[:self.n] = getattr(self, nom)[:self.n]
+            setattr(self, nom, colonne)
+        self.capacite = capacite
+
+    def __len__(self):
+        return self.n
+
+    def add(self, handle, direction):
+        """Ajoute une ligne pour `handle` et retourne son indice"""
+        if self.n == self.capacite:
+            self._allouer(self.capacite * 2)
+        i = self.n
+        code = CODES_DIRECTION[direction]
+        self.ids[i] = handle.id
+        self.direction[i] = code
+        self.x[i], self.y[i] = DEPARTS[code]
+        self.heading[i] = CAPS[code]
+        self.speed[i] = 2
+        self.max_speed[i] = 2
+        self.is_stopped[i] = False
+        self.distance_securite[i] = 40
+        self.handles.append(handle)
+        self.n += 1
+        self.lanes.ajouter(i)
+        return i
+
+    def remove(self, index):
+        """Retire la ligne `index` en y déplaçant la dernière ligne"""
+        dernier = self.n - 1
+        self.lanes.retirer(index)
+        if index != dernier:
+            self.lanes.renommer(dernier, index)
+            for nom in ('ids', 'x', 'y', 'heading', 'direction', 'speed',
+                        'max_speed', 'is_stopped', 'distance_securite'):
+                colonne = getattr(self, nom)
+                colonne[index] = colonne[dernier]
+            self.handles[index] = self.handles[dernier]
+            self.handles[index]._index = index
+        self.handles.pop()
+        self.n -= 1
+
+    def progression(self):
+        """Coordonnée longitudinale de chaque véhicule le long de sa voie
+
+        Elle croît dans le sens de circulation et vaut 0 au centre du
+        carrefour : un véhicule EST en x = -100 et un véhicule OUEST en
+        x = 100 ont tous deux une progression de -100.
+        """
+        n = self.n
+        directions = self.direction[:n]
+        return self.x[:n] * VECTEURS[directions, 0] + self.y[:n] * VECTEURS[directions, 1]
+
+    def leaders(self, s=None):
+        """Trouve le véhicule devant chacun, sur la même voie
+
+        `s` est la progression (recalculée si absente). Retourne
+        (leader, ecart) : indice du véhicule devant à moins de
+        DISTANCE_DETECTION (ou -1) et distance qui les sépare.
+
+        Le véhicule devant est le voisin suivant dans l'index des voies,
+        dont l'ordre est vérifié (et réparé si besoin) au passage.
+        """
+        if s is None:
+            s = self.progression()
+        self.lanes.reparer(s)
+        return self.lanes.leaders(s, DISTANCE_DETECTION)
+
+    def apply_actions(self, actions):
+        """Applique les codes d'action de tous les véhicules en une fois
+
+        Retourne (arretes, redemarres) : indices des véhicules qui viennent
+        de s'arrêter ou de redémarrer, pour la journalisation.
+        """
+        n = self.n
+        arret = actions == ACTION_ARRET
+        avancer = actions == ACTION_AVANCER
+        ralentir = actions == ACTION_RALENTIR
+        stopped = self.is_stopped[:n]
+        speed = self.speed[:n]
+        max_speed = self.max_speed[:n]
+
+        arretes = np.flatnonzero(arret & ~stopped)
+        redemarres = np.flatnonzero(avancer & stopped)
+
+        # Ralentir : redémarrage lent si arrêté, sinon vitesse réduite
+        speed[ralentir] = np.where(stopped[ralentir],
+                                   max_speed[ralentir] * 0.3,
+                                   np.maximum(0.3, max_speed[ralentir] * 0.4))
+        speed[avancer] = max_speed[avancer]
+        speed[arret] = 0
+        stopped[arret] = True
+        stopped[avancer | ralentir] = False
+        return arretes, redemarres
+
+    def move(self):
+        """Déplace tous les véhicules roulants et fait réapparaître ceux sortis
+
+        Retourne les indices des véhicules réapparus.
+        """
+        n = self.n
+        directions = self.direction[:n]
+        pas = np.where(self.is_stopped[:n], 0.0, self.speed[:n])
+        self.x[:n] += VECTEURS[directions, 0] * pas
+        self.y[:n] += VECTEURS[directions, 1] * pas
+
+        sortis = np.flatnonzero((np.abs(self.x[:n]) > LIMITE_SCENE) |
+                                (np.abs(self.y[:n]) > LIMITE_SCENE))
+        if len(sortis):
+            codes = directions[sortis]
+            self.x[sortis] = DEPARTS[codes, 0]
+            self.y[sortis] = DEPARTS[codes, 1]
+            self.heading[sortis] = CAPS[codes]
+            self.lanes.reapparus(sortis)
+        return sortis
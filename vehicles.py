@@ -1,141 +1,147 @@
 """
 Module de gestion des véhicules
-Définit le comportement et l'animation des véhicules
+Définit l'état et le comportement des véhicules (sans dépendance graphique)
 """
 
-import turtle
 import random
 import math
 
+from vehicle_store import (VehicleStore, CODES_DIRECTION, DEPARTS, CAPS, VECTEURS,
+                           LIMITE_SCENE, DISTANCE_DETECTION,
+                           ACTION_ARRET, ACTION_AVANCER, ACTION_RALENTIR)
+
+
+COULEURS_VEHICULES = [
+    "#E74C3C",  # Rouge vif
+    "#3498DB",  # Bleu
+    "#2ECC71",  # Vert
+    "#F39C12",  # Orange
+    "#9B59B6",  # Violet
+    "#1ABC9C",  # Turquoise
+    "#34495E",  # Gris foncé
+    "#E67E22"   # Orange foncé
+]
+
+
+def _colonne(nom, type_python):
+    """Propriété lisant/écrivant la colonne `nom` du magasin pour ce véhicule"""
+    def lire(self):
+        return type_python(getattr(self._store, nom)[self._index])
+
+    def ecrire(self, valeur):
+        getattr(self._store, nom)[self._index] = valeur
+
+    return property(lire, ecrire)
+
+
+class Vehicle:
+    """Classe représentant un véhicule dans la simulation
+
+    L'état numérique est rangé dans une ligne d'un VehicleStore ; l'objet
+    n'en est qu'une vue. Sans magasin fourni, le véhicule a le sien.
+
+    `id_voiture` garde l'identifiant d'un véhicule venu d'ailleurs (voir
+    network), et `action` est l'événement journalisé à sa création.
+    """
 
-class Vehicle(turtle.Turtle):
-    """Classe représentant un véhicule dans la simulation"""
-    
     _id_counter = 0
-    _car_shapes_registered = False
-    
-    @classmethod
-    def _register_car_shapes(cls):
-        """Enregistre les formes de voitures personnalisées une seule fois"""
-        if cls._car_shapes_registered:
-            return
-        
-        screen = turtle.Screen()
-        
-        # Forme de voiture réaliste (vue de dessus)
-        car_shape = (
-            # Avant de la voiture
-            (-10, -6), (-10, -8), (-8, -10), (8, -10), (10, -8), (10, -6),
-            # Côté droit avec rétroviseur
-            (10, -4), (12, -4), (12, 0), (10, 0),
-            # Arrière droit
-            (10, 6), (10, 8), (8, 10), 
-            # Arrière
-            (-8, 10), (-10, 8), (-10, 6),
-            # Côté gauche avec rétroviseur
-            (-10, 0), (-12, 0), (-12, -4), (-10, -4),
-            # Fermeture
-            (-10, -6)
-        )
-        
-        screen.register_shape("car_shape", car_shape)
-        cls._car_shapes_registered = True
-    
-    def __init__(self, direction="EST", db_manager=None):
-        super().__init__()
-        Vehicle._id_counter += 1
-        self.id = Vehicle._id_counter
+
+    x = _colonne('x', float)
+    y = _colonne('y', float)
+    heading = _colonne('heading', int)
+    speed_value = _colonne('speed', float)
+    max_speed = _colonne('max_speed', float)
+    is_stopped = _colonne('is_stopped', bool)
+    distance_securite = _colonne('distance_securite', float)
+
+    def __init__(self, direction="EST", db_manager=None, store=None, id_voiture=None,
+                 action='Création véhicule'):
+        if id_voiture is None:
+            Vehicle._id_counter += 1
+            id_voiture = Vehicle._id_counter
+        self.id = id_voiture
         self.direction = direction
         self.db_manager = db_manager
-        
-        # Enregistrer les formes de voitures
-        Vehicle._register_car_shapes()
-        
-        # Configuration graphique - VOITURE RÉALISTE
-        self.shape("car_shape")
-        self.shapesize(1.5)
-        self.color(random.choice([
-            "#E74C3C",  # Rouge vif
-            "#3498DB",  # Bleu
-            "#2ECC71",  # Vert
-            "#F39C12",  # Orange
-            "#9B59B6",  # Violet
-            "#1ABC9C",  # Turquoise
-            "#34495E",  # Gris foncé
-            "#E67E22"   # Orange foncé
-        ]))
-        self.penup()
-        
-        # Vitesse et état
-        self.speed_value = 2
-        self.max_speed = 2
-        self.is_stopped = False
-        self.distance_securite = 40
+
+        # Apparence (utilisée uniquement par la vue graphique)
+        self.color = random.choice(COULEURS_VEHICULES)
         self.crossed_intersection = False
-        
-        self._set_start_position()
-        
+
+        # Ligne du magasin : position de départ, vitesse 2, distance 40
+        self._store = store if store is not None else VehicleStore(1)
+        self._index = self._store.add(self, direction)
+
         # Journalisation
         if self.db_manager:
-            self.db_manager.log_event('VOITURE', 'Création véhicule',
+            self.db_manager.log_event('VOITURE', action,
                                      id_voiture=self.id,
-                                     position_x=self.xcor(),
-                                     position_y=self.ycor(),
+                                     direction=self.direction,
+                                     position_x=self.x,
+                                     position_y=self.y,
                                      vitesse=self.speed_value)
-    
+
+    def detach(self):
+        """Sort le véhicule de son magasin en conservant son état dans un magasin privé"""
+        store = VehicleStore(1)
+        store.handles.append(self)
+        store.n = 1
+        for nom in ('ids', 'x', 'y', 'heading', 'direction', 'speed',
+                    'max_speed', 'is_stopped', 'distance_securite'):
+            getattr(store, nom)[0] = getattr(self._store, nom)[self._index]
+        store.lanes.ajouter(0)
+        self._store.remove(self._index)
+        self._store = store
+        self._index = 0
+
+    def xcor(self):
+        """Abscisse du véhicule (compatibilité avec l'API turtle)"""
+        return self.x
+
+    def ycor(self):
+        """Ordonnée du véhicule (compatibilité avec l'API turtle)"""
+        return self.y
+
     def _set_start_position(self):
         """Positionne le véhicule à sa position de départ selon le schéma du carrefour"""
-        if self.direction == "EST":
-            self.goto(-420, -20)  # Voie basse (en dessous de la ligne centrale)
-            self.setheading(0)
-        elif self.direction == "OUEST":
-            self.goto(420, 20)    # Voie haute (au-dessus de la ligne centrale)
-            self.setheading(180)
-        elif self.direction == "NORD":
-            self.goto(20, -300)   # Voie de droite pour MONTER (x > 0)
-            self.setheading(90)
-        elif self.direction == "SUD":
-            self.goto(-20, 300)   # Voie de gauche pour DESCENDRE (x < 0)
-            self.setheading(270)
-    
+        code = CODES_DIRECTION[self.direction]
+        self.x, self.y = DEPARTS[code]
+        self.heading = CAPS[code]
+
+    def apply_action(self, action):
+        """Applique un code d'action décidé par un scénario"""
+        if action == ACTION_ARRET:
+            self.stop()
+        elif action == ACTION_AVANCER:
+            self.move_forward()
+        elif action == ACTION_RALENTIR:
+            self.slow_down()
+
     def move(self):
         """Déplace le véhicule"""
         if not self.is_stopped:
-            self.forward(self.speed_value)
-        
+            dx, dy = VECTEURS[CODES_DIRECTION[self.direction]]
+            self.x += dx * self.speed_value
+            self.y += dy * self.speed_value
+
         # Réinitialisation si sort de l'écran
-        if abs(self.xcor()) > 450 or abs(self.ycor()) > 450:
+        if abs(self.x) > LIMITE_SCENE or abs(self.y) > LIMITE_SCENE:
             self._set_start_position()
-            if self.db_manager:
-                self.db_manager.log_event('VOITURE', 'Réapparition véhicule',
-                                         id_voiture=self.id,
-                                         position_x=self.xcor(),
-                                         position_y=self.ycor())
-    
+            self.log_respawn()
+
     def stop(self):
         """Arrête le véhicule"""
         if not self.is_stopped:
             self.is_stopped = True
             self.speed_value = 0
-            if self.db_manager:
-                self.db_manager.log_event('VOITURE', 'Arrêt au feu rouge',
-                                         id_voiture=self.id,
-                                         etat_feu='ROUGE',
-                                         position_x=self.xcor(),
-                                         position_y=self.ycor(),
-                                         vitesse=0.0)
-    
+            self.log_stop()
+
     def move_forward(self):
         """Redémarre le véhicule"""
         if self.is_stopped:
             self.is_stopped = False
-            if self.db_manager:
-                self.db_manager.log_event('VOITURE', 'Redémarrage au feu vert',
-                                         id_voiture=self.id,
-                                         position_x=self.xcor(),
-                                         position_y=self.ycor())
+            self.log_restart()
         self.speed_value = self.max_speed
-    
+
     def slow_down(self):
         """Ralentit le véhicule progressivement"""
         if self.is_stopped:
@@ -143,39 +149,78 @@ class Vehicle(turtle.Turtle):
             self.speed_value = self.max_speed * 0.3
         else:
             self.speed_value = max(0.3, self.max_speed * 0.4)
-    
-    def check_vehicle_ahead(self, vehicles):
-        """Vérifie si un véhicule est trop près devant - EMPÊCHE LES DÉPASSEMENTS"""
+
+    def log_stop(self):
+        """Journalise un arrêt (appelé aussi par le chemin vectorisé)"""
+        if self.db_manager:
+            self.db_manager.log_event('VOITURE', 'Arrêt au feu rouge',
+                                     id_voiture=self.id,
+                                     direction=self.direction,
+                                     etat_feu='ROUGE',
+                                     position_x=self.x,
+                                     position_y=self.y,
+                                     vitesse=0.0)
+
+    def log_restart(self):
+        """Journalise un redémarrage (appelé aussi par le chemin vectorisé)"""
+        if self.db_manager:
+            self.db_manager.log_event('VOITURE', 'Redémarrage au feu vert',
+                                     id_voiture=self.id,
+                                     direction=self.direction,
+                                     position_x=self.x,
+                                     position_y=self.y)
+
+    def log_respawn(self):
+        """Journalise une réapparition (appelé aussi par le chemin vectorisé)"""
+        if self.db_manager:
+            self.db_manager.log_event('VOITURE', 'Réapparition véhicule',
+                                     id_voiture=self.id,
+                                     direction=self.direction,
+                                     position_x=self.x,
+                                     position_y=self.y)
+
+    def check_vehicle_ahead(self, vehicles=None):
+        """Vérifie si un véhicule est trop près devant - EMPÊCHE LES DÉPASSEMENTS
+
+        Sans liste, le voisin de devant est lu dans l'index des voies du
+        magasin (O(1)) ; avec une liste, toute la flotte est parcourue.
+        """
+        if vehicles is None:
+            ligne, ecart = self._store.lanes.leader(self._index)
+            if ligne >= 0 and ecart < DISTANCE_DETECTION:
+                return self._store.handles[ligne]
+            return None
+
         closest = None
         min_distance = float('inf')
-        
+
         for other in vehicles:
             if other.id == self.id or other.direction != self.direction:
                 continue
-            
+
             if self._is_behind(other):
-                distance = math.sqrt((self.xcor() - other.xcor())**2 + 
-                                   (self.ycor() - other.ycor())**2)
-                
+                distance = math.sqrt((self.x - other.x)**2 +
+                                   (self.y - other.y)**2)
+
                 # Garder le plus proche devant
                 if distance < min_distance:
                     min_distance = distance
                     closest = other
-        
+
         # Si quelqu'un est trop près, s'arrêter immédiatement
-        if closest and min_distance < 50:
+        if closest and min_distance < DISTANCE_DETECTION:
             return closest
-        
+
         return None
-    
+
     def _is_behind(self, other_vehicle):
         """Vérifie si ce véhicule est derrière un autre"""
         if self.direction == "EST":
-            return self.xcor() < other_vehicle.xcor()
+            return self.x < other_vehicle.x
         elif self.direction == "OUEST":
-            return self.xcor() > other_vehicle.xcor()
+            return self.x > other_vehicle.x
         elif self.direction == "NORD":
-            return self.ycor() < other_vehicle.ycor()
+            return self.y < other_vehicle.y
         elif self.direction == "SUD":
-            return self.ycor() > other_vehicle.ycor()
+            return self.y > other_vehicle.y
         return False